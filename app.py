@@ -1,53 +1,571 @@
-from flask import Flask, jsonify, request
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Iterable, Iterator, Tuple, Any, AbstractSet, Union
+
+from flask import Flask, Response, jsonify, request, stream_with_context, g
 from flask_cors import CORS, cross_origin
-from pydantic import ValidationError
+from pydantic import BaseModel, ValidationError
+from pydantic_core import to_jsonable_python
 
-from netlist_compiler import JsonNetlist, compile_netlist, CompilerResult, CompilerError
-from hdl_generator import JsonNetlistValidationError
+from netlist_compiler import JsonNetlist, compile_netlist_stages, stages_result, CompilerResult, CompilerError, \
+  KicadFootprint, COMPILE_STAGES, footprint_index, library_index
+from netweaver_interface import parse_netlist_json
+from hdl_generator import JsonNetlistValidationError, JsonNetlistValidationErrors
+from compile_sweep import SweepRequest, SweepResult, apply_overrides, bom_diff
+from compile_cache import CompileCache
+from compile_pool import CompilePool
+from compile_jobs import CompileJobQueue, CompileJob, JobQueueFull
+from compression import PrecompressedFile, STREAM_ENCODERS, compress, compress_stream
+from serialization import dump_json, iter_json
+from metrics import Counter, Gauge, Histogram, expose_metrics, set_timings_collector, server_timing, timed
 
 
 app = Flask(__name__)
 CORS(app)
 
+compile_cache = CompileCache()
+
+# 'exec' to exec the generated HDL, or 'direct' to build the design classes directly from the netlist
+COMPILE_ENGINE = os.environ.get('COMPILE_ENGINE', 'exec')
+assert COMPILE_ENGINE in ('exec', 'direct'), f"unknown COMPILE_ENGINE {COMPILE_ENGINE}"
+
+# number of persistent compile worker processes, or 0 to compile in the server process
+COMPILE_POOL_SIZE = int(os.environ.get('COMPILE_POOL_SIZE', 0))
+COMPILE_POOL_MAX_JOBS = int(os.environ.get('COMPILE_POOL_MAX_JOBS', 100))  # jobs before a worker is recycled
+COMPILE_POOL_MAX_RSS_MB = int(os.environ.get('COMPILE_POOL_MAX_RSS_MB', 2048))  # RSS before a worker is recycled
+
+compile_pool: Optional[CompilePool] = None
+if COMPILE_POOL_SIZE > 0:
+  compile_pool = CompilePool(COMPILE_POOL_SIZE, COMPILE_POOL_MAX_JOBS, COMPILE_POOL_MAX_RSS_MB * 1024 * 1024,
+                             direct_build=COMPILE_ENGINE == 'direct')
+  atexit.register(compile_pool.close)
+
+
+def run_compile_stages(json_netlist: JsonNetlist, artifacts: Optional[AbstractSet[str]] = None,
+                       validated: bool = False) -> Iterator[Tuple[str, Any]]:
+  """Compiles the netlist, on the worker pool if enabled, yielding (stage, value) pairs as each stage completes.
+  If validated, the library check is skipped, see compile_netlist_stages.
+  In-process compiles (from request, stream and job threads) run concurrently, except for the Scala compile and SVGPCB
+  stages, see netlist_compiler.edg_lock."""
+  if compile_pool is not None:
+    return compile_pool.compile_stages(json_netlist, artifacts, validated)
+  else:
+    return compile_netlist_stages(json_netlist, direct_build=COMPILE_ENGINE == 'direct', artifacts=artifacts,
+                                  validated=validated)
+
+
+def run_compile_stages_queued(json_netlist: JsonNetlist, artifacts: Optional[AbstractSet[str]],
+                              cache_key: str) -> 'queue.Queue[Optional[Tuple[Optional[str], Any]]]':
+  """Runs the compile stages to completion on a new thread and caches the result, so the compile (and the locks it
+  takes) never waits on the consumer. Returns a queue of (stage, value) pairs as each stage completes, followed by
+  (None, exception) if compilation failed, then None."""
+  cache = compile_cache
+  stage_queue: 'queue.Queue[Optional[Tuple[Optional[str], Any]]]' = queue.Queue()
+
+  def run() -> None:
+    completed = []
+    try:
+      for stage, value in run_compile_stages(json_netlist, artifacts):
+        completed.append((stage, value))
+        stage_queue.put((stage, value))
+    except Exception as e:
+      stage_queue.put((None, e))
+    else:
+      cache.put(cache_key, dump_json(stages_result(completed)))
+    finally:
+      stage_queue.put(None)
+
+  threading.Thread(target=run, name='compile-stream', daemon=True).start()
+  return stage_queue
+
+
+def run_compile(json_netlist: JsonNetlist, artifacts: Optional[AbstractSet[str]] = None,
+                validated: bool = False) -> CompilerResult:
+  """Compiles the netlist, on the worker pool if enabled."""
+  return stages_result(run_compile_stages(json_netlist, artifacts, validated))
+
+
+requests_total = Counter('netweaver_requests_total',
+                         "Requests by endpoint and outcome (success, invalid input, internal error, or HTTP status).",
+                         ['endpoint', 'outcome'])
+requests_in_flight = Gauge('netweaver_requests_in_flight', "Requests currently being handled.", ['endpoint'])
+request_seconds = Histogram('netweaver_request_seconds', "Request latency, including any streamed body.", ['endpoint'])
+
+
+@app.before_request
+def start_request_metrics():
+  g.request_start = time.perf_counter()
+  g.timings = []  # compile stage timings for this request, for the Server-Timing header
+  g.prev_timings = set_timings_collector(g.timings)
+  requests_in_flight.inc(request.endpoint or 'unknown')
+
+
+@app.after_request
+def add_server_timing(response: Response) -> Response:
+  g.status = response.status_code
+  g.streaming = response.is_streamed
+  if g.timings and not g.get('compiling_in_stream'):
+    total = time.perf_counter() - g.request_start
+    response.headers['Server-Timing'] = server_timing(g.timings + [('total', total)])
+  return response
+
+
+@app.teardown_request
+def end_request_metrics(exc: Optional[BaseException]):
+  if g.pop('streaming', False):  # with stream_with_context, this runs again once the stream completes
+    return
+  set_timings_collector(g.pop('prev_timings', None))
+  endpoint = request.endpoint or 'unknown'
+  requests_in_flight.dec(endpoint)
+  request_seconds.observe(time.perf_counter() - g.request_start, endpoint)
+  status = g.get('status', 500)
+  if exc is not None:
+    outcome = 'internal error'
+  else:
+    outcome = g.get('outcome') or ('success' if status < 400 else str(status))
+  requests_total.inc(endpoint, outcome)
+
+
+@app.route("/metrics", methods=['GET'])
+def metrics():
+  return app.response_class(expose_metrics(), mimetype='text/plain; version=0.0.4')
+
 
 @app.route("/version", methods=['GET'])
 def version():
   return "0.13"
 
 
-@app.route("/compile", methods=['POST', 'OPTIONS'])
-@cross_origin(origins=['*'])
-def compile():
-  try:
-    json_netlist = JsonNetlist.model_validate_json(request.get_data())
-    result = compile_netlist(json_netlist)
-  except JsonNetlistValidationError as e:
-    return jsonify(CompilerResult(
+def omit_footprint_data(footprints: Optional[list[KicadFootprint]], known_hashes: Optional[set[str]]) -> None:
+  """Omits footprint data the client has cached (or all footprint data, if known_hashes is None) from the footprints,
+  leaving the hash so the client can fetch it from /footprint/<hash>."""
+  for footprint in footprints or []:
+    if footprint.data is not None:
+      footprint_index.add_data(footprint.hash, footprint.data)  # may have been read by a worker process
+      if known_hashes is None or footprint.hash in known_hashes:
+        footprint.data = None
+
+
+class InvalidRequestError(Exception):
+  """Raised for invalid request parameters, reported as invalid input."""
+
+
+def requested_artifacts() -> Optional[AbstractSet[str]]:
+  """Parses ?artifacts=<stage>,<stage>,..., the compile stages (see COMPILE_STAGES) to include in the result,
+  so clients only pay for the backends they need. hdl is always included. Returns None for all stages."""
+  param = request.args.get('artifacts')
+  if param is None:
+    return None
+  artifacts = frozenset(filter(None, param.split(','))) | {'hdl'}
+  unknown = artifacts - COMPILE_STAGES.keys()
+  if unknown:
+    raise InvalidRequestError(f"unknown artifacts {', '.join(sorted(unknown))}")
+  if artifacts == COMPILE_STAGES.keys():
+    return None
+  return artifacts
+
+
+def select_artifacts(result_json: bytes, artifacts: AbstractSet[str]) -> bytes:
+  """Returns the CompilerResult JSON with the fields of stages not in artifacts reset to their defaults, as if only
+  the artifacts had been compiled."""
+  result = CompilerResult.model_validate_json(result_json)
+  return dump_json(result.model_copy(update={field: CompilerResult.model_fields[field].get_default()
+                                             for stage, field in COMPILE_STAGES.items() if stage not in artifacts}))
+
+
+def compile_cache_lookup(json_netlist: JsonNetlist,
+                         artifacts: Optional[AbstractSet[str]] = None) -> Tuple[str, Optional[bytes]]:
+  """Returns the cache key for the netlist and artifacts, and the cached CompilerResult JSON if available.
+  A cached full result is used for any subset of artifacts, with only the requested artifacts."""
+  with timed('cache'):
+    cache_key = compile_cache.key(json_netlist)
+    result_json = compile_cache.get(cache_key)
+    if artifacts is not None:
+      if result_json is not None:
+        result_json = select_artifacts(result_json, artifacts)
+      else:
+        cache_key = compile_cache.key(json_netlist, ','.join(sorted(artifacts)))
+        result_json = compile_cache.get(cache_key)
+  return cache_key, result_json
+
+
+def compile_cached_result(json_netlist: JsonNetlist, artifacts: Optional[AbstractSet[str]] = None,
+                          validated: bool = False) -> Tuple[bytes, Optional[CompilerResult]]:
+  """Compiles the netlist, or fetches the result from the cache, returning the CompilerResult JSON and, if it was
+  compiled (not cached), the CompilerResult, which the caller may modify."""
+  cache_key, result_json = compile_cache_lookup(json_netlist, artifacts)
+  if result_json is not None:
+    return result_json, None
+  result = run_compile(json_netlist, artifacts, validated)
+  with timed('serialize'):
+    result_json = dump_json(result)
+  compile_cache.put(cache_key, result_json)
+  return result_json, result
+
+
+def compile_cached(json_netlist: JsonNetlist, artifacts: Optional[AbstractSet[str]] = None,
+                   validated: bool = False) -> bytes:
+  """Compiles the netlist, or fetches the result from the cache, returning the CompilerResult JSON."""
+  return compile_cached_result(json_netlist, artifacts, validated)[0]
+
+
+def compile_error_result(e: Exception) -> CompilerResult:
+  """Returns the CompilerResult reporting an exception from parsing or compiling a netlist."""
+  if isinstance(e, InvalidRequestError):
+    return CompilerResult(
       edgHdl="",
       errors=[
-        CompilerError(path=[e.path], kind="invalid input", details=e.desc)
+        CompilerError(path=[], kind="invalid input", details=str(e))
       ]
-    ).model_dump()), 400
-  except ValidationError as e:
-    return jsonify(CompilerResult(
+    )
+  elif isinstance(e, JsonNetlistValidationError):
+    errors = e.errors if isinstance(e, JsonNetlistValidationErrors) else [e]
+    return CompilerResult(
+      edgHdl="",
+      errors=[
+        CompilerError(path=error.path, kind="invalid input", details=error.desc) for error in errors
+      ]
+    )
+  elif isinstance(e, ValidationError):
+    return CompilerResult(
       edgHdl="",
       errors=[
         CompilerError(path=[], kind="invalid input", details="format error")
       ]
-    ).model_dump()), 400
-  except Exception as e:
-    return jsonify(CompilerResult(
+    )
+  else:
+    return CompilerResult(
       edgHdl="",
       errors=[
         CompilerError(path=[], kind=f"internal error", details=repr(e))
       ]
-    ).model_dump()), 400
+    )
+
+
+# responses smaller than this are sent uncompressed, where the compression overhead outweighs the savings
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+
+
+def json_response(body: Union[bytes, Iterable[bytes]], status: int = 200) -> Response:
+  """Returns a JSON response of the body, compressed with the best content-coding the client accepts (see
+  STREAM_ENCODERS). A body of chunks is streamed, compressed chunk by chunk."""
+  encoding = request.accept_encodings.best_match(list(STREAM_ENCODERS))
+  if isinstance(body, bytes):
+    if encoding is not None and len(body) >= COMPRESS_MIN_BYTES:
+      with timed('compress'):
+        body = compress(body, encoding)
+    else:
+      encoding = None
+    response = app.response_class(body, status=status, mimetype='application/json')
+  else:
+    if encoding is not None:
+      body = compress_stream(body, encoding)
+    response = app.response_class(stream_with_context(body), status=status, mimetype='application/json')
+  if encoding is not None:
+    response.headers['Content-Encoding'] = encoding
+  response.vary.add('Accept-Encoding')
+  return response
+
+
+def model_response(model: BaseModel, status: int = 200, stream: bool = False) -> Response:
+  """Returns a JSON response of the model, serialized in one pass directly into the response body, or if stream,
+  serialized chunk by chunk as the body is sent (see iter_json), for large models not otherwise serialized whole."""
+  if stream:
+    return json_response(iter_json(model), status)
+  with timed('serialize'):
+    body = dump_json(model)
+  return json_response(body, status)
+
+
+def compile_error_response(e: Exception) -> Response:
+  """Returns the error response for an exception from parsing or compiling a netlist, recording the outcome."""
+  result = compile_error_result(e)
+  g.outcome = result.errors[0].kind
+  return model_response(result, 400)
+
+
+# if set, compile requests are appended to this file as JSON lines, as a corpus for bench_load.py
+COMPILE_REQUEST_LOG = os.environ.get('COMPILE_REQUEST_LOG')
+compile_request_log_lock = threading.Lock()
+
+
+def log_compile_request() -> None:
+  try:
+    record = json.dumps({'path': request.full_path.rstrip('?'), 'body': json.loads(request.get_data())})
+  except ValueError:  # not JSON, not worth replaying
+    return
+  with compile_request_log_lock, open(COMPILE_REQUEST_LOG, 'a') as f:  # type: ignore
+    f.write(record + '\n')
+
+
+def parse_netlist() -> JsonNetlist:
+  if COMPILE_REQUEST_LOG:
+    log_compile_request()
+  with timed('validate'):
+    return parse_netlist_json(request.get_data())
+
 
-  return jsonify(result.model_dump())
+def requested_known_footprints() -> Optional[set[str]]:
+  """Parses the footprint caching protocol query params: with ?footprints=hash, footprint data is omitted and only
+  the library, name and hash are returned; ?knownFootprints=<hash>,<hash>,... omits data only for footprints the
+  client already has."""
+  if request.args.get('footprints') == 'hash':
+    return None
+  return set(filter(None, request.args.get('knownFootprints', '').split(',')))
+
+
+def with_known_footprints(result_json: bytes, known_footprints: Optional[set[str]],
+                          result: Optional[CompilerResult] = None) -> CompilerResult:
+  """Returns the result with footprint data omitted per the footprint caching params, parsed from result_json unless
+  the (modifiable) result is given."""
+  if result is None:
+    result = CompilerResult.model_validate_json(result_json)
+  if known_footprints != set():
+    omit_footprint_data(result.kicadFootprints, known_footprints)
+  return result
+
+
+@app.route("/compile", methods=['POST', 'OPTIONS'])
+@cross_origin(origins=['*'])
+def compile():
+  known_footprints = requested_known_footprints()
+  try:
+    artifacts = requested_artifacts()
+    json_netlist = parse_netlist()
+    result_json, result = compile_cached_result(json_netlist, artifacts)
+  except Exception as e:
+    return compile_error_response(e)
+
+  if known_footprints == set():  # no footprint data to omit, return the serialized result as-is
+    return json_response(result_json)
+  return model_response(with_known_footprints(result_json, known_footprints, result))
+
+
+def sse_event(event: str, data: Any) -> str:
+  return f"event: {event}\ndata: {json.dumps(to_jsonable_python(data), separators=(',', ':'))}\n\n"
+
+
+@app.route("/compile/stream", methods=['POST', 'OPTIONS'])
+@cross_origin(origins=['*'])
+def compile_stream():
+  """Streaming variant of /compile, returning server-sent events as each compile stage completes: one event per
+  stage (hdl, errors, kicadNetlist, bom, footprints, svgpcb, see COMPILE_STAGES) with the JSON value of the
+  corresponding CompilerResult field, followed by a done event. If compilation fails partway, an errors event
+  with the failure is sent before done. Takes the same artifact selection and footprint caching params as /compile,
+  only events for the selected artifacts are sent."""
+  known_footprints = requested_known_footprints()
+  try:
+    artifacts = requested_artifacts()
+    json_netlist = parse_netlist()
+  except (InvalidRequestError, ValidationError) as e:
+    return compile_error_response(e)
+
+  def generate() -> Iterator[str]:
+    cache_key, cached_result = compile_cache_lookup(json_netlist, artifacts)
+    stages: Iterable[Tuple[Optional[str], Any]]
+    if cached_result is not None:
+      result = CompilerResult.model_validate_json(cached_result)
+      stages = [(stage, getattr(result, field)) for stage, field in COMPILE_STAGES.items()
+                if artifacts is None or stage in artifacts]
+    else:  # a slow client only delays its own events, not the compile
+      stages = iter(run_compile_stages_queued(json_netlist, artifacts, cache_key).get, None)
+
+    try:
+      for stage, value in stages:
+        if stage is None:
+          raise value
+        if stage == 'footprints' and known_footprints != set():
+          value = [footprint.model_copy() for footprint in value]  # don't modify the cached data
+          omit_footprint_data(value, known_footprints)
+        yield sse_event(stage, value)
+    except Exception as e:
+      errors = compile_error_result(e).errors
+      g.outcome = errors[0].kind
+      yield sse_event('errors', errors)
+    yield sse_event('done', None)
+
+  g.compiling_in_stream = True  # the compile runs after the headers are sent, so no Server-Timing
+  response = app.response_class(stream_with_context(generate()), mimetype='text/event-stream')
+  response.headers['Cache-Control'] = 'no-cache'
+  response.headers['X-Accel-Buffering'] = 'no'  # don't buffer events in reverse proxies
+  return response
+
+
+# maximum variants in a /compile/sweep request
+COMPILE_SWEEP_MAX_VARIANTS = int(os.environ.get('COMPILE_SWEEP_MAX_VARIANTS', 64))
+
+
+@app.route("/compile/sweep", methods=['POST', 'OPTIONS'])
+@cross_origin(origins=['*'])
+def compile_sweep():
+  """Compiles variants of one netlist with different arg-param values, eg to compare BOMs, taking a SweepRequest:
+  {"netlist": <JsonNetlist>, "variants": [{"name": ..., "argParams": {<block name>: {<arg name>: <value>}}}]}.
+  The netlist is parsed and validated once, variants are compiled in parallel on the compile pool (if enabled), and
+  their results are cached individually. Returns a SweepResult, with a CompilerResult per variant (with the errors of
+  that variant, if it failed to compile) and the BOM lines whose quantities differ. Takes the same artifact selection
+  and footprint caching params as /compile, footprint data is only included in the first variant that uses it."""
+  known_footprints = requested_known_footprints()
+  try:
+    artifacts = requested_artifacts()
+    with timed('validate'):
+      sweep = SweepRequest.model_validate_json(request.get_data())
+    if not 0 < len(sweep.variants) <= COMPILE_SWEEP_MAX_VARIANTS:
+      raise InvalidRequestError(f"between 1 and {COMPILE_SWEEP_MAX_VARIANTS} variants required")
+    with timed('library_check'):
+      validation_errors = library_index.validate(sweep.netlist)
+    if validation_errors:
+      raise JsonNetlistValidationErrors(validation_errors)
+    variant_netlists = [apply_overrides(sweep.netlist, variant.argParams, library_index)
+                        for variant in sweep.variants]
+  except Exception as e:
+    return compile_error_response(e)
+
+  def compile_variant(netlist: JsonNetlist) -> CompilerResult:
+    try:
+      return CompilerResult.model_validate_json(compile_cached(netlist, artifacts, validated=True))
+    except Exception as e:
+      return compile_error_result(e)
+
+  # the in-process compiler is not thread-safe, so variants only run in parallel on the pool
+  with ThreadPoolExecutor(max(min(COMPILE_POOL_SIZE, len(variant_netlists)), 1)) as executor:
+    results = list(executor.map(compile_variant, variant_netlists))
+
+  sent_footprints = set(known_footprints) if known_footprints is not None else None
+  for result in results:
+    omit_footprint_data(result.kicadFootprints, sent_footprints)
+    if sent_footprints is not None:
+      sent_footprints.update(footprint.hash for footprint in result.kicadFootprints or [])
+  # variants are cached individually, so the combined result is streamed rather than serialized whole
+  return model_response(SweepResult(results=results, bomDiff=bom_diff([result.bom for result in results])),
+                        stream=True)
+
+
+# asynchronous compile jobs, queued and run on COMPILE_JOB_CONCURRENCY threads (which each either compile in-process or
+# dispatch to the compile pool), with up to COMPILE_JOB_QUEUE_SIZE jobs waiting before submissions are rejected
+COMPILE_JOB_CONCURRENCY = int(os.environ.get('COMPILE_JOB_CONCURRENCY', max(COMPILE_POOL_SIZE, 1)))
+COMPILE_JOB_QUEUE_SIZE = int(os.environ.get('COMPILE_JOB_QUEUE_SIZE', 16))
+COMPILE_JOB_RETRY_AFTER_S = 1  # Retry-After sent when the queue is full
+
+CompileJobArgs = Tuple[JsonNetlist, Optional[AbstractSet[str]]]  # netlist, artifacts
+compile_jobs: CompileJobQueue[CompileJobArgs, bytes] = CompileJobQueue(
+  lambda args: compile_cached(*args), COMPILE_JOB_CONCURRENCY, COMPILE_JOB_QUEUE_SIZE)
+atexit.register(compile_jobs.close)
+
+
+class CompileJobStatus(BaseModel):
+  id: str
+  status: str  # queued, running, done, failed, or cancelled
+  result: Optional[CompilerResult] = None  # if done or failed
+
+
+def compile_job_response(job: CompileJob[CompileJobArgs, bytes]) -> Response:
+  """Returns the job status, with its result if finished, taking the same footprint caching params as /compile."""
+  result: Optional[CompilerResult] = None
+  if job.status == CompileJob.DONE:
+    assert job.result is not None
+    result = with_known_footprints(job.result, requested_known_footprints())
+  elif job.status == CompileJob.FAILED:
+    assert job.error is not None
+    result = compile_error_result(job.error)  # type: ignore
+  return model_response(CompileJobStatus(id=job.id, status=job.status, result=result))
+
+
+@app.route("/compile/jobs", methods=['POST', 'OPTIONS'])
+@cross_origin(origins=['*'])
+def compile_job_submit():
+  # jobs submitted with ?session=<id> supersede (cancel) any still-queued jobs with the same session
+  try:
+    artifacts = requested_artifacts()
+    json_netlist = parse_netlist()
+  except (InvalidRequestError, ValidationError) as e:
+    return compile_error_response(e)
+
+  try:
+    job = compile_jobs.submit((json_netlist, artifacts), request.args.get('session'))
+  except JobQueueFull:
+    response = jsonify(compile_jobs.stats())
+    response.status_code = 429
+    response.headers['Retry-After'] = str(COMPILE_JOB_RETRY_AFTER_S)
+    return response
+
+  response = compile_job_response(job)
+  response.status_code = 202
+  response.headers['Location'] = f"/compile/jobs/{job.id}"
+  return response
+
+
+@app.route("/compile/jobs", methods=['GET'])
+@cross_origin(origins=['*'])
+def compile_job_stats():
+  return jsonify(compile_jobs.stats())
+
+
+@app.route("/compile/jobs/<job_id>", methods=['GET'])
+@cross_origin(origins=['*'])
+def compile_job_status(job_id: str):
+  job = compile_jobs.get(job_id)
+  if job is None:
+    return "unknown job", 404
+  return compile_job_response(job)
+
+
+@app.route("/compile/jobs/<job_id>", methods=['DELETE'])
+@cross_origin(origins=['*'])
+def compile_job_cancel(job_id: str):
+  job = compile_jobs.get(job_id)
+  if job is None:
+    return "unknown job", 404
+  if not compile_jobs.cancel(job_id):
+    response = compile_job_response(job)
+    response.status_code = 409  # already running or finished
+    return response
+  return compile_job_response(job)
+
+
+@app.route("/compile/cache", methods=['GET'])
+@cross_origin(origins=['*'])
+def compile_cache_stats():
+  return jsonify(compile_cache.stats())
+
+
+@app.route("/footprint/<hash>", methods=['GET'])
+@cross_origin(origins=['*'])
+def footprint(hash: str):
+  data = footprint_index.data_by_hash(hash)
+  if data is None:
+    return "unknown footprint", 404
+  if request.if_none_match.contains(hash):
+    response = app.response_class(status=304)
+  else:
+    response = app.response_class(data, mimetype='text/plain')
+  response.set_etag(hash)
+  response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'  # content-addressed
+  return response
+
+
+library_file = PrecompressedFile(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources/library.json'))
 
 
 @app.route("/library", methods=['GET'])
 @cross_origin(origins=['*'])
 def library():
-  with open("resources/library.json") as f:
-    return f.read()
+  snapshot = library_file.get()
+  encoding = request.accept_encodings.best_match([encoding for encoding in snapshot.variants if encoding != 'identity'])
+  if encoding is None:
+    encoding = 'identity'
+
+  if request.if_none_match.contains(snapshot.variant_etag(encoding)):
+    response = app.response_class(status=304)
+  else:
+    response = app.response_class(snapshot.variants[encoding], mimetype='application/json')
+    if encoding != 'identity':
+      response.headers['Content-Encoding'] = encoding
+  response.set_etag(snapshot.variant_etag(encoding))
+  response.vary.add('Accept-Encoding')
+  response.headers['Cache-Control'] = 'no-cache'  # cacheable, but must be revalidated with the ETag
+  return response
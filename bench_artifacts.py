@@ -0,0 +1,48 @@
+"""Benchmarks compile latency with artifact selection, reporting the latency saved by skipping each stage.
+Compiles in-process (without the compile cache), eg:
+  python bench_artifacts.py tests/BasicBlinky.json tests/IotSensorThing.json -n 5
+"""
+import argparse
+import statistics
+import time
+from typing import Optional, AbstractSet
+
+from netlist_compiler import JsonNetlist, compile_netlist, COMPILE_STAGES
+
+
+def time_compile(netlist: JsonNetlist, artifacts: Optional[AbstractSet[str]], repeats: int) -> float:
+  """Returns the median compile time in ms."""
+  times = []
+  for _ in range(repeats):
+    start = time.perf_counter()
+    compile_netlist(netlist, artifacts=artifacts)
+    times.append((time.perf_counter() - start) * 1000)
+  return statistics.median(times)
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('netlists', nargs='+', help="JsonNetlist files to compile")
+  parser.add_argument('-n', '--repeats', type=int, default=3, help="compiles per configuration, median is reported")
+  args = parser.parse_args()
+
+  all_stages = frozenset(COMPILE_STAGES.keys())
+  configurations = {
+    'all': None,
+    'hdl only': frozenset({'hdl'}),
+    'errors only': frozenset({'hdl', 'errors'}),
+  }
+  for stage in COMPILE_STAGES:
+    if stage != 'hdl':
+      configurations[f"skip {stage}"] = all_stages - {stage}
+
+  for netlist_path in args.netlists:
+    with open(netlist_path) as f:
+      netlist = JsonNetlist.model_validate_json(f.read())
+    compile_netlist(netlist)  # warm up the compiler
+
+    print(netlist_path)
+    full_ms = time_compile(netlist, None, args.repeats)
+    for name, artifacts in configurations.items():
+      ms = full_ms if artifacts is None else time_compile(netlist, artifacts, args.repeats)
+      print(f"  {name:<20} {ms:8.1f} ms  (saves {full_ms - ms:7.1f} ms)")
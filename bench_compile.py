@@ -0,0 +1,157 @@
+"""Compile latency benchmark over the tests/*.json fixture designs.
+Each fixture is compiled repeatedly, in cold mode (each compile in a fresh process, including imports and compiler
+startup) and warm mode (repeated compiles in one process, after a warm-up compile), recording the wall time of each
+compile stage (see metrics.timed) and the total. p50/p95/p99 are reported per mode, fixture and stage.
+
+Results can be saved as a baseline, and later runs compared against it, failing (exit code 1) if any stage regresses
+beyond the threshold, eg:
+  python bench_compile.py --save-baseline bench_baseline.json
+  python bench_compile.py --baseline bench_baseline.json --threshold 0.2
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Sequence, Tuple
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests')
+PERCENTILES = (50, 95, 99)
+
+# mode -> fixture -> stage -> list of seconds
+Samples = Dict[str, Dict[str, Dict[str, List[float]]]]
+# mode -> fixture -> stage -> {'p50': ms, ...}
+Summary = Dict[str, Dict[str, Dict[str, Dict[str, float]]]]
+
+
+def percentile(values: Sequence[float], p: float) -> float:
+  """Returns the p-th percentile of values, linearly interpolated between the closest ranks."""
+  ordered = sorted(values)
+  rank = (len(ordered) - 1) * p / 100
+  lower = int(rank)
+  upper = min(lower + 1, len(ordered) - 1)
+  return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def compile_timings(netlist_path: str) -> List[Tuple[str, float]]:
+  """Compiles the netlist in this process, returning the (stage, seconds) timings including the total."""
+  from metrics import collect_timings, timed
+  from netlist_compiler import JsonNetlist, compile_netlist
+
+  with open(netlist_path) as f:
+    netlist_data = f.read()
+  start = time.perf_counter()
+  with collect_timings() as timings:
+    with timed('validate'):
+      netlist = JsonNetlist.model_validate_json(netlist_data)
+    compile_netlist(netlist)
+  return timings + [('total', time.perf_counter() - start)]
+
+
+def add_timings(samples: Dict[str, List[float]], timings: List[Tuple[str, float]]) -> None:
+  for stage, seconds in timings:
+    samples.setdefault(stage, []).append(seconds)
+
+
+def run_benchmark(fixtures: List[str], cold_repeats: int, warm_repeats: int) -> Samples:
+  samples: Samples = {'cold': {}, 'warm': {}}
+  for fixture_path in fixtures:
+    fixture = os.path.basename(fixture_path)
+    print(f"{fixture}: ", end='', flush=True)
+    cold_samples: Dict[str, List[float]] = {}
+    warm_samples: Dict[str, List[float]] = {}
+    try:
+      for _ in range(cold_repeats):  # separate process per compile, so nothing is warmed up
+        process = subprocess.run([sys.executable, __file__, '--cold-worker', fixture_path],
+                                 capture_output=True, text=True)
+        if process.returncode != 0:
+          raise RuntimeError(process.stderr.strip().splitlines()[-1])
+        add_timings(cold_samples, json.loads(process.stdout.strip().splitlines()[-1]))
+        print('c', end='', flush=True)
+
+      if warm_repeats:
+        compile_timings(fixture_path)  # warm-up
+        for _ in range(warm_repeats):
+          add_timings(warm_samples, compile_timings(fixture_path))
+          print('w', end='', flush=True)
+    except Exception as e:  # skip fixtures that fail to compile, rather than losing the whole run
+      print(f" failed: {e}")
+      continue
+    print()
+
+    if cold_samples:
+      samples['cold'][fixture] = cold_samples
+    if warm_samples:
+      samples['warm'][fixture] = warm_samples
+  return samples
+
+
+def summarize(samples: Samples) -> Summary:
+  return {mode: {fixture: {stage: {f"p{p}": percentile(values, p) * 1000 for p in PERCENTILES}
+                           for stage, values in stages.items()}
+                 for fixture, stages in fixtures.items()}
+          for mode, fixtures in samples.items()}
+
+
+def find_regressions(summary: Summary, baseline: Summary, threshold: float, min_delta_ms: float) -> List[str]:
+  """Returns descriptions of stages where any percentile is slower than the baseline by more than the threshold
+  (relative) and min_delta_ms (absolute, to ignore noise in fast stages), or fixtures that no longer compile."""
+  regressions = []
+  for mode, fixtures in baseline.items():
+    for fixture in fixtures:
+      if fixture not in summary.get(mode, {}):
+        regressions.append(f"{mode} {fixture}: missing, failed to compile")
+  for mode, fixtures in summary.items():
+    for fixture, stages in fixtures.items():
+      for stage, percentiles in stages.items():
+        baseline_percentiles = baseline.get(mode, {}).get(fixture, {}).get(stage)
+        if baseline_percentiles is None:
+          continue
+        for name, ms in percentiles.items():
+          baseline_ms = baseline_percentiles.get(name)
+          if baseline_ms is not None and ms - baseline_ms > max(baseline_ms * threshold, min_delta_ms):
+            regressions.append(f"{mode} {fixture} {stage} {name}: {baseline_ms:.1f} -> {ms:.1f} ms")
+  return regressions
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('fixtures', nargs='*', help="JsonNetlist files, defaults to tests/*.json")
+  parser.add_argument('--cold', type=int, default=3, help="cold compiles per fixture")
+  parser.add_argument('--warm', type=int, default=10, help="warm compiles per fixture")
+  parser.add_argument('--output', help="write the summary (mode -> fixture -> stage -> percentile ms) as JSON")
+  parser.add_argument('--save-baseline', help="write the summary as the baseline to compare future runs against")
+  parser.add_argument('--baseline', help="baseline file to compare against, failing on regressions")
+  parser.add_argument('--threshold', type=float, default=0.2, help="relative slowdown considered a regression")
+  parser.add_argument('--min-delta-ms', type=float, default=5.0, help="absolute slowdown considered a regression")
+  parser.add_argument('--cold-worker', help=argparse.SUPPRESS)  # internal, compile one fixture and print timings
+  args = parser.parse_args()
+
+  if args.cold_worker:
+    print(json.dumps(compile_timings(args.cold_worker)))
+    sys.exit(0)
+
+  fixtures = args.fixtures or sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.json')))
+  summary = summarize(run_benchmark(fixtures, args.cold, args.warm))
+
+  for mode, mode_fixtures in summary.items():
+    for fixture, stages in mode_fixtures.items():
+      print(f"{mode} {fixture}")
+      for stage, percentiles in stages.items():
+        print(f"  {stage:<20} " + '  '.join(f"{name} {ms:9.1f} ms" for name, ms in percentiles.items()))
+
+  for path in filter(None, [args.output, args.save_baseline]):
+    with open(path, 'w') as f:
+      json.dump(summary, f, indent=2, sort_keys=True)
+
+  if args.baseline:
+    with open(args.baseline) as f:
+      baseline = json.load(f)
+    regressions = find_regressions(summary, baseline, args.threshold, args.min_delta_ms)
+    for regression in regressions:
+      print(f"REGRESSION {regression}")
+    if regressions:
+      sys.exit(1)
+    print("no regressions against baseline")
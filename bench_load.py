@@ -0,0 +1,235 @@
+"""Load-replay harness for the compile server.
+Replays a corpus of recorded compile requests (JSON lines, as written by the server with COMPILE_REQUEST_LOG set,
+each {"path": "/compile?...", "body": <JsonNetlist>}, or bare JsonNetlist objects which are posted to /compile)
+against a server, with a fixed concurrency and optionally a (Poisson) arrival rate. Reports throughput, latency
+percentiles, error rate, and, for a locally started server, its RSS (including worker processes) over time, eg:
+  python bench_load.py corpus.jsonl --start-server --concurrency 4 --rate 2 --duration 60
+  python bench_load.py --fixtures --url http://localhost:7761 --concurrency 8 --requests 200
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import List, NamedTuple, Optional, Tuple
+
+from bench_compile import percentile, FIXTURES_DIR
+
+
+class ReplayRequest(NamedTuple):
+  path: str
+  body: bytes
+
+
+class ReplayResult(NamedTuple):
+  start: float  # relative to the start of the run, in seconds
+  latency: float  # seconds
+  status: int  # HTTP status, or 0 for connection errors
+
+
+def load_corpus(corpus_path: Optional[str], fixtures: bool) -> List[ReplayRequest]:
+  corpus = []
+  if corpus_path is not None:
+    with open(corpus_path) as f:
+      for line in f:
+        if not line.strip():
+          continue
+        record = json.loads(line)
+        if 'body' in record:
+          corpus.append(ReplayRequest(record.get('path', '/compile'), json.dumps(record['body']).encode('utf-8')))
+        else:
+          corpus.append(ReplayRequest('/compile', json.dumps(record).encode('utf-8')))
+  if fixtures:
+    for fixture_path in sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.json'))):
+      with open(fixture_path, 'rb') as f:
+        corpus.append(ReplayRequest('/compile', f.read()))
+  return corpus
+
+
+def tree_rss_bytes(pid: int) -> int:
+  """Returns the total RSS of the process and its descendants (eg, compile pool workers), Linux only."""
+  total = 0
+  pids = [pid]
+  while pids:
+    pid = pids.pop()
+    try:
+      with open(f'/proc/{pid}/statm') as f:
+        total += int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+      for task in os.listdir(f'/proc/{pid}/task'):
+        with open(f'/proc/{pid}/task/{task}/children') as f:
+          pids.extend(int(child) for child in f.read().split())
+    except (OSError, ValueError):  # process exited
+      pass
+  return total
+
+
+def start_server(port: int, env: List[str]) -> subprocess.Popen:
+  server_env = dict(os.environ)
+  for entry in env:
+    name, value = entry.split('=', 1)
+    server_env[name] = value
+  server = subprocess.Popen([sys.executable, '-m', 'flask', '--app', 'app', 'run', '--port', str(port)],
+                            cwd=os.path.dirname(os.path.abspath(__file__)), env=server_env)
+  url = f"http://127.0.0.1:{port}"
+  for _ in range(600):  # imports (and pool warm-up) may take a while
+    try:
+      urllib.request.urlopen(f"{url}/version", timeout=1).read()
+      return server
+    except (urllib.error.URLError, OSError):
+      if server.poll() is not None:
+        raise RuntimeError(f"server exited with {server.returncode}")
+      time.sleep(0.5)
+  server.kill()
+  raise RuntimeError("server did not start")
+
+
+def send(url: str, request: ReplayRequest, timeout: float) -> int:
+  http_request = urllib.request.Request(url + request.path, data=request.body, method='POST',
+                                        headers={'Content-Type': 'application/json'})
+  try:
+    with urllib.request.urlopen(http_request, timeout=timeout) as response:
+      response.read()
+      return response.status
+  except urllib.error.HTTPError as e:
+    return e.code
+  except (urllib.error.URLError, OSError):
+    return 0
+
+
+def run_load(url: str, corpus: List[ReplayRequest], concurrency: int, rate: float, total_requests: Optional[int],
+             duration: Optional[float], timeout: float, seed: int) -> List[ReplayResult]:
+  """Replays the corpus in order (cycling) on concurrency threads. With a rate, requests arrive as a Poisson process
+  (open loop, and latency includes time queued for a free thread); otherwise each thread sends back-to-back."""
+  rng = random.Random(seed)
+  lock = threading.Lock()
+  results: List[ReplayResult] = []
+  next_index = [0]
+  next_arrival = [0.0]
+  start = time.perf_counter()
+
+  def next_request() -> Optional[Tuple[ReplayRequest, float]]:
+    with lock:
+      if total_requests is not None and next_index[0] >= total_requests:
+        return None
+      if duration is not None and time.perf_counter() - start >= duration:
+        return None
+      request = corpus[next_index[0] % len(corpus)]
+      next_index[0] += 1
+      if rate > 0:
+        next_arrival[0] += rng.expovariate(rate)
+        return request, start + next_arrival[0]
+      return request, time.perf_counter()
+
+  def worker() -> None:
+    while True:
+      next = next_request()
+      if next is None:
+        return
+      request, arrival = next
+      delay = arrival - time.perf_counter()
+      if delay > 0:
+        time.sleep(delay)
+      status = send(url, request, timeout)
+      end = time.perf_counter()
+      with lock:
+        results.append(ReplayResult(arrival - start, end - arrival, status))
+
+  threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  return results
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('corpus', nargs='?', help="JSON lines of recorded compile requests")
+  parser.add_argument('--fixtures', action='store_true', help="also replay the tests/*.json fixtures")
+  parser.add_argument('--url', help="server to load, defaults to the locally started server")
+  parser.add_argument('--start-server', action='store_true', help="start app.py locally, and monitor its RSS")
+  parser.add_argument('--port', type=int, default=7762, help="port for the locally started server")
+  parser.add_argument('--server-env', action='append', default=[], help="NAME=VALUE for the local server, eg "
+                                                                        "COMPILE_POOL_SIZE=2, may be repeated")
+  parser.add_argument('--concurrency', type=int, default=4, help="concurrent requests")
+  parser.add_argument('--rate', type=float, default=0, help="arrival rate in requests/s, 0 for back-to-back")
+  parser.add_argument('--requests', type=int, help="total requests to send")
+  parser.add_argument('--duration', type=float, help="seconds to send requests for")
+  parser.add_argument('--timeout', type=float, default=300, help="per-request timeout in seconds")
+  parser.add_argument('--rss-interval', type=float, default=1.0, help="seconds between server RSS samples")
+  parser.add_argument('--seed', type=int, default=0, help="arrival process random seed")
+  parser.add_argument('--output', help="write the report as JSON")
+  args = parser.parse_args()
+
+  corpus = load_corpus(args.corpus, args.fixtures)
+  if not corpus:
+    parser.error("no requests to replay, specify a corpus and/or --fixtures")
+  if args.requests is None and args.duration is None:
+    args.requests = len(corpus)
+
+  server: Optional[subprocess.Popen] = None
+  url = args.url
+  if args.start_server:
+    server = start_server(args.port, args.server_env)
+    url = url or f"http://127.0.0.1:{args.port}"
+  if url is None:
+    parser.error("specify --url or --start-server")
+
+  rss_samples: List[Tuple[float, int]] = []  # (time since start, bytes)
+  stop_rss = threading.Event()
+
+  def sample_rss() -> None:
+    assert server is not None
+    start = time.perf_counter()
+    while not stop_rss.is_set():
+      rss_samples.append((time.perf_counter() - start, tree_rss_bytes(server.pid)))
+      stop_rss.wait(args.rss_interval)
+
+  rss_thread = threading.Thread(target=sample_rss, daemon=True)
+  if server is not None:
+    rss_thread.start()
+
+  try:
+    run_start = time.perf_counter()
+    results = run_load(url, corpus, args.concurrency, args.rate, args.requests, args.duration, args.timeout,
+                       args.seed)
+    elapsed = time.perf_counter() - run_start
+  finally:
+    stop_rss.set()
+    if server is not None:
+      rss_thread.join()
+      server.terminate()
+      server.wait()
+
+  latencies = [result.latency for result in results]
+  errors = [result for result in results if not 200 <= result.status < 300]
+  throughput_rps = len(results) / elapsed if elapsed else 0
+  error_rate = len(errors) / len(results) if results else 0
+  statuses = {str(status): sum(1 for result in results if result.status == status)
+              for status in sorted({result.status for result in results})}
+  latency_ms = {f"p{p}": percentile(latencies, p) * 1000 for p in (50, 95, 99)} if latencies else {}
+  rss_mb = [[round(t, 1), round(rss / 1024 / 1024, 1)] for t, rss in rss_samples]
+  report = {
+    'requests': len(results),
+    'elapsedS': elapsed,
+    'throughputRps': throughput_rps,
+    'errorRate': error_rate,
+    'statuses': statuses,
+    'latencyMs': latency_ms,
+    'rssMb': rss_mb,
+  }
+
+  print(f"{len(results)} requests in {elapsed:.1f} s, {throughput_rps:.2f} req/s, "
+        f"error rate {error_rate:.1%} {statuses}")
+  print("latency " + '  '.join(f"{name} {ms:.1f} ms" for name, ms in latency_ms.items()))
+  if rss_samples:
+    print(f"server RSS start {rss_mb[0][1]} MB, peak {max(rss for t, rss in rss_mb)} MB, end {rss_mb[-1][1]} MB")
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(report, f, indent=2)
@@ -0,0 +1,74 @@
+"""Micro-benchmark of JsonNetlist parsing: the full model (JsonNetlist.model_validate_json) against the fast path
+(parse_netlist_json), which skips the fields the compiler ignores. Reports the median time and the peak Python heap
+allocation (tracemalloc) of each parser on the tests/*.json fixtures and on synthetic designs (see synthetic_design.py)
+of each --sizes, with --canvas bytes of per-block UI state added to graphUIData to model large editor canvases, eg:
+  python bench_parse.py
+  python bench_parse.py --sizes 1000 10000 --canvas 2000 -n 5
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+from netweaver_interface import JsonNetlist, parse_netlist_json
+from bench_compile import FIXTURES_DIR
+from synthetic_design import load_library, synthetic_netlist
+
+PARSERS: Dict[str, Callable[[bytes], JsonNetlist]] = {
+  'JsonNetlist.model_validate_json': JsonNetlist.model_validate_json,
+  'parse_netlist_json': parse_netlist_json,
+}
+
+
+def with_canvas(netlist_json: bytes, canvas_bytes: int) -> bytes:
+  """Returns the netlist with about canvas_bytes of UI state per block in graphUIData, as an editor may store."""
+  netlist = json.loads(netlist_json)
+  ui_state = {'position': [0.0, 0.0], 'size': [120.0, 80.0], 'collapsed': False,
+              'sockets': [[float(i), float(i)] for i in range(max(canvas_bytes // 24, 1))]}
+  netlist['graphUIData'] = {'nodes': {node_id: ui_state for node_id in netlist['graph']['nodes']}}
+  return json.dumps(netlist).encode('utf-8')
+
+
+def measure(parse: Callable[[bytes], JsonNetlist], data: bytes, repeats: int) -> Tuple[float, int]:
+  """Returns the median time in ms and the peak traced allocation in bytes of parsing the data."""
+  times = []
+  for _ in range(repeats):
+    start = time.perf_counter()
+    parse(data)
+    times.append((time.perf_counter() - start) * 1000)
+  tracemalloc.start()
+  parse(data)
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+  return statistics.median(times), peak
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--sizes', type=int, nargs='*', default=[100, 1000, 10000], help="synthetic design sizes")
+  parser.add_argument('--canvas', type=int, default=1000, help="graphUIData bytes per block in synthetic designs")
+  parser.add_argument('-n', '--repeats', type=int, default=20, help="parses per parser, median is reported")
+  args = parser.parse_args()
+
+  inputs: List[Tuple[str, bytes]] = []
+  for fixture_path in sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.json'))):
+    with open(fixture_path, 'rb') as f:
+      inputs.append((os.path.basename(fixture_path), f.read()))
+  library = load_library()
+  for blocks in args.sizes:
+    netlist_json = synthetic_netlist(blocks, library=library).model_dump_json().encode('utf-8')
+    inputs.append((f"synthetic {blocks} blocks", netlist_json))
+    if args.canvas:
+      inputs.append((f"synthetic {blocks} blocks + canvas", with_canvas(netlist_json, args.canvas)))
+
+  for name, data in inputs:
+    print(f"{name} ({len(data) / 1024:.0f} KiB)")
+    baseline_ms = None
+    for parser_name, parse in PARSERS.items():
+      ms, peak = measure(parse, data, args.repeats)
+      baseline_ms = baseline_ms or ms
+      print(f"  {parser_name:<32} {ms:9.2f} ms ({baseline_ms / ms:4.1f}x)  peak {peak / 1024:8.0f} KiB")
@@ -0,0 +1,175 @@
+"""Scaling benchmark of the compile stages against design size, over synthetic designs (see synthetic_design.py) of
+10 to 10,000 blocks. Reports the median time and the peak Python heap allocation (tracemalloc, so excluding the
+JVM) of each stage per size, and the scaling exponent between consecutive sizes (time ~ blocks^k), flagging stages
+with k above --superlinear. By default only the Python stages before the Scala compile are run (validate, index, design,
+hdl); --compile also runs the full compile (see metrics.timed for its stages), which needs the JVM, eg:
+  python bench_scaling.py
+  python bench_scaling.py --sizes 10 100 1000 --compile --plot scaling.png --output scaling.json
+"""
+import argparse
+import json
+import math
+import statistics
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+from metrics import collect_timings, set_timings_collector, timed
+from netlist_compiler import compile_netlist
+from netweaver_interface import parse_netlist_json
+from hdl_generator import NetlistIndex, netlist_design, tohdl_design
+from synthetic_design import PATTERNS, load_library, synthetic_netlist
+
+DEFAULT_SIZES = [10, 30, 100, 300, 1000, 3000, 10000]
+
+# stage -> blocks -> value
+Results = Dict[str, Dict[int, float]]
+
+
+class _PeakMemoryCollector(list):
+  """Timings collector (see metrics.set_timings_collector) that records the peak traced allocation during each
+  stage, above what was allocated when the previous stage ended, instead of its duration."""
+  def __init__(self) -> None:
+    super().__init__()
+    self._base = 0
+
+  def append(self, timing: Tuple[str, float]) -> None:
+    current, peak = tracemalloc.get_traced_memory()
+    super().append((timing[0], float(peak - self._base)))
+    tracemalloc.reset_peak()
+    self._base = current
+
+
+def run_stages(netlist_json: bytes, full_compile: bool) -> None:
+  with timed('validate'):
+    netlist = parse_netlist_json(netlist_json)
+  with timed('index'):
+    index = NetlistIndex(netlist)
+  with timed('design'):
+    design = netlist_design(netlist, index)
+  with timed('hdl'):
+    tohdl_design(design)
+  if full_compile:
+    compile_netlist(netlist)
+
+
+def measure_time(run: Callable[[], None], repeats: int) -> Dict[str, float]:
+  """Returns the median seconds per stage over the repeats."""
+  samples: Dict[str, List[float]] = {}
+  for _ in range(repeats):
+    with collect_timings() as timings:
+      run()
+    for stage, seconds in timings:
+      samples.setdefault(stage, []).append(seconds)
+  return {stage: statistics.median(values) for stage, values in samples.items()}
+
+
+def measure_memory(run: Callable[[], None]) -> Dict[str, float]:
+  """Returns the peak bytes allocated by each stage, from one run."""
+  peaks = _PeakMemoryCollector()
+  tracemalloc.start()
+  prev = set_timings_collector(peaks)
+  try:
+    run()
+  finally:
+    set_timings_collector(prev)
+    tracemalloc.stop()
+  return dict(peaks)
+
+
+def scaling_exponents(results: Results) -> Dict[str, Dict[int, float]]:
+  """Returns, per stage, the exponent k of value ~ blocks^k between each size and the previous one."""
+  exponents: Dict[str, Dict[int, float]] = {}
+  for stage, values in results.items():
+    sizes = sorted(values)
+    for prev_size, size in zip(sizes, sizes[1:]):
+      if values[prev_size] > 0 and values[size] > 0:
+        exponents.setdefault(stage, {})[size] = \
+          math.log(values[size] / values[prev_size]) / math.log(size / prev_size)
+  return exponents
+
+
+def plot(times: Results, memory: Results, path: str) -> None:
+  import matplotlib  # optional, only for --plot
+  matplotlib.use('Agg')
+  import matplotlib.pyplot as plt
+
+  fig, (time_ax, memory_ax) = plt.subplots(1, 2, figsize=(12, 5))
+  for ax, results, scale, ylabel in [(time_ax, times, 1000, 'time (ms)'),
+                                     (memory_ax, memory, 1 / 1024 / 1024, 'peak Python heap (MiB)')]:
+    for stage, values in results.items():
+      sizes = sorted(values)
+      ax.plot(sizes, [values[size] * scale for size in sizes], marker='o', label=stage)
+    ax.set_xscale('log')
+    ax.set_yscale('log')
+    ax.set_xlabel('blocks')
+    ax.set_ylabel(ylabel)
+    ax.legend(fontsize='small')
+  fig.tight_layout()
+  fig.savefig(path)
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="design sizes, in blocks")
+  parser.add_argument('--patterns', nargs='+', choices=PATTERNS, default=list(PATTERNS), help="tile patterns")
+  parser.add_argument('-n', '--repeats', type=int, default=3, help="timed runs per size, median is reported")
+  parser.add_argument('--compile', action='store_true', help="also run the full compile, needs the JVM")
+  parser.add_argument('--no-memory', action='store_true', help="skip the (slower) tracemalloc pass")
+  parser.add_argument('--superlinear', type=float, default=1.2, help="scaling exponent flagged as superlinear")
+  parser.add_argument('--output', help="write the results as JSON")
+  parser.add_argument('--plot', help="plot time and memory per stage to this image, needs matplotlib")
+  args = parser.parse_args()
+
+  library = load_library()
+  times: Results = {}
+  memory: Results = {}
+  design_stats: Dict[int, Dict[str, int]] = {}
+  for blocks in sorted(args.sizes):
+    start = time.perf_counter()
+    netlist = synthetic_netlist(blocks, args.patterns, library)
+    netlist_json = netlist.model_dump_json().encode('utf-8')
+    design_stats[blocks] = {'labels': len(netlist.labels), 'bytes': len(netlist_json)}
+    print(f"{blocks} blocks, {len(netlist.labels)} labels, {len(netlist_json) / 1024:.0f} KiB: ", end='', flush=True)
+
+    def run() -> None:
+      run_stages(netlist_json, args.compile)
+
+    try:
+      run()  # warm-up
+      size_times = measure_time(run, args.repeats)
+      size_memory: Optional[Dict[str, float]] = None if args.no_memory else measure_memory(run)
+    except Exception as e:  # eg, no JVM, or the design fails to compile at this size
+      print(f"failed: {e!r}")
+      continue
+    print(f"{time.perf_counter() - start:.1f} s")
+
+    for stage, seconds in size_times.items():
+      times.setdefault(stage, {})[blocks] = seconds
+    for stage, peak in (size_memory or {}).items():
+      memory.setdefault(stage, {})[blocks] = peak
+
+  time_exponents = scaling_exponents(times)
+  memory_exponents = scaling_exponents(memory)
+  for stage, values in times.items():
+    print(stage)
+    for blocks, seconds in sorted(values.items()):
+      line = f"  {blocks:>6} blocks {seconds * 1000:10.1f} ms"
+      if blocks in memory.get(stage, {}):
+        line += f"  peak {memory[stage][blocks] / 1024:10.0f} KiB"
+      exponent = time_exponents.get(stage, {}).get(blocks)
+      if exponent is not None:
+        superlinear = exponent > args.superlinear and seconds >= 0.001  # exponents of sub-ms stages are noise
+        line += f"  k={exponent:.2f}" + (" SUPERLINEAR" if superlinear else "")
+      print(line)
+
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump({'designs': design_stats,
+                 'timeMs': {stage: {blocks: seconds * 1000 for blocks, seconds in values.items()}
+                            for stage, values in times.items()},
+                 'peakBytes': memory,
+                 'timeExponents': time_exponents,
+                 'memoryExponents': memory_exponents}, f, indent=2)
+  if args.plot:
+    plot(times, memory, args.plot)
@@ -0,0 +1,89 @@
+"""Micro-benchmark of CompilerResult response serialization: the previous jsonify(result.model_dump()), which builds
+a dict and then re-encodes it, against single-pass serialization (see serialization.py) and orjson if installed, and
+the streamed writer (iter_json) with and without gzip, whose chunks are consumed without joining as when sent.
+Reports the median time and the peak Python heap allocation (tracemalloc) of each method per result.
+Results are compiled from the tests/*.json fixtures, or loaded from saved /compile responses, eg:
+  python bench_serialization.py
+  python bench_serialization.py --results saved_response.json -n 50
+"""
+import argparse
+import glob
+import os
+import statistics
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from flask import Flask, jsonify
+from pydantic_core import to_json
+
+from netlist_compiler import CompilerResult, JsonNetlist, compile_netlist
+from bench_compile import FIXTURES_DIR
+from compression import compress_stream
+from serialization import iter_json
+
+try:
+  import orjson  # type: ignore
+except ImportError:
+  orjson = None  # type: ignore
+
+
+def load_results(result_paths: List[str]) -> List[Tuple[str, CompilerResult]]:
+  results = []
+  if result_paths:
+    for path in result_paths:
+      with open(path, 'rb') as f:
+        results.append((os.path.basename(path), CompilerResult.model_validate_json(f.read())))
+  else:
+    for fixture_path in sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.json'))):
+      with open(fixture_path) as f:
+        netlist = JsonNetlist.model_validate_json(f.read())
+      try:
+        results.append((os.path.basename(fixture_path), compile_netlist(netlist)))
+      except Exception as e:
+        print(f"{os.path.basename(fixture_path)}: failed to compile, skipped: {e!r}")
+  return results
+
+
+def consume(chunks: Iterable[bytes]) -> int:
+  return sum(len(chunk) for chunk in chunks)
+
+
+def measure(method: Callable[[CompilerResult], object], result: CompilerResult, repeats: int) -> Tuple[float, int]:
+  """Returns the median time in ms and the peak traced allocation in bytes of serializing the result."""
+  times = []
+  for _ in range(repeats):
+    start = time.perf_counter()
+    method(result)
+    times.append((time.perf_counter() - start) * 1000)
+  tracemalloc.start()
+  method(result)
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+  return statistics.median(times), peak
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--results', nargs='*', default=[], help="saved CompilerResult JSON files, instead of "
+                                                                "compiling the fixtures")
+  parser.add_argument('-n', '--repeats', type=int, default=20, help="serializations per method, median is reported")
+  args = parser.parse_args()
+
+  app = Flask(__name__)
+  methods: Dict[str, Callable[[CompilerResult], object]] = {
+    'jsonify(model_dump())': lambda result: jsonify(result.model_dump()).get_data(),
+    'model_dump_json()': lambda result: result.model_dump_json().encode('utf-8'),
+    'to_json() (pydantic)': lambda result: to_json(result),
+  }
+  if orjson is not None:
+    methods['orjson.dumps(model_dump())'] = lambda result: orjson.dumps(result.model_dump())
+  methods['iter_json() (streamed)'] = lambda result: consume(iter_json(result))
+  methods['iter_json() + gzip stream'] = lambda result: consume(compress_stream(iter_json(result), 'gzip'))
+
+  with app.app_context():
+    for name, result in load_results(args.results):
+      print(f"{name} ({len(to_json(result)) / 1024:.0f} KiB)")
+      for method_name, method in methods.items():
+        ms, peak = measure(method, result, args.repeats)
+        print(f"  {method_name:<28} {ms:8.2f} ms  peak {peak / 1024:8.0f} KiB")
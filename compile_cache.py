@@ -0,0 +1,230 @@
+import glob
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple, Dict
+
+from netweaver_interface import JsonNetlist
+
+
+LIBRARY_JSON_PATH = os.path.join(os.path.dirname(__file__), 'resources', 'library.json')
+POLYMORPHIC_BLOCKS_PATH = os.path.join(os.path.dirname(__file__), 'PolymorphicBlocks')
+# on-disk cache directory, or empty to only cache in memory
+COMPILE_CACHE_DIR = os.environ.get('COMPILE_CACHE_DIR', os.path.join(os.path.dirname(__file__), '.compile_cache')) \
+  or None
+# increment when the CompilerResult format or contents change, to invalidate old entries
+# 2: generated classes (eg, in KiCad netlist sheet files) moved from builtins to netweaver_generated
+COMPILE_CACHE_FORMAT = 2
+
+# fields of JsonNodePort that do not affect compilation
+_IGNORED_PORT_FIELDS = {'leftRightUpDown', 'srcSinkBi'}
+
+
+def netlist_hash(netlist: JsonNetlist) -> str:
+  """Returns a canonical hash of the parts of the JsonNetlist that affect compilation.
+  graphUIData, the unused nets, and label IDs are ignored, and object keys are canonicalized.
+  Node and label order are preserved, since they determine block declaration order (and refdes)
+  and connection port order in the generated HDL."""
+  canonical = {
+    'nodes': [[node_id, node.data.model_dump(exclude={'ports': {'__all__': _IGNORED_PORT_FIELDS}})]
+              for node_id, node in netlist.graph.nodes.items()],
+    'labels': [label.model_dump() for label in netlist.labels.values()],
+  }
+  canonical_str = json.dumps(canonical, sort_keys=True, separators=(',', ':'))
+  return hashlib.sha256(canonical_str.encode('utf-8')).hexdigest()
+
+
+def _polymorphic_blocks_revision() -> str:
+  """Returns the git revision of the PolymorphicBlocks submodule, or if that isn't resolvable (eg, when copied
+  into a container without git metadata) a fingerprint of its source files."""
+  try:
+    git_path = os.path.join(POLYMORPHIC_BLOCKS_PATH, '.git')
+    if os.path.isfile(git_path):  # submodule, .git is a pointer to the actual git dir
+      with open(git_path) as f:
+        git_dir = f.read().strip().removeprefix('gitdir:').strip()
+      git_path = os.path.join(POLYMORPHIC_BLOCKS_PATH, git_dir)
+    with open(os.path.join(git_path, 'HEAD')) as f:
+      head = f.read().strip()
+    if head.startswith('ref:'):
+      with open(os.path.join(git_path, head.removeprefix('ref:').strip())) as f:
+        head = f.read().strip()
+    return head
+  except OSError:
+    pass
+
+  fingerprint = hashlib.sha256()
+  for dirpath, dirnames, filenames in os.walk(POLYMORPHIC_BLOCKS_PATH):
+    dirnames.sort()
+    for filename in sorted(filenames):
+      if filename.endswith('.py') or filename.endswith('.jar'):
+        stat = os.stat(os.path.join(dirpath, filename))
+        fingerprint.update(f"{dirpath}/{filename}:{stat.st_size}:{stat.st_mtime_ns};".encode('utf-8'))
+  return fingerprint.hexdigest()
+
+
+def _server_revision() -> str:
+  """Returns a fingerprint of this server's sources (excluding tests and benchmarks), so changes to how results are
+  generated invalidate cached results without bumping COMPILE_CACHE_FORMAT."""
+  fingerprint = hashlib.sha256()
+  for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py'))):
+    filename = os.path.basename(path)
+    if filename.startswith('test_') or filename.startswith('bench_'):
+      continue
+    with open(path, 'rb') as f:
+      fingerprint.update(f"{filename}:".encode('utf-8') + hashlib.sha256(f.read()).digest())
+  return fingerprint.hexdigest()
+
+
+class CompileCache:
+  """Two-tier (in-memory LRU and on-disk gzip) cache of serialized CompilerResult JSON, keyed by the canonical
+  netlist hash and the compiler version (library.json contents, PolymorphicBlocks revision and server sources).
+  Thread-safe."""
+  def __init__(self, cache_dir: Optional[str] = COMPILE_CACHE_DIR,
+               max_memory_bytes: int = 64 * 1024 * 1024, max_disk_bytes: int = 1024 * 1024 * 1024,
+               max_age_s: float = 7 * 24 * 60 * 60):
+    self._cache_dir = cache_dir  # None disables the disk tier
+    self._max_memory_bytes = max_memory_bytes
+    self._max_disk_bytes = max_disk_bytes
+    self._max_age_s = max_age_s
+
+    self._lock = threading.Lock()
+    self._memory: OrderedDict[str, Tuple[bytes, float]] = OrderedDict()  # key -> (result JSON, creation time)
+    self._memory_bytes = 0
+    self._disk: Dict[str, Tuple[int, float]] = {}  # key -> (file size, creation time), oldest first
+    self._disk_bytes = 0
+
+    self.memory_hits = 0
+    self.disk_hits = 0
+    self.misses = 0
+    self.evictions = 0
+
+    self._revision = f"{_polymorphic_blocks_revision()}:{_server_revision()}"
+    self._library_stat: Optional[Tuple[int, int]] = None  # (mtime, size) of library.json, to detect changes
+    self._version = ''
+    self._refresh_version()
+
+    if self._cache_dir is not None:
+      os.makedirs(self._cache_dir, exist_ok=True)
+      entries = []
+      for filename in os.listdir(self._cache_dir):
+        if filename.endswith('.json.gz'):
+          stat = os.stat(os.path.join(self._cache_dir, filename))
+          entries.append((stat.st_mtime, filename.removesuffix('.json.gz'), stat.st_size))
+      for mtime, key, size in sorted(entries):
+        self._disk[key] = (size, mtime)
+        self._disk_bytes += size
+      with self._lock:
+        self._evict()
+
+  def _refresh_version(self) -> str:
+    """Returns the compiler version string, recomputing it if library.json has changed on disk."""
+    try:
+      stat = os.stat(LIBRARY_JSON_PATH)
+      library_stat: Optional[Tuple[int, int]] = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+      library_stat = None
+    if library_stat != self._library_stat or not self._version:
+      library_hash = hashlib.sha256()
+      if library_stat is not None:
+        with open(LIBRARY_JSON_PATH, 'rb') as f:
+          library_hash.update(f.read())
+      self._library_stat = library_stat
+      self._version = f"{COMPILE_CACHE_FORMAT}:{self._revision}:{library_hash.hexdigest()}"
+    return self._version
+
+  def key(self, netlist: JsonNetlist, variant: str = '') -> str:
+    """Returns the cache key for the netlist, optionally distinguished by a variant (eg, a subset of artifacts)."""
+    version = self._refresh_version()
+    return hashlib.sha256(f"{version}:{netlist_hash(netlist)}:{variant}".encode('utf-8')).hexdigest()
+
+  def _disk_path(self, key: str) -> str:
+    assert self._cache_dir is not None
+    return os.path.join(self._cache_dir, key + '.json.gz')
+
+  def _evict(self) -> None:
+    """Evicts expired entries and least-recently-used entries over the size limits. Must hold the lock."""
+    expiry = time.time() - self._max_age_s
+    for key, (data, created) in list(self._memory.items()):
+      if created < expiry or self._memory_bytes > self._max_memory_bytes:
+        del self._memory[key]
+        self._memory_bytes -= len(data)
+        self.evictions += 1
+    for key, (size, created) in list(self._disk.items()):  # ordered by creation time, so oldest first
+      if created < expiry or self._disk_bytes > self._max_disk_bytes:
+        del self._disk[key]
+        self._disk_bytes -= size
+        self.evictions += 1
+        try:
+          os.remove(self._disk_path(key))
+        except OSError:
+          pass
+
+  def _put_memory(self, key: str, data: bytes, created: float) -> None:
+    """Inserts an entry into the memory tier. Must hold the lock."""
+    if key in self._memory:
+      self._memory_bytes -= len(self._memory.pop(key)[0])
+    self._memory[key] = (data, created)
+    self._memory_bytes += len(data)
+
+  def get(self, key: str) -> Optional[bytes]:
+    """Returns the cached CompilerResult JSON (UTF-8) for the key, or None if not cached."""
+    with self._lock:
+      now = time.time()
+      memory_entry = self._memory.get(key)
+      if memory_entry is not None and memory_entry[1] >= now - self._max_age_s:
+        self._memory.move_to_end(key)
+        self.memory_hits += 1
+        return memory_entry[0]
+
+      disk_entry = self._disk.get(key)
+      if disk_entry is not None and disk_entry[1] >= now - self._max_age_s:
+        try:
+          with gzip.open(self._disk_path(key), 'rb') as f:
+            data = f.read()
+        except (OSError, EOFError):
+          del self._disk[key]
+          self._disk_bytes -= disk_entry[0]
+        else:
+          self._put_memory(key, data, disk_entry[1])
+          self._evict()
+          self.disk_hits += 1
+          return data
+
+      self.misses += 1
+      return None
+
+  def put(self, key: str, data: bytes) -> None:
+    """Inserts a CompilerResult JSON (UTF-8) into both tiers."""
+    with self._lock:
+      created = time.time()
+      self._put_memory(key, data, created)
+      if self._cache_dir is not None and key not in self._disk:
+        path = self._disk_path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+          with gzip.open(temp_path, 'wb') as f:
+            f.write(data)
+          os.replace(temp_path, path)  # atomic, so concurrent readers never see partial files
+          size = os.path.getsize(path)
+          self._disk[key] = (size, created)
+          self._disk_bytes += size
+        except OSError as e:
+          print(f"failed to write compile cache entry {key}: {e}")
+      self._evict()
+
+  def stats(self) -> Dict[str, int]:
+    with self._lock:
+      return {
+        'memoryHits': self.memory_hits,
+        'diskHits': self.disk_hits,
+        'misses': self.misses,
+        'evictions': self.evictions,
+        'memoryEntries': len(self._memory),
+        'memoryBytes': self._memory_bytes,
+        'diskEntries': len(self._disk),
+        'diskBytes': self._disk_bytes,
+      }
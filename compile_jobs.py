@@ -0,0 +1,156 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, Generic, List, Optional, TypeVar
+
+
+ArgType = TypeVar('ArgType')
+ResultType = TypeVar('ResultType')
+
+
+class JobQueueFull(Exception):
+  """Raised when submitting to a job queue that is at capacity."""
+
+
+class CompileJob(Generic[ArgType, ResultType]):
+  QUEUED = 'queued'
+  RUNNING = 'running'
+  DONE = 'done'
+  FAILED = 'failed'  # the job function raised an exception, stored in error
+  CANCELLED = 'cancelled'
+
+  def __init__(self, arg: ArgType, session: Optional[str]):
+    self.id = uuid.uuid4().hex
+    self.arg = arg
+    self.session = session
+    self.status = self.QUEUED
+    self.result: Optional[ResultType] = None
+    self.error: Optional[BaseException] = None
+    self.created = time.time()
+    self.finished: Optional[float] = None
+
+
+class CompileJobQueue(Generic[ArgType, ResultType]):
+  """Bounded FIFO queue of jobs run by a fixed number of worker threads.
+  Submitting raises JobQueueFull when max_queued jobs are already waiting, so callers can apply backpressure.
+  Jobs submitted with a session supersede (cancel) any still-queued jobs from the same session, since the
+  editor only cares about the latest design. Finished jobs are kept for max_finished_age_s for polling.
+  Thread-safe."""
+  def __init__(self, run: Callable[[ArgType], ResultType], concurrency: int = 1, max_queued: int = 16,
+               max_finished: int = 1024, max_finished_age_s: float = 10 * 60):
+    assert concurrency > 0
+    self._run = run
+    self._max_queued = max_queued
+    self._max_finished = max_finished
+    self._max_finished_age_s = max_finished_age_s
+
+    self._cond = threading.Condition()
+    self._closed = False
+    self._queued: Deque[CompileJob[ArgType, ResultType]] = deque()
+    self._jobs: Dict[str, CompileJob[ArgType, ResultType]] = {}  # all unexpired jobs by id
+    self._finished: OrderedDict[str, None] = OrderedDict()  # finished job ids, oldest first
+    self._running = 0
+
+    self.submitted = 0
+    self.rejected = 0
+    self.cancelled = 0
+
+    self._threads: List[threading.Thread] = []
+    for i in range(concurrency):
+      thread = threading.Thread(target=self._worker, name=f"compile-job-{i}", daemon=True)
+      thread.start()
+      self._threads.append(thread)
+
+  def _finish(self, job: CompileJob[ArgType, ResultType], status: str) -> None:
+    """Marks the job finished and expires old finished jobs. Must hold the lock."""
+    job.status = status
+    job.finished = time.time()
+    job.arg = None  # type: ignore  # no longer needed, don't hold on to the input
+    self._finished[job.id] = None
+    expiry = job.finished - self._max_finished_age_s
+    for job_id in list(self._finished):
+      if len(self._finished) <= self._max_finished and self._jobs[job_id].finished >= expiry:  # type: ignore
+        break
+      del self._finished[job_id]
+      del self._jobs[job_id]
+
+  def _worker(self) -> None:
+    while True:
+      with self._cond:
+        while not self._queued and not self._closed:
+          self._cond.wait()
+        if self._closed:
+          return
+        job = self._queued.popleft()
+        job.status = CompileJob.RUNNING
+        self._running += 1
+
+      try:
+        result = self._run(job.arg)
+        error: Optional[BaseException] = None
+      except Exception as e:
+        result, error = None, e
+
+      with self._cond:
+        self._running -= 1
+        job.result = result
+        job.error = error
+        self._finish(job, CompileJob.DONE if error is None else CompileJob.FAILED)
+
+  def submit(self, arg: ArgType, session: Optional[str] = None) -> CompileJob[ArgType, ResultType]:
+    """Queues a job, cancelling queued jobs from the same session. Raises JobQueueFull if at capacity."""
+    with self._cond:
+      if self._closed:
+        raise RuntimeError("compile job queue closed")
+      if session is not None:
+        for queued in [queued for queued in self._queued if queued.session == session]:
+          self._cancel(queued)
+      if len(self._queued) >= self._max_queued:
+        self.rejected += 1
+        raise JobQueueFull()
+      job: CompileJob[ArgType, ResultType] = CompileJob(arg, session)
+      self._jobs[job.id] = job
+      self._queued.append(job)
+      self.submitted += 1
+      self._cond.notify()
+      return job
+
+  def get(self, job_id: str) -> Optional[CompileJob[ArgType, ResultType]]:
+    with self._cond:
+      return self._jobs.get(job_id)
+
+  def _cancel(self, job: CompileJob[ArgType, ResultType]) -> None:
+    """Cancels a queued job. Must hold the lock."""
+    self._queued.remove(job)
+    self.cancelled += 1
+    self._finish(job, CompileJob.CANCELLED)
+
+  def cancel(self, job_id: str) -> bool:
+    """Cancels the job if it is still queued, returning whether it was cancelled.
+    Running jobs are not interrupted."""
+    with self._cond:
+      job = self._jobs.get(job_id)
+      if job is None or job.status != CompileJob.QUEUED:
+        return False
+      self._cancel(job)
+      return True
+
+  def stats(self) -> Dict[str, Any]:
+    with self._cond:
+      return {
+        'queued': len(self._queued),
+        'running': self._running,
+        'maxQueued': self._max_queued,
+        'concurrency': len(self._threads),
+        'submitted': self.submitted,
+        'rejected': self.rejected,
+        'cancelled': self.cancelled,
+      }
+
+  def close(self) -> None:
+    with self._cond:
+      self._closed = True
+      for job in list(self._queued):
+        self._cancel(job)
+      self._cond.notify_all()
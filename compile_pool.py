@@ -0,0 +1,202 @@
+import multiprocessing
+import os
+import queue
+import resource
+import threading
+from multiprocessing.connection import Connection
+from typing import Optional, Tuple, Any, List, Iterator, AbstractSet
+
+from netlist_compiler import JsonNetlist, compile_netlist, compile_netlist_stages, stages_result, CompilerResult, \
+  elaboration_cache
+from elaboration_cache import elaboration_cache_total
+from netweaver_interface import JsonGraph, parse_netlist_json
+from hdl_generator import JsonNetlistValidationError, JsonNetlistValidationErrors
+from metrics import collect_timings, record_timing
+
+
+class CompileWorkerError(Exception):
+  """Exception raised in a compile worker, carrying the repr of the original exception."""
+  def __init__(self, remote_repr: str):
+    super().__init__(remote_repr)
+    self.remote_repr = remote_repr
+
+  def __repr__(self) -> str:
+    return self.remote_repr
+
+
+def _rss_bytes() -> int:
+  """Returns the current resident set size of this process."""
+  try:
+    with open('/proc/self/statm') as f:
+      return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+  except (OSError, ValueError):  # not Linux, fall back to the peak RSS (in KiB on Linux, bytes on macOS)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _worker_main(conn: Connection, max_jobs: int, max_rss_bytes: int, direct_build: bool) -> None:
+  """Worker process loop: compiles (JsonNetlist JSON, artifacts, validated) received over the connection, sending back a
+  ('stage', stage, value) tuple as each compile stage completes followed by a final
+  (status, data..., elaboration counts, timings, retire) tuple, exiting after max_jobs or when over max_rss_bytes."""
+  try:  # warm up the Scala compiler and the backends with an empty design
+    compile_netlist(JsonNetlist(nets=[], graph=JsonGraph(nodes={}), graphUIData=None), direct_build=direct_build)
+  except Exception as e:
+    print(f"compile worker warm-up failed: {e!r}")
+
+  jobs = 0
+  while True:
+    try:
+      request = conn.recv()
+    except EOFError:  # pool closed
+      return
+    if request is None:
+      return
+    netlist_json, artifacts, validated = request
+
+    response: Tuple[Any, ...]
+    prev_counts = dict(elaboration_cache.counts)
+    with collect_timings() as timings:
+      try:
+        for stage, value in compile_netlist_stages(parse_netlist_json(netlist_json),
+                                                   direct_build=direct_build, artifacts=artifacts,
+                                                   validated=validated):
+          conn.send(('stage', stage, value))
+        response = ('ok', )
+      except JsonNetlistValidationError as e:
+        errors = e.errors if isinstance(e, JsonNetlistValidationErrors) else [e]
+        response = ('invalid', [(error.path, error.desc) for error in errors])
+      except Exception as e:
+        response = ('error', repr(e))
+
+    jobs += 1
+    retire = jobs >= max_jobs or _rss_bytes() > max_rss_bytes
+    elaboration_counts = {key: count - prev_counts.get(key, 0) for key, count in elaboration_cache.counts.items()
+                          if count != prev_counts.get(key, 0)}
+    conn.send(response + (elaboration_counts, timings, retire))
+    if retire:
+      return
+
+
+class _Worker:
+  def __init__(self, context: Any, max_jobs: int, max_rss_bytes: int, direct_build: bool):
+    self.conn, child_conn = context.Pipe()
+    self.process = context.Process(target=_worker_main, args=(child_conn, max_jobs, max_rss_bytes, direct_build),
+                                   daemon=True)
+    self.process.start()
+    child_conn.close()
+
+  def close(self) -> None:
+    try:
+      self.conn.send(None)
+    except OSError:
+      pass
+    self.conn.close()
+    self.process.join(timeout=5)
+    if self.process.is_alive():
+      self.process.kill()
+
+
+class CompilePool:
+  """Pool of long-lived compile worker processes, each of which imports PolymorphicBlocks and keeps the Scala
+  compiler warm across jobs. Workers are recycled after max_jobs compiles or when their RSS exceeds
+  max_rss_bytes. Thread-safe, compile() blocks until a worker is available, or raises if the pool is closed while
+  waiting."""
+  def __init__(self, size: int, max_jobs: int = 100, max_rss_bytes: int = 2 * 1024 * 1024 * 1024,
+               direct_build: bool = False):
+    assert size > 0
+    self._context = multiprocessing.get_context('spawn')  # don't fork the (threaded) server process
+    self._max_jobs = max_jobs
+    self._max_rss_bytes = max_rss_bytes
+    self._direct_build = direct_build
+    self._lock = threading.Lock()
+    self._closed = False
+    self._workers: List[_Worker] = []
+    self._idle: queue.Queue[Optional[_Worker]] = queue.Queue()  # None once closed, see _acquire
+    for _ in range(size):
+      self._idle.put(self._spawn())
+
+  def _spawn(self) -> _Worker:
+    worker = _Worker(self._context, self._max_jobs, self._max_rss_bytes, self._direct_build)
+    with self._lock:
+      self._workers.append(worker)
+    return worker
+
+  def _acquire(self) -> _Worker:
+    worker = self._idle.get()
+    if worker is None:  # closed, pass the wakeup on to the next waiting thread
+      self._idle.put(None)
+      raise RuntimeError("compile pool closed")
+    return worker
+
+  def _retire(self, worker: _Worker) -> None:
+    with self._lock:
+      if worker in self._workers:  # not if the pool was closed
+        self._workers.remove(worker)
+    worker.close()
+    if not self._closed:
+      self._idle.put(self._spawn())
+
+  def _release(self, worker: _Worker, retire: bool) -> None:
+    if retire or self._closed:
+      self._retire(worker)
+    else:
+      self._idle.put(worker)
+
+  def compile(self, netlist: JsonNetlist, artifacts: Optional[AbstractSet[str]] = None,
+              validated: bool = False) -> CompilerResult:
+    """Compiles the netlist on a pool worker. Raises JsonNetlistValidationError for invalid netlists and
+    CompileWorkerError for other failures, including worker crashes."""
+    return stages_result(self.compile_stages(netlist, artifacts, validated))
+
+  def compile_stages(self, netlist: JsonNetlist, artifacts: Optional[AbstractSet[str]] = None,
+                     validated: bool = False) -> Iterator[Tuple[str, Any]]:
+    """Compiles the netlist on a pool worker, yielding (stage, value) pairs as in compile_netlist_stages.
+    Raises as compile() does. If the iterator is closed early, the remaining stages are discarded."""
+    worker = self._acquire()
+    response: Tuple[Any, ...] = ()
+    try:
+      worker.conn.send((netlist.model_dump_json(), artifacts, validated))
+      while True:
+        response = worker.conn.recv()
+        if response[0] != 'stage':
+          break
+        yield response[1], response[2]
+    except (EOFError, OSError) as e:  # worker died, eg from the OOM killer
+      self._retire(worker)
+      raise CompileWorkerError(f"compile worker failed: {e!r}")
+    except GeneratorExit:  # closed early, drain the remaining stages so the worker can be reused
+      try:
+        while response[0] == 'stage':
+          response = worker.conn.recv()
+      except (EOFError, OSError):
+        self._retire(worker)
+        raise
+      self._release(worker, response[-1])
+      raise
+
+    status, *data, elaboration_counts, timings, retire = response
+    self._release(worker, retire)
+    for stage, seconds in timings:  # recorded in the worker process, aggregate them here
+      record_timing(stage, seconds)
+    for (kind, result), count in elaboration_counts.items():
+      elaboration_cache_total.inc(kind, result, amount=count)
+    if status == 'ok':
+      return
+    elif status == 'invalid':
+      errors = [JsonNetlistValidationError(path, desc) for path, desc in data[0]]
+      raise errors[0] if len(errors) == 1 else JsonNetlistValidationErrors(errors)
+    else:
+      raise CompileWorkerError(data[0])
+
+  def close(self) -> None:
+    self._closed = True
+    try:  # drop the idle workers, which are closed below
+      while True:
+        self._idle.get_nowait()
+    except queue.Empty:
+      pass
+    self._idle.put(None)  # wakes the threads waiting for a worker, which raise
+    with self._lock:
+      workers = list(self._workers)
+      self._workers.clear()
+    for worker in workers:
+      worker.close()
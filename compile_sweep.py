@@ -0,0 +1,96 @@
+import csv
+import io
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from netweaver_interface import JsonNetlist, LeanJsonNetlist, JsonGraph, JsonNode, JsonNodeArgParam
+from hdl_generator import JsonNetlistValidationError, JsonNetlistValidationErrors
+from library_index import LibraryIndex
+from netlist_compiler import CompilerResult
+
+
+class SweepVariant(BaseModel):
+  name: str = ""  # user-facing variant name, optional
+  argParams: dict[str, dict[str, Any]] = {}  # block name -> arg-param name -> value, overriding the netlist's
+
+
+class SweepRequest(BaseModel):
+  netlist: LeanJsonNetlist  # skipping fields ignored by the compiler, see parse_netlist_json
+  variants: list[SweepVariant]
+
+
+class BomDiffLine(BaseModel):
+  item: dict[str, str]  # identifying BOM columns (footprint, value, part, ...)
+  quantities: list[Optional[int]]  # per variant, 0 if not in the variant's BOM, None if the variant has no BOM
+
+
+class SweepResult(BaseModel):
+  results: list[CompilerResult]  # per variant, in request order
+  bomDiff: list[BomDiffLine]  # BOM lines whose quantity differs between variants
+
+
+def apply_overrides(netlist: JsonNetlist, overrides: Dict[str, Dict[str, Any]],
+                    library: LibraryIndex) -> JsonNetlist:
+  """Returns a copy of the netlist with the arg-param overrides applied, sharing all but the overridden nodes.
+  Args that are in the library but not the node (eg, added in a library update) are added. Raises
+  JsonNetlistValidationErrors for unknown blocks or args and invalid values, validating only the overridden nodes,
+  so for a netlist that passed library validation, the result is valid without validating it again."""
+  nodes_by_name = {node.data.name: node_id for node_id, node in netlist.graph.nodes.items()}
+  nodes = dict(netlist.graph.nodes)
+  errors: List[JsonNetlistValidationError] = []
+  overridden: List[JsonNode] = []
+  for block_name, block_overrides in overrides.items():
+    node_id = nodes_by_name.get(block_name)
+    if node_id is None:
+      errors.append(JsonNetlistValidationError([block_name], "unknown block"))
+      continue
+    node: JsonNode = nodes[node_id].model_copy(deep=True)
+    library_block = library.blocks.get(node.data.type)
+    arg_params = {arg_param.name: arg_param for arg_param in node.data.argParams}
+    for arg_name, value in block_overrides.items():
+      arg_param = arg_params.get(arg_name)
+      if arg_param is None:
+        if library_block is None or arg_name not in library_block.arg_types:
+          errors.append(JsonNetlistValidationError([block_name, arg_name], f"unknown parameter of {node.data.type}"))
+          continue
+        arg_param = JsonNodeArgParam(name=arg_name, type=library_block.arg_types[arg_name], default_value=None,
+                                     value=None)
+        node.data.argParams.append(arg_param)
+      arg_param.value = value
+    nodes[node_id] = node
+    overridden.append(node)
+  errors.extend(library.validate_nodes(overridden))
+  if errors:
+    raise JsonNetlistValidationErrors(errors)
+  return netlist.model_copy(update={'graph': JsonGraph(nodes=nodes)})
+
+
+# BOM columns that are per-design rather than identifying the part
+BOM_NON_ITEM_COLUMNS = {'Id', 'Designator', 'Quantity'}
+
+
+def bom_quantities(bom: str) -> Dict[Tuple[Tuple[str, str], ...], int]:
+  """Parses a BOM CSV (as generated by GenerateBom) into identifying columns -> quantity."""
+  quantities: Dict[Tuple[Tuple[str, str], ...], int] = {}
+  for row in csv.DictReader(io.StringIO(bom)):
+    item = tuple((column, value) for column, value in row.items()
+                 if column is not None and column not in BOM_NON_ITEM_COLUMNS)
+    quantities[item] = quantities.get(item, 0) + int(row.get('Quantity') or 0)
+  return quantities
+
+
+def bom_diff(boms: List[Optional[str]]) -> List[BomDiffLine]:
+  """Returns the BOM lines whose quantity differs between the BOMs, in order of first appearance."""
+  variant_quantities = [bom_quantities(bom) if bom is not None else None for bom in boms]
+  items: Dict[Tuple[Tuple[str, str], ...], None] = {}  # ordered set
+  for quantities in variant_quantities:
+    items.update(dict.fromkeys(quantities or {}))
+
+  diff = []
+  for item in items:
+    item_quantities = [quantities.get(item, 0) if quantities is not None else None
+                       for quantities in variant_quantities]
+    if len(set(quantity for quantity in item_quantities if quantity is not None)) > 1:
+      diff.append(BomDiffLine(item=dict(item), quantities=item_quantities))
+  return diff
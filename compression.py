@@ -0,0 +1,111 @@
+import gzip
+import hashlib
+import os
+import threading
+import zlib
+from typing import Callable, Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+try:
+  import brotli  # type: ignore
+except ImportError:  # optional, only gzip is available without it
+  brotli = None
+
+try:
+  import zstandard  # type: ignore
+except ImportError:  # optional
+  zstandard = None
+
+
+# content-coding -> compress function, in order of server preference
+ENCODERS: Dict[str, Callable[[bytes], bytes]] = {}
+if brotli is not None:
+  ENCODERS['br'] = lambda data: brotli.compress(data, quality=11)
+if zstandard is not None:
+  ENCODERS['zstd'] = lambda data: zstandard.ZstdCompressor(level=19).compress(data)
+ENCODERS['gzip'] = lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+
+
+class StreamCompressor(NamedTuple):
+  compress: Callable[[bytes], bytes]  # returns compressed output so far, possibly empty
+  finish: Callable[[], bytes]  # returns the remaining compressed output
+
+
+def _gzip_stream() -> StreamCompressor:
+  compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # +16 for the gzip container
+  return StreamCompressor(compressor.compress, compressor.flush)
+
+
+def _brotli_stream() -> StreamCompressor:
+  compressor = brotli.Compressor(quality=5)
+  return StreamCompressor(compressor.process, compressor.finish)
+
+
+def _zstd_stream() -> StreamCompressor:
+  compressor = zstandard.ZstdCompressor(level=3).compressobj()
+  return StreamCompressor(compressor.compress, compressor.flush)
+
+
+# content-coding -> incremental compressor factory, in order of server preference, for dynamic responses
+# (eg compile results), with levels trading some ratio for speed, unlike the maximum compression of ENCODERS
+STREAM_ENCODERS: Dict[str, Callable[[], StreamCompressor]] = {}
+if zstandard is not None:
+  STREAM_ENCODERS['zstd'] = _zstd_stream
+if brotli is not None:
+  STREAM_ENCODERS['br'] = _brotli_stream
+STREAM_ENCODERS['gzip'] = _gzip_stream
+
+
+def compress_stream(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+  """Compresses the chunks with the content-coding (one of STREAM_ENCODERS), yielding compressed output as the
+  compressor produces it, so neither the uncompressed nor the compressed body are held whole."""
+  compressor = STREAM_ENCODERS[encoding]()
+  for chunk in chunks:
+    data = compressor.compress(chunk)
+    if data:
+      yield data
+  yield compressor.finish()
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+  """Compresses the data with the content-coding (one of STREAM_ENCODERS), at the dynamic response levels."""
+  return b''.join(compress_stream([data], encoding))
+
+
+class PrecompressedSnapshot(NamedTuple):
+  etag: str  # strong ETag of the identity representation
+  variants: Dict[str, bytes]  # content-coding (or 'identity') -> body
+
+  def variant_etag(self, encoding: str) -> str:
+    """Strong ETags must differ between representations, so the content-coding is appended."""
+    return self.etag if encoding == 'identity' else f"{self.etag}-{encoding}"
+
+
+class PrecompressedFile:
+  """A file held in memory, along with variants compressed with each of ENCODERS at maximum compression.
+  The file is reloaded when its mtime or size changes on disk, with the snapshot swapped atomically.
+  Thread-safe."""
+  def __init__(self, path: str):
+    self._path = path
+    self._lock = threading.Lock()
+    self._stat: Optional[Tuple[int, int]] = None
+    self._snapshot: Optional[PrecompressedSnapshot] = None
+
+  def _load(self) -> PrecompressedSnapshot:
+    with open(self._path, 'rb') as f:
+      data = f.read()
+    variants = {'identity': data}
+    for encoding, encoder in ENCODERS.items():
+      variants[encoding] = encoder(data)
+    return PrecompressedSnapshot(hashlib.sha256(data).hexdigest(), variants)
+
+  def get(self) -> PrecompressedSnapshot:
+    stat = os.stat(self._path)
+    file_stat = (stat.st_mtime_ns, stat.st_size)
+    snapshot = self._snapshot
+    if snapshot is None or file_stat != self._stat:
+      with self._lock:
+        if self._snapshot is None or file_stat != self._stat:  # may have been reloaded while waiting on the lock
+          self._snapshot = self._load()
+          self._stat = file_stat
+        snapshot = self._snapshot
+    return snapshot
@@ -0,0 +1,100 @@
+import importlib
+import sys
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from PolymorphicBlocks.edg import edgrpc
+
+from metrics import Counter
+
+
+HDL_SERVER_MODULE = 'PolymorphicBlocks.edg.hdl_server.__main__'
+
+elaboration_cache_total = Counter('netweaver_elaboration_cache_total',
+                                  "Block elaborations requested by the compiler, by kind (library, generator) and "
+                                  "result (hit, miss, uncached).", ['kind', 'result'])
+
+
+class ElaborationCache:
+  """LRU memo of the elaborations the Scala compiler requests from Python while compiling (see
+  ScalaCompilerInstance.compile): library elements by class, and generator blocks by class and generator values, so
+  identical (class, args) instances are elaborated once, within a compile and across compiles in a process.
+  Elaborations are relative to the block, so instance paths and refdes (assigned on the compiled design) are
+  unaffected. Only classes from importable library modules are memoized, not per-compile generated classes (the top
+  level design and connector wrappers), which may be redefined under the same name. Thread-safe."""
+  def __init__(self, max_entries: int = 4096):
+    self._max_entries = max_entries
+    self._lock = threading.Lock()
+    self._entries: OrderedDict[bytes, edgrpc.HdlResponse] = OrderedDict()  # serialized request -> response, LRU first
+    self._process_request: Optional[Callable[[edgrpc.HdlRequest], Optional[edgrpc.HdlResponse]]] = None
+    self.counts: Dict[Tuple[str, str], int] = {}  # (kind, result) -> count, see elaboration_cache_total
+
+  @staticmethod
+  def _memoizable_element(request: edgrpc.HdlRequest) -> Optional[Tuple[str, str]]:
+    """Returns the (kind, class path) requested, or None if not an elaboration request."""
+    if request.HasField('get_library_element'):
+      return 'library', request.get_library_element.element.target.name
+    elif request.HasField('elaborate_generator'):
+      return 'generator', request.elaborate_generator.element.target.name
+    return None
+
+  @staticmethod
+  def _is_library_class(class_path: str) -> bool:
+    module = sys.modules.get(class_path.rsplit('.', 1)[0])
+    return getattr(module, '__file__', None) is not None  # generated classes are in GENERATED_MODULE, without a file
+
+  def _count(self, kind: str, result: str) -> None:
+    with self._lock:
+      self.counts[(kind, result)] = self.counts.get((kind, result), 0) + 1
+    elaboration_cache_total.inc(kind, result)
+
+  def process_request(self, request: edgrpc.HdlRequest) -> Optional[edgrpc.HdlResponse]:
+    """Drop-in for hdl_server process_request, answering elaboration requests from the cache where possible."""
+    assert self._process_request is not None, "not installed"
+    element = self._memoizable_element(request)
+    if element is None:
+      return self._process_request(request)
+    kind, class_path = element
+    if not self._is_library_class(class_path):
+      self._count(kind, 'uncached')
+      return self._process_request(request)
+
+    key = request.SerializeToString(deterministic=True)
+    with self._lock:
+      response = self._entries.get(key)
+      if response is not None:
+        self._entries.move_to_end(key)
+    if response is not None:
+      self._count(kind, 'hit')
+      return response
+
+    response = self._process_request(request)
+    self._count(kind, 'miss')
+    if response is not None and not response.HasField('error'):  # errors may be transient, eg from imports
+      with self._lock:
+        self._entries[key] = response
+        while len(self._entries) > self._max_entries:
+          self._entries.popitem(last=False)
+    return response
+
+  def install(self) -> None:
+    """Installs this cache in the HDL server, which ScalaCompilerInstance.compile looks up on each compile."""
+    hdl_server = importlib.import_module(HDL_SERVER_MODULE)
+    if self._process_request is None:
+      self._process_request = hdl_server.process_request
+    hdl_server.process_request = self.process_request  # type: ignore
+
+  def clear(self) -> None:
+    with self._lock:
+      self._entries.clear()
+
+  def __len__(self) -> int:
+    return len(self._entries)
+
+  def stats(self) -> Dict[str, int]:
+    with self._lock:
+      stats = {'entries': len(self._entries)}
+      for (kind, result), count in self.counts.items():
+        stats[kind + result.capitalize()] = count
+      return stats
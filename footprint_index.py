@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Optional, Set, List, NamedTuple
+
+
+FOOTPRINT_LIBRARY_RELPATHS = [  # in order of precedence
+  'footprints/kicad-footprints',
+  'footprints/kiswitch/library/footprints',
+  'footprints/OPL_Kicad_Library',
+  'PolymorphicBlocks/examples',
+]
+
+FOOTPRINT_INDEX_MANIFEST = 'resources/footprint_index.json'  # optional prebuilt index, relative to the base dir
+
+
+def footprint_hash(data: str) -> str:
+  """Returns the content hash of .kicad_mod data, which clients use to cache footprints."""
+  return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class FootprintData(NamedTuple):
+  data: str  # raw .kicad_mod data
+  hash: str  # content hash of data
+
+
+class FootprintIndex:
+  """Index of footprint name (library:name) to .kicad_mod path, built once by scanning the footprint library
+  containers. Within a container, library/name.kicad_mod takes precedence over library.pretty/name.kicad_mod,
+  and earlier containers take precedence over later ones.
+  Names missing from the index are probed on the filesystem once, with the result (including failures) cached.
+  Footprint data can be looked up by content hash, from memory if it has been read, otherwise from the indexed
+  footprint with that hash. The indexed footprints are hashed when the index is built (or loaded from the manifest),
+  so lookups never scan the libraries.
+  Thread-safe."""
+  def __init__(self, base_dir: str, paths: Dict[str, str], paths_by_hash: Dict[str, str]):
+    self._base_dir = base_dir
+    self._paths = paths  # footprint name -> absolute path
+    self._paths_by_hash = paths_by_hash  # content hash -> absolute path, of the indexed footprints
+    self._unresolved: Set[str] = set()  # negative cache
+    self._data: Dict[str, FootprintData] = {}  # footprint name -> data, for footprints that have been read
+    self._data_by_hash: Dict[str, str] = {}  # content hash -> data
+    self._lock = threading.Lock()
+
+  @staticmethod
+  def _container_paths(base_dir: str) -> List[str]:
+    return [os.path.join(base_dir, library_container) for library_container in FOOTPRINT_LIBRARY_RELPATHS]
+
+  @classmethod
+  def build(cls, base_dir: str) -> 'FootprintIndex':
+    paths: Dict[str, str] = {}
+    for container_path in cls._container_paths(base_dir):
+      try:
+        library_dirs = sorted(entry.name for entry in os.scandir(container_path) if entry.is_dir())
+      except OSError:
+        continue
+      # all library/ dirs take precedence over library.pretty/ dirs in the same container
+      libraries = [(library_dir, library_dir) for library_dir in library_dirs] + \
+                  [(library_dir.removesuffix('.pretty'), library_dir) for library_dir in library_dirs
+                   if library_dir.endswith('.pretty')]
+      for library, library_dir in libraries:
+        library_path = os.path.join(container_path, library_dir)
+        try:
+          footprint_files = [entry.name for entry in os.scandir(library_path)
+                             if entry.name.endswith('.kicad_mod') and entry.is_file()]
+        except OSError:
+          continue
+        for footprint_file in footprint_files:
+          paths.setdefault(f"{library}:{footprint_file.removesuffix('.kicad_mod')}",
+                           os.path.join(library_path, footprint_file))
+    return cls(base_dir, paths, cls._hash_paths(paths))
+
+  @staticmethod
+  def _hash_paths(paths: Dict[str, str]) -> Dict[str, str]:
+    """Returns the content hash to path table of the footprints, reading all of them."""
+    paths_by_hash: Dict[str, str] = {}
+    for path in paths.values():
+      try:
+        with open(path) as f:
+          paths_by_hash.setdefault(footprint_hash(f.read()), path)
+      except OSError:
+        continue
+    return paths_by_hash
+
+  @classmethod
+  def load(cls, base_dir: str, manifest_path: str) -> 'FootprintIndex':
+    with open(manifest_path) as f:
+      manifest: Dict[str, Dict[str, str]] = json.load(f)
+    return cls(base_dir,
+               {footprint: os.path.join(base_dir, relpath) for footprint, relpath in manifest['paths'].items()},
+               {hash: os.path.join(base_dir, relpath) for hash, relpath in manifest['hashes'].items()})
+
+  @classmethod
+  def load_or_build(cls, base_dir: str) -> 'FootprintIndex':
+    """Loads the index from the prebuilt manifest if it exists, otherwise scans and hashes the footprint libraries."""
+    manifest_path = os.path.join(base_dir, FOOTPRINT_INDEX_MANIFEST)
+    if os.path.exists(manifest_path):
+      return cls.load(base_dir, manifest_path)
+    else:
+      return cls.build(base_dir)
+
+  def save(self, manifest_path: str) -> None:
+    """Writes the manifest, of footprint name to path and content hash to path."""
+    manifest = {
+      'paths': {footprint: os.path.relpath(path, self._base_dir) for footprint, path in sorted(self._paths.items())},
+      'hashes': {hash: os.path.relpath(path, self._base_dir) for hash, path in sorted(self._paths_by_hash.items())},
+    }
+    with open(manifest_path, 'w') as f:
+      json.dump(manifest, f, indent=0)
+
+  def _probe(self, footprint: str) -> Optional[str]:
+    """Resolves a footprint by probing the filesystem, for names not in the index (eg, nested libraries)."""
+    library, name = footprint.split(':')
+    for container_path in self._container_paths(self._base_dir):
+      for footprint_candidate in [os.path.join(container_path, library, name + '.kicad_mod'),
+                                  os.path.join(container_path, library + '.pretty', name + '.kicad_mod')]:
+        if os.path.exists(footprint_candidate):
+          return footprint_candidate
+    return None
+
+  def resolve(self, footprint: str) -> Optional[str]:
+    """Returns the .kicad_mod path for a library:name footprint, or None if it can't be resolved."""
+    path = self._paths.get(footprint)
+    if path is not None:
+      return path
+    if footprint in self._unresolved or len(footprint.split(':')) != 2:
+      return None
+    path = self._probe(footprint)
+    with self._lock:
+      if path is not None:
+        self._paths[footprint] = path
+      else:
+        self._unresolved.add(footprint)
+    return path
+
+  def read(self, footprint: str) -> Optional[FootprintData]:
+    """Returns the data and content hash for a library:name footprint, or None if it can't be resolved."""
+    footprint_data = self._data.get(footprint)
+    if footprint_data is not None:
+      return footprint_data
+    path = self.resolve(footprint)
+    if path is None:
+      return None
+    with open(path) as f:
+      data = f.read()
+    footprint_data = FootprintData(data, footprint_hash(data))
+    with self._lock:
+      self._data[footprint] = footprint_data
+      self._data_by_hash[footprint_data.hash] = data
+    return footprint_data
+
+  def add_data(self, hash: str, data: str) -> None:
+    """Makes footprint data available by hash, for data read elsewhere (eg, by compile worker processes)."""
+    if hash not in self._data_by_hash:
+      with self._lock:
+        self._data_by_hash[hash] = data
+
+  def data_by_hash(self, hash: str) -> Optional[str]:
+    """Returns footprint data by content hash, or None if no footprint has that hash."""
+    data = self._data_by_hash.get(hash)
+    if data is not None:
+      return data
+    path = self._paths_by_hash.get(hash)
+    if path is None:
+      return None
+    try:
+      with open(path) as f:
+        data = f.read()
+    except OSError:
+      return None
+    if footprint_hash(data) != hash:  # changed since it was hashed
+      return None
+    self.add_data(hash, data)
+    return data
+
+  def __len__(self) -> int:
+    return len(self._paths)
+
+
+if __name__ == '__main__':  # writes the prebuilt manifest
+  base_dir = os.path.dirname(os.path.abspath(__file__))
+  index = FootprintIndex.build(base_dir)
+  print(f"Writing {len(index)} footprints to {FOOTPRINT_INDEX_MANIFEST}")
+  index.save(os.path.join(base_dir, FOOTPRINT_INDEX_MANIFEST))
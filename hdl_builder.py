@@ -0,0 +1,94 @@
+import itertools
+import sys
+import types
+from contextlib import contextmanager
+from typing import Type, Dict, Any, Iterator, Optional
+
+from PolymorphicBlocks import edg
+from hdl_generator import NetlistDesign, ConnectorDesign, PortRefDesign
+
+
+# module of the classes generated for a compile, whether exec'd from HDL or built directly, so the compiled designs
+# are identical. Each compile has its own module, GENERATED_MODULE_<n>, so concurrent compiles don't share classes.
+# Class paths appear in the compiled outputs (eg, KiCad netlist sheet files), where they are made stable with
+# stable_class_paths.
+GENERATED_MODULE = 'netweaver_generated'
+_generated_module_ids = itertools.count()
+
+
+@contextmanager
+def generated_module() -> Iterator[types.ModuleType]:
+  """Provides a fresh, uniquely named module for the classes generated for one compile, registered in sys.modules
+  while in the context so the compiler can resolve them by name, then unregistered and cleared so they (and everything
+  they reference) can be freed."""
+  module_name = f'{GENERATED_MODULE}_{next(_generated_module_ids)}'
+  module = types.ModuleType(module_name)
+  sys.modules[module_name] = module
+  try:
+    yield module
+  finally:
+    del sys.modules[module_name]
+    module.__dict__.clear()
+
+
+def stable_class_paths(text: str, module: types.ModuleType) -> str:
+  """Returns the text (eg, a compiled output) with the class paths in the generated module replaced by the same
+  paths in GENERATED_MODULE, so outputs don't depend on which compile generated them."""
+  return text.replace(module.__name__ + '.', GENERATED_MODULE + '.')
+
+
+def _new_block_class(name: str, base: Type[edg.Block], init: Any,
+                     module: Optional[types.ModuleType]) -> Type[edg.Block]:
+  def exec_body(namespace: Dict[str, Any]) -> None:
+    namespace['__init__'] = init
+    namespace['__module__'] = module.__name__ if module is not None else GENERATED_MODULE
+    namespace['__qualname__'] = name
+  return types.new_class(name, (base, ), exec_body=exec_body)
+
+
+def build_connector(connector: ConnectorDesign, module: Optional[types.ModuleType] = None) -> Type[edg.Block]:
+  """Builds the connector wrapper block class, equivalent to tohdl_connector, defining it in the module (see
+  generated_module) if provided so the compiler can resolve it by name."""
+  connector_class = getattr(edg, connector.connector_class)
+  connector_args = dict(connector.connector_args)
+  port_types = [(port, getattr(edg, port.port_type)) for port in connector.ports]
+
+  def __init__(self: Any) -> None:
+    super(cls, self).__init__()
+    self._conn = self.Block(connector_class(**connector_args))
+    for port, port_type in port_types:
+      setattr(self, port.name, self.Export(self._conn.pins.request(port.pin).adapt_to(port_type()), optional=True))
+
+  cls = _new_block_class(connector.class_name, edg.Block, __init__, module)
+  if module is not None:
+    setattr(module, connector.class_name, cls)
+  return cls
+
+
+def build_design(design: NetlistDesign, module: Optional[types.ModuleType] = None) -> Type[edg.Block]:
+  """Builds the top-level design class directly from the structured design, equivalent to exec'ing the HDL
+  from tohdl_design in the module (see generated_module), but without generating and parsing code."""
+  block_classes = {connector.class_name: build_connector(connector, module) for connector in design.connectors}
+  blocks = [(block.name, block_classes.get(block.block_class) or getattr(edg, block.block_class), dict(block.args))
+            for block in design.blocks]
+
+  def port_ref(self: Any, ref: PortRefDesign) -> Any:
+    port = getattr(getattr(self, ref.block), ref.port)
+    if ref.request is None:
+      return port
+    elif ref.request_vector:
+      return port.request_vector(ref.request)
+    else:
+      return port.request(ref.request)
+
+  def __init__(self: Any) -> None:
+    super(cls, self).__init__()
+    for block_name, block_class, block_args in blocks:
+      setattr(self, block_name, self.Block(block_class(**block_args)))
+    for connect in design.connects:
+      self.connect(*[port_ref(self, ref) for ref in connect])
+
+  cls = _new_block_class('MyModule', edg.SimpleBoardTop, __init__, module)
+  if module is not None:
+    setattr(module, 'MyModule', cls)
+  return cls
@@ -1,5 +1,5 @@
-from typing import Optional, List, Tuple, Type, NamedTuple, Dict
-from netweaver_interface import JsonNetlist, JsonLabel, JsonNode, JsonNodePort
+from typing import Optional, List, Tuple, Type, NamedTuple, Dict, Union, FrozenSet
+from netweaver_interface import JsonNetlist, JsonLabel, JsonNode, JsonNodePort, JsonNodeArgParam
 from PolymorphicBlocks import edg
 
 
@@ -10,25 +10,90 @@ class JsonNetlistValidationError(Exception):
     self.desc = desc
 
 
-class Connection(NamedTuple):
-  name: str
-  ports: list[Tuple[JsonNode, JsonNodePort]]
-  labels: list[JsonLabel]
+class JsonNetlistValidationErrors(JsonNetlistValidationError):
+  """Multiple validation errors reported together, eg from LibraryIndex.validate. The path and desc are of the first."""
+  def __init__(self, errors: List[JsonNetlistValidationError]):
+    super().__init__(errors[0].path, errors[0].desc)
+    self.errors = errors
+
+
+class Connection:
+  """A named net of ports connected by labels. Derived properties are computed on first use and cached."""
+  def __init__(self, name: str, ports: List[Tuple[JsonNode, JsonNodePort]], labels: List[JsonLabel]):
+    self.name = name
+    self.ports = ports
+    self.labels = labels
+    self._is_array: Optional[bool] = None
+    self._port_types: Optional[FrozenSet[str]] = None
 
   def is_array(self) -> bool:
-    is_array: Optional[bool] = None
-    for (containing_node, port) in self.ports:  # sweep through connected to determine if an array
-      if port.elementOf is not None:
-        continue  # ignored, request does not determine array-ness
-      elif port.array:
-        if is_array is False:
-          raise JsonNetlistValidationError([], f"mixed array and non-array ports in connection {self.name}")
-        is_array = True
-      else:
-        if is_array is True:
-          raise JsonNetlistValidationError([], f"mixed array and non-array ports in label {self.name}")
-        is_array = False
-    return bool(is_array)
+    if self._is_array is None:
+      is_array: Optional[bool] = None
+      for (containing_node, port) in self.ports:  # sweep through connected to determine if an array
+        if port.elementOf is not None:
+          continue  # ignored, request does not determine array-ness
+        elif port.array:
+          if is_array is False:
+            raise JsonNetlistValidationError([], f"mixed array and non-array ports in connection {self.name}")
+          is_array = True
+        else:
+          if is_array is True:
+            raise JsonNetlistValidationError([], f"mixed array and non-array ports in label {self.name}")
+          is_array = False
+      self._is_array = bool(is_array)
+    return self._is_array
+
+  def port_types(self) -> FrozenSet[str]:
+    """Returns the set of port types in this connection."""
+    if self._port_types is None:
+      self._port_types = frozenset(port.type for node, port in self.ports)
+    return self._port_types
+
+
+class NetlistIndex:
+  """Indexed view of a JsonNetlist, built in one pass over the nodes and labels, so that HDL generation, implicit part
+  inference, and validation do constant-time lookups instead of rescanning the netlist."""
+  def __init__(self, netlist: JsonNetlist):
+    self.netlist = netlist
+    self.nodes = netlist.graph.nodes  # by node ID
+    self._ports_by_name: Dict[Tuple[str, str], JsonNodePort] = {}
+    for node_id, node in self.nodes.items():
+      for port in node.data.ports:
+        self._ports_by_name[(node_id, port.name)] = port
+
+    # aggregate connections, in order of first label
+    labels_by_name: Dict[str, List[JsonLabel]] = {}
+    for id, label in netlist.labels.items():
+      labels_by_name.setdefault(label.labelName, []).append(label)
+
+    self.connections: Dict[str, Connection] = {}  # by name
+    self.connections_by_port: Dict[Tuple[str, int], Connection] = {}  # by (node ID, port index)
+    for name, labels in labels_by_name.items():
+      ports = []
+      for label in labels:
+        containing_node = self.nodes.get(label.nodeId)
+        if containing_node is None:
+          raise JsonNetlistValidationError([name], f"label on unknown node {label.nodeId}")
+        if not 0 <= label.portIdx < len(containing_node.data.ports):
+          raise JsonNetlistValidationError([containing_node.data.name, name], f"label on unknown port {label.portIdx}")
+        ports.append((containing_node, self.port(label.nodeId, label.portIdx)))
+
+      connection = Connection(name, ports, labels)
+      self.connections[name] = connection
+      for label in labels:
+        assert (label.nodeId, label.portIdx) not in self.connections_by_port, "duplicate label"
+        self.connections_by_port[(label.nodeId, label.portIdx)] = connection
+
+  def port(self, node_id: str, port_idx: int) -> JsonNodePort:
+    return self.nodes[node_id].data.ports[port_idx]
+
+  def port_by_name(self, node_id: str, port_name: str) -> Optional[JsonNodePort]:
+    return self._ports_by_name.get((node_id, port_name))
+
+  def connection_at(self, node_id: str, port_idx: Optional[int]) -> Optional[Connection]:
+    if port_idx is None:
+      return None
+    return self.connections_by_port.get((node_id, port_idx))
 
 
 # connector port mapping - for each set of incoming port types, the connector port type
@@ -50,12 +115,88 @@ def get_connector_type(err_path: list[str], port_types: list[Type[edg.CircuitPor
   raise JsonNetlistValidationError(err_path, f"no connector type for {port_types}")
 
 
-def tohdl_connector(connector: JsonNode, connector_class_name: str, connector_args: str,
-                    port_connections: List[Tuple[int, Connection]]) -> Tuple[str, str]:
-  """Compiles a JsonNode representing a connector to HDL, returning the block class name and block definition."""
+ArgValue = Union[int, float, Tuple[float, float]]  # sanitized block argument values
+
+
+def parse_arg_value(block_name: str, arg_param: JsonNodeArgParam) -> Optional[ArgValue]:
+  """Parses and sanitizes the value of a block argument, returning None if it is left at the default."""
+  if arg_param.default_value == arg_param.value or not arg_param.value:
+    return None
+  err_path = [block_name, arg_param.name]
+  if arg_param.type == 'int':
+    try:
+      return int(arg_param.value)
+    except (TypeError, ValueError):
+      raise JsonNetlistValidationError(err_path, f"invalid non-int value {arg_param.value}")
+  elif arg_param.type == 'float':
+    try:
+      return float(arg_param.value)
+    except (TypeError, ValueError):
+      raise JsonNetlistValidationError(err_path, f"invalid non-float value {arg_param.value}")
+  elif arg_param.type == 'range':
+    if not isinstance(arg_param.value, list) or len(arg_param.value) != 2:
+      raise JsonNetlistValidationError(err_path, f"invalid value {arg_param.value}")
+    try:
+      return (float(arg_param.value[0]), float(arg_param.value[1]))
+    except (TypeError, ValueError):
+      raise JsonNetlistValidationError(err_path, f"invalid range-int value {arg_param.value}")
+  elif arg_param.type == 'string':
+    raise JsonNetlistValidationError(err_path, f"TODO: strings unsupported")
+  else:
+    raise JsonNetlistValidationError(err_path, f"unknown arg-param type {arg_param.type}")
+
+
+def tohdl_arg_value(value: ArgValue) -> str:
+  if isinstance(value, tuple):
+    return f"({value[0]}, {value[1]})"
+  else:
+    return str(value)
+
+
+def tohdl_args(args: List[Tuple[str, ArgValue]]) -> str:
+  return ', '.join(f"{arg_name}={tohdl_arg_value(arg_value)}" for arg_name, arg_value in args)
+
+
+class ConnectorPortDesign(NamedTuple):
+  name: str  # port name on the connector wrapper block
+  pin: str  # connector pin
+  port_type: str  # edg port type the pin is adapted to
+
+
+class ConnectorDesign(NamedTuple):
+  """A generated wrapper block around a PassiveConnector, which adapts connected pins to typed ports."""
+  class_name: str  # generated wrapper block class name
+  connector_class: str  # library connector class
+  connector_args: List[Tuple[str, ArgValue]]
+  ports: List[ConnectorPortDesign]
+
+
+class BlockDesign(NamedTuple):
+  name: str  # block name in the top level
+  block_class: str  # library block class, or generated connector wrapper class
+  args: List[Tuple[str, ArgValue]]
+
+
+class PortRefDesign(NamedTuple):
+  block: str  # block name in the top level
+  port: str
+  request: Optional[str] = None  # requested element name, if a request on an array port
+  request_vector: bool = False  # whether the request is for a vector (array) element
+
+
+class NetlistDesign(NamedTuple):
+  """Structured top-level design, from which both the HDL text and the design classes are generated."""
+  connectors: List[ConnectorDesign]
+  blocks: List[BlockDesign]
+  connects: List[List[PortRefDesign]]
+
+
+def connector_design(connector: JsonNode, connector_class_name: str, connector_args: List[Tuple[str, ArgValue]],
+                     port_connections: List[Tuple[int, Connection]]) -> ConnectorDesign:
+  """Generates the wrapper block for a JsonNode representing a connector."""
   assert connector.data.type.isidentifier() and connector.data.name.isidentifier()
   classname = connector.data.type + "_" + connector.data.name
-  port_decls = []
+  ports = []
 
   for portidx, connection in port_connections:
     port_name = connector.data.ports[portidx].name
@@ -77,76 +218,63 @@ def tohdl_connector(connector: JsonNode, connector_class_name: str, connector_ar
       connection_port_types.append(port_class)
 
     connector_port_type = get_connector_type(err_path, connection_port_types).__name__
-    port_decls.append(f"self.{port_name} = self.Export(self._conn.pins.request('{port_num}').adapt_to({connector_port_type}()), optional=True)")
+    ports.append(ConnectorPortDesign(port_name, str(port_num), connector_port_type))
+
+  return ConnectorDesign(classname, connector_class_name, connector_args, ports)
+
+
+def tohdl_connector(connector: ConnectorDesign) -> str:
+  """Compiles a connector wrapper block to HDL, returning the block definition."""
+  port_decls = [f"self.{port.name} = self.Export(self._conn.pins.request('{port.pin}').adapt_to({port.port_type}()), optional=True)"
+                for port in connector.ports]
 
-  # globals['__builtins__'] is added since exec top-level classes appear in __builtin__ scope,
-  # and modules and top-level in exec() do not share the same scope
   newline = '\n'  # not allowed in f-strings
-  connector_code = f"""\
-class {classname}(Block):
+  return f"""\
+class {connector.class_name}(Block):
   def __init__(self):
     super().__init__()
-    self._conn = self.Block({connector_class_name}({connector_args}))
+    self._conn = self.Block({connector.connector_class}({tohdl_args(connector.connector_args)}))
 {newline.join(map(lambda c: "    " + c, port_decls))}
-
-globals()['__builtins__']['{classname}'] = {classname}
 """
-  return classname, connector_code
 
 
-def tohdl_netlist(netlist: JsonNetlist) -> str:
-  """Compiles the JsonNetlist to HDL, returning the HDL code."""
-  # aggregate connections
-  labels_by_name: dict[str, list[JsonLabel]] = {}
-  for id, label in netlist.labels.items():
-    labels_by_name.setdefault(label.labelName, []).append(label)
-
-  connections_by_name: dict[str, Connection] = {}
-  connections_by_node_port: dict[Tuple[str, int], Connection] = {}
-  for name, labels in labels_by_name.items():
-    ports = []
-    for label in labels:
-      containing_node = netlist.graph.nodes[label.nodeId]
-      port = containing_node.data.ports[label.portIdx]
-      ports.append((containing_node, port))
-
-    connection = Connection(name, ports, labels)
-    connections_by_name[name] = connection
-    for label in labels:
-      assert (label.nodeId, label.portIdx) not in connections_by_node_port, "duplicate label"
-      connections_by_node_port[(label.nodeId, label.portIdx)] = connection
-
-  additional_connections: Dict[str, List[str]] = {}  # connection name, [hdl]
-  additional_blocks: List[Tuple[str, str]] = []  # block name, block HDL
+def netlist_design(netlist: JsonNetlist, index: Optional[NetlistIndex] = None) -> NetlistDesign:
+  """Compiles the JsonNetlist to a structured design, validating it. The NetlistIndex is built if not provided."""
+  if index is None:
+    index = NetlistIndex(netlist)
+
+  additional_connections: Dict[str, List[PortRefDesign]] = {}  # connection name, [port]
+  additional_blocks: List[BlockDesign] = []
 
   # infer needed parts, just I2C pullup for now
-  for name, connection in connections_by_name.items():
+  for name, connection in index.connections.items():
     # i2c pull power is connected to the first connected power port of the controller
     I2C_IMPLICIT_CONTROLLER_POWER_PORTS = ['pwr_out', 'pwr']
 
-    connection_is_i2c = False
+    if not any(port_type.endswith('I2cController') or port_type.endswith('I2cTarget')
+               for port_type in connection.port_types()):
+      continue
     i2c_has_pullup = False
     controller_node = None
     for node, port in connection.ports:
-      if port.type.endswith('I2cController') or port.type.endswith('I2cTarget'):
-        connection_is_i2c = True
       if port.type.endswith('I2cController') and controller_node is None:  # take the first controller
         controller_node = node
       if node.data.type.endswith('I2cPullup'):
         i2c_has_pullup = True
-    if connection_is_i2c and not i2c_has_pullup and controller_node is not None:
+    if not i2c_has_pullup and controller_node is not None:
       # determine power node, from controller
       controller_power_net = None
-      controller_port_name_to_idx = {port.name: port.idx for port in controller_node.data.ports}
       for candidate_port_name in I2C_IMPLICIT_CONTROLLER_POWER_PORTS:
-        controller_port_idx = controller_port_name_to_idx.get(candidate_port_name, None)
-        if (controller_node.id, controller_port_idx) in connections_by_node_port:
-          controller_power_net = connections_by_node_port[(controller_node.id, controller_port_idx)].name
+        controller_port = index.port_by_name(controller_node.id, candidate_port_name)
+        controller_connection = index.connection_at(controller_node.id,
+                                                    controller_port.idx if controller_port is not None else None)
+        if controller_connection is not None:
+          controller_power_net = controller_connection.name
       if controller_power_net is not None:
         pullup_name = f'_implicit_i2c_pullup_{name}'
-        additional_blocks.append((pullup_name, 'I2cPullup()'))
-        additional_connections.setdefault(controller_power_net, []).append(f'{pullup_name}.pwr')
-        additional_connections.setdefault(name, []).append(f'{pullup_name}.i2c')
+        additional_blocks.append(BlockDesign(pullup_name, 'I2cPullup', []))
+        additional_connections.setdefault(controller_power_net, []).append(PortRefDesign(pullup_name, 'pwr'))
+        additional_connections.setdefault(name, []).append(PortRefDesign(pullup_name, 'i2c'))
 
   # then directed edges
   # TODO currently not supported in frontend
@@ -170,8 +298,8 @@ def tohdl_netlist(netlist: JsonNetlist) -> str:
   #   code += f"    self.connect({src_hdl}, {dst_hdl})\n"
 
   # declare blocks
-  blocks_code = []
-  connectors_code = []
+  blocks: List[BlockDesign] = []
+  connectors: List[ConnectorDesign] = []
   for node_id, node in netlist.graph.nodes.items():
     if not node.data.name.isidentifier():
       raise JsonNetlistValidationError([node.data.name], f"invalid block name")
@@ -180,54 +308,28 @@ def tohdl_netlist(netlist: JsonNetlist) -> str:
       raise JsonNetlistValidationError([node.data.name], f"invalid block class {block_class}")
 
     # fill in block args
-    args_elts = []
+    args: List[Tuple[str, ArgValue]] = []
     for arg_param in node.data.argParams:
-      if arg_param.default_value != arg_param.value and arg_param.value:
-        # parse and sanitize the value
-        if arg_param.type == 'int':
-          try:
-            arg_value = str(int(arg_param.value))
-          except ValueError:
-            raise JsonNetlistValidationError([node.data.name, arg_param], f"invalid non-int value {arg_param.value}")
-        elif arg_param.type == 'float':
-          try:
-            arg_value = str(float(arg_param.value))
-          except ValueError:
-            raise JsonNetlistValidationError([node.data.name, arg_param], f"invalid non-float value {arg_param.value}")
-        elif arg_param.type == 'range':
-          if not isinstance(arg_param.value, list) and len(arg_param.value) == 2:
-            raise JsonNetlistValidationError([node.data.name, arg_param], f"invalid value {arg_param.value}")
-          try:
-            arg_value = f"({float(arg_param.value[0])}, {float(arg_param.value[1])})"
-          except ValueError:
-            raise JsonNetlistValidationError([node.data.name, arg_param], f"invalid range-int value {arg_param.value}")
-        elif arg_param.type == 'string':
-          raise JsonNetlistValidationError([node.data.name, arg_param.name], f"TODO: strings unsupported")
-        else:
-          raise JsonNetlistValidationError([node.data.name, arg_param.name], f"unknown arg-param type {arg_param.type}")
-
-        args_elts.append(f"{arg_param.name}={arg_value}")
-    block_args_code = ', '.join(args_elts)
+      arg_value = parse_arg_value(node.data.name, arg_param)
+      if arg_value is not None:
+        args.append((arg_param.name, arg_value))
 
     if 'PassiveConnector' in node.data.superClasses:  # PassiveConnector args are handled in the connector block
-      connector_connections = [(port.idx, connections_by_node_port[(node_id, port.idx)]) for port in node.data.ports
-                               if (node_id, port.idx) in connections_by_node_port]
-      block_class, block_def = tohdl_connector(node, block_class, block_args_code, connector_connections)
-      connectors_code.append(block_def)
-      block_code = f"self.{node.data.name} = self.Block({block_class}())"
+      connector_connections = [(port.idx, index.connections_by_port[(node_id, port.idx)]) for port in node.data.ports
+                               if (node_id, port.idx) in index.connections_by_port]
+      connector = connector_design(node, block_class, args, connector_connections)
+      connectors.append(connector)
+      blocks.append(BlockDesign(node.data.name, connector.class_name, []))
     else:
-      block_code = f"self.{node.data.name} = self.Block({block_class}({block_args_code}))"
-
-    blocks_code.append(block_code)
+      blocks.append(BlockDesign(node.data.name, block_class, args))
 
   # generate additional blocks
-  for name, block_hdl in additional_blocks:
-    blocks_code.append(f"self.{name} = self.Block({block_hdl})")
+  blocks.extend(additional_blocks)
 
   # generate connect statements
-  connections_code = []
-  for name, connection in connections_by_name.items():
-    port_hdls = []
+  connects: List[List[PortRefDesign]] = []
+  for name, connection in index.connections.items():
+    port_refs = []
 
     for (containing_node, port) in connection.ports:
       if not port.name.isidentifier():
@@ -236,17 +338,33 @@ def tohdl_netlist(netlist: JsonNetlist) -> str:
         port_parent_port = containing_node.data.ports[port.elementOf].name
         if not port_parent_port.isidentifier():
           raise JsonNetlistValidationError([], f"invalid port label {containing_node.data.name}.{port_parent_port}")
-        if connection.is_array():
-          port_hdls.append(f"self.{containing_node.data.name}.{port_parent_port}.request_vector('{port.name}')")
-        else:
-          port_hdls.append(f"self.{containing_node.data.name}.{port_parent_port}.request('{port.name}')")
+        port_refs.append(PortRefDesign(containing_node.data.name, port_parent_port, port.name, connection.is_array()))
       else:  # single port
-        port_hdls.append(f"self.{containing_node.data.name}.{port.name}")
+        port_refs.append(PortRefDesign(containing_node.data.name, port.name))
+
+    port_refs.extend(additional_connections.get(name, []))
+
+    connects.append(port_refs)
+
+  return NetlistDesign(connectors, blocks, connects)
+
 
-    for connect_hdl in additional_connections.get(name, []):
-      port_hdls.append(f"self.{connect_hdl}")
+def tohdl_port_ref(port_ref: PortRefDesign) -> str:
+  if port_ref.request is None:
+    return f"self.{port_ref.block}.{port_ref.port}"
+  elif port_ref.request_vector:
+    return f"self.{port_ref.block}.{port_ref.port}.request_vector('{port_ref.request}')"
+  else:
+    return f"self.{port_ref.block}.{port_ref.port}.request('{port_ref.request}')"
 
-    connections_code.append(f"self.connect({', '.join(port_hdls)})")
+
+def tohdl_design(design: NetlistDesign) -> str:
+  """Compiles the structured design to HDL, returning the HDL code."""
+  connectors_code = [tohdl_connector(connector) for connector in design.connectors]
+  blocks_code = [f"self.{block.name} = self.Block({block.block_class}({tohdl_args(block.args)}))"
+                 for block in design.blocks]
+  connections_code = [f"self.connect({', '.join(tohdl_port_ref(port_ref) for port_ref in connect)})"
+                      for connect in design.connects]
 
   # compose into top-level code
   newline = '\n'  # not allowed in f-strings
@@ -260,3 +378,8 @@ class MyModule(SimpleBoardTop):
 
 {newline.join(map(lambda c: "    " + c, connections_code))}
 """
+
+
+def tohdl_netlist(netlist: JsonNetlist) -> str:
+  """Compiles the JsonNetlist to HDL, returning the HDL code."""
+  return tohdl_design(netlist_design(netlist))
@@ -0,0 +1,156 @@
+import json
+import os
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from PolymorphicBlocks import edg
+from netweaver_interface import JsonNetlist, JsonNode, JsonNodePort
+from hdl_generator import JsonNetlistValidationError, NetlistIndex, get_connector_type, parse_arg_value
+
+
+LIBRARY_RELPATH = 'resources/library.json'
+
+
+class LibraryPort(NamedTuple):
+  type: str  # port type, of the element if an array
+  is_array: bool
+
+
+class LibraryBlock(NamedTuple):
+  type: str
+  ports: Dict[str, LibraryPort]  # by name
+  arg_types: Dict[str, str]  # arg-param name -> type
+
+
+class LibraryIndex:
+  """Indexed view of the block library (as served by GET /library), to statically validate a JsonNetlist against the
+  library before compiling it: block types, arg-param names, types and values, connected port names and array-ness,
+  and port type compatibility on each label (including kConnectorTypeMap for connector pins).
+  Cheap relative to the compile, so invalid designs fail fast with precise paths."""
+  def __init__(self, library: Dict[str, Any]):
+    self.blocks: Dict[str, LibraryBlock] = {}
+    for block in library['blocks']:
+      self.blocks[block['type']] = LibraryBlock(
+        block['type'],
+        {port['name']: LibraryPort(port['type'], port['is_array']) for port in block['ports']},
+        {arg['name']: arg['type'] for arg in block['argParams']})
+    # port type -> link types that can connect it
+    port_links: Dict[str, Set[str]] = {}
+    for link in library['links']:
+      for port in link['ports']:
+        port_links.setdefault(port['type'], set()).add(link['type'])
+    self.port_links: Dict[str, FrozenSet[str]] = {port_type: frozenset(links)
+                                                  for port_type, links in port_links.items()}
+
+  @classmethod
+  def load(cls, base_dir: str) -> 'LibraryIndex':
+    with open(os.path.join(base_dir, LIBRARY_RELPATH)) as f:
+      return cls(json.load(f))
+
+  def _validate_node(self, node: JsonNode, errors: List[JsonNetlistValidationError]) -> None:
+    block = self.blocks.get(node.data.type)
+    if block is None:
+      errors.append(JsonNetlistValidationError([node.data.name], f"unknown block type {node.data.type}"))
+      return
+    for arg_param in node.data.argParams:
+      try:
+        if parse_arg_value(node.data.name, arg_param) is None:
+          continue  # left at the default, so not passed to the block
+      except JsonNetlistValidationError as e:
+        errors.append(e)
+        continue
+      arg_type = block.arg_types.get(arg_param.name)
+      if arg_type is None:
+        errors.append(JsonNetlistValidationError([node.data.name, arg_param.name],
+                                                 f"unknown parameter of {node.data.type}"))
+      elif arg_type != arg_param.type:
+        errors.append(JsonNetlistValidationError(
+          [node.data.name, arg_param.name], f"parameter type {arg_param.type} does not match library type {arg_type}"))
+
+  def validate_nodes(self, nodes: Iterable[JsonNode]) -> List[JsonNetlistValidationError]:
+    """Returns the errors found validating the block types and arg-params of the nodes, eg for nodes changed in a
+    netlist that passed validate. Block names and connections are not checked."""
+    errors: List[JsonNetlistValidationError] = []
+    for node in nodes:
+      self._validate_node(node, errors)
+    return errors
+
+  def _connected_port_type(self, node: JsonNode, port: JsonNodePort,
+                           errors: List[JsonNetlistValidationError]) -> Optional[str]:
+    """Validates a connected port of a known block, returning its library type (of the element, for array requests),
+    or None if invalid or if not typed in the library (connector pins)."""
+    block = self.blocks[node.data.type]
+    if 'PassiveConnector' in node.data.superClasses:  # pins are instantiated as port_<n>, see connector_design
+      if not port.name.startswith('port_') or not port.name[5:].isdigit():
+        errors.append(JsonNetlistValidationError([node.data.name, port.name], f"invalid connector port name"))
+      return None
+    elif port.elementOf is not None:
+      if not 0 <= port.elementOf < len(node.data.ports):
+        errors.append(JsonNetlistValidationError([node.data.name, port.name],
+                                                 f"request on unknown port {port.elementOf}"))
+        return None
+      parent_name = node.data.ports[port.elementOf].name
+      parent = block.ports.get(parent_name)
+      if parent is None or not parent.is_array:
+        errors.append(JsonNetlistValidationError([node.data.name, port.name],
+                                                 f"request on non-array port {parent_name}"))
+        return None
+      return parent.type
+    else:
+      library_port = block.ports.get(port.name)
+      if library_port is None:
+        errors.append(JsonNetlistValidationError([node.data.name, port.name], f"unknown port of {node.data.type}"))
+        return None
+      elif library_port.is_array != port.array:
+        array_desc = 'an array' if library_port.is_array else 'not an array'
+        errors.append(JsonNetlistValidationError([node.data.name, port.name], f"port is {array_desc} in the library"))
+        return None
+      return library_port.type
+
+  def validate(self, netlist: JsonNetlist, index: Optional[NetlistIndex] = None) -> List[JsonNetlistValidationError]:
+    """Returns all the errors found validating the netlist against the library, empty if valid.
+    The NetlistIndex is built if not provided, which may raise JsonNetlistValidationError for dangling labels."""
+    if index is None:
+      index = NetlistIndex(netlist)
+    errors: List[JsonNetlistValidationError] = []
+    names: Set[str] = set()
+    for node in netlist.graph.nodes.values():
+      if node.data.name in names:
+        errors.append(JsonNetlistValidationError([node.data.name], f"duplicate block name"))
+      names.add(node.data.name)
+      self._validate_node(node, errors)
+
+    # ports are only checked where connected, unconnected ports (eg, stale after a library update) are ignored
+    for name, connection in index.connections.items():
+      typed_ports: List[Tuple[JsonNode, JsonNodePort, str]] = []
+      connector_ports: List[Tuple[JsonNode, JsonNodePort]] = []
+      for node, port in connection.ports:
+        if node.data.type not in self.blocks:
+          continue  # already reported
+        if 'PassiveConnector' in node.data.superClasses:
+          connector_ports.append((node, port))
+        port_type = self._connected_port_type(node, port, errors)
+        if port_type is not None:
+          typed_ports.append((node, port, port_type))
+
+      # the link is the one that can connect the most ports, the ports it can't connect are in error
+      link_counts: Dict[str, int] = {}
+      for node, port, port_type in typed_ports:
+        for port_link in self.port_links.get(port_type, ()):
+          link_counts[port_link] = link_counts.get(port_link, 0) + 1
+      link: Optional[str] = max(link_counts, key=lambda port_link: link_counts[port_link]) if link_counts else None
+      for node, port, port_type in typed_ports:
+        if link is None or link not in self.port_links.get(port_type, ()):
+          errors.append(JsonNetlistValidationError([node.data.name, port.name],
+                                                   f"{port_type} can't connect to {link} on {name}"))
+      connected_types = [port_type for node, port, port_type in typed_ports]
+
+      if connector_ports and connected_types:  # connector pins adapt to the other ports, see connector_design
+        connector_node, connector_port = connector_ports[0]
+        err_path = [connector_node.data.name, connector_port.name]
+        try:
+          if not all(hasattr(edg, port_type) for port_type in connected_types):
+            raise JsonNetlistValidationError(err_path, f"invalid port type in {', '.join(connected_types)}")
+          get_connector_type(err_path, [getattr(edg, port_type) for port_type in connected_types])
+        except JsonNetlistValidationError as e:
+          errors.append(e)
+    return errors
@@ -1,7 +1,15 @@
 # Simple tool that scans for libraries and dumps the whole thing to a proto file
+import argparse
+import ast
+import hashlib
 import inspect
+import os
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from itertools import chain
-from typing import Optional, List, Any, Union, Tuple, cast
+from typing import Optional, List, Any, Union, Tuple, Type, NamedTuple, Dict, cast
 
 from pydantic import BaseModel
 
@@ -292,131 +300,259 @@ class LibraryJson(BaseModel):
 
 
 OUTPUT_FILE = "resources/library.json"
+CACHE_FILE = ".library_cache.pickle"  # per-class elaboration results, for incremental regeneration
+
+
+def is_excluded_class(block: Block) -> bool:
+  if isinstance(block, BlockInterfaceMixin) and block._is_mixin():
+    return True
+  if isinstance(block, InternalBlock) and not isinstance(block, PassiveConnector):
+    return True
+  if block.__class__ is BaseIoController:  # manual exclusions
+    return True
+  return False
+
+
+def block_arg_params(name: str, instance: Block) -> list[ParamJsonDict]:
+  """Returns the arg-params of a block, from _init_params_value."""
+  argParams = []
+  for param_name, (param, param_value) in instance._init_params_value.items():
+    default_value: Optional[ParamValueTypes] = None
+    if isinstance(param, FloatExpr):
+      param_type = 'float'
+      if param_value is not None:
+        default_value = test_cast(cast(ConstraintExpr, param_value).binding, FloatLiteralBinding).value
+    elif isinstance(param, IntExpr):
+      param_type = 'int'
+      if param_value is not None:
+        default_value = test_cast(cast(ConstraintExpr, param_value).binding, IntLiteralBinding).value
+    elif isinstance(param, BoolExpr):
+      param_type = 'bool'
+      if param_value is not None:
+        default_value = test_cast(cast(ConstraintExpr, param_value).binding, BoolLiteralBinding).value
+    elif isinstance(param, StringExpr):
+      param_type = 'str'
+      if param_value is not None:
+        default_value = test_cast(cast(ConstraintExpr, param_value).binding, StringLiteralBinding).value
+    elif isinstance(param, RangeExpr):
+      param_type = 'range'
+      if param_value is not None:
+        value_range = test_cast(cast(ConstraintExpr, param_value).binding, RangeLiteralBinding).value
+        default_value = (value_range.lower, value_range.upper)
+    elif isinstance(param, (ArrayIntExpr, ArrayBoolExpr, ArrayFloatExpr, ArrayStringExpr)):
+      param_type = 'array'
+      if param_value is not None:
+        binding = cast(ConstraintExpr, param_value).binding
+        if isinstance(binding, ArrayBinding):
+          assert binding.values == []  # TODO support array literals with values
+        elif isinstance(binding, ArrayLiteralBinding):
+          assert binding.values == []
+        else:
+          raise TypeError()
+        default_value = []
+    else:
+      raise ValueError(f"{name}.{param_name} unknown param type {type(param)}")
+
+    doc = None
+    if hasattr(instance, param_name) and getattr(instance, param_name) in instance._param_docs:
+      doc = instance._param_docs[getattr(instance, param_name)]
+
+    argParams.append(ParamJsonDict(
+      name=param_name,
+      type=param_type,
+      default_value=default_value,
+      docstring=doc
+    ))
+  return argParams
+
+
+class ElaboratedClass(NamedTuple):
+  """Result of elaborating a single library class, merged into the library in class order."""
+  name: str
+  block: Optional[BlockJsonDict] = None
+  link: Optional[BlockJsonDict] = None
+  superclasses: list[str] = []  # direct superclass simple names of a block, or [''] for the root
+  excluded: Optional[str] = None  # simple name of an excluded block class
+  elapsed: float = 0  # elaboration time, in seconds
+
+
+def elaborate_library_class(cls: Type[LibraryElement]) -> ElaboratedClass:
+  start = time.perf_counter()
+  instance = cls()
+  name = cls.__name__
+  if isinstance(instance, Block):
+    if is_excluded_class(instance):
+      return ElaboratedClass(name, excluded=simpleName(edgir.libpath(instance._get_def_name())))
+
+    block_proto = builder.elaborate_toplevel(instance)
+
+    block_docstring = None
+    if cls.__doc__ is not None:
+      block_docstring = inspect.cleandoc(cls.__doc__)
+
+    block_dict = BlockJsonDict(
+      name="",  # empty for libraries
+      type=simpleName(block_proto.self_class),
+      superClasses=[simpleName(superclass) for superclass in block_proto.superclasses]
+                   + [simpleName(superclass) for superclass in block_proto.super_superclasses],
+      ports=[pb_to_port(instance, block_proto, pair) for pair in block_proto.ports],
+      argParams=block_arg_params(name, instance),
+      is_abstract=block_proto.is_abstract,
+      docstring=block_docstring
+    )
+    superclasses = [simpleName(superclass) for superclass in block_proto.superclasses]
+    if not block_proto.superclasses:  # no superclasses, add to root
+      superclasses = ['']
+    return ElaboratedClass(name, block=block_dict, superclasses=superclasses,
+                           elapsed=time.perf_counter() - start)
+  elif isinstance(instance, Link):
+    link_proto = builder.elaborate_toplevel(instance)
+    link_dict = BlockJsonDict(
+      name="",  # empty for libraries
+      type=simpleName(link_proto.self_class),
+      ports=[pb_to_port(instance, link_proto, pair) for pair in link_proto.ports],
+      docstring=inspect.getdoc(cls)
+    )
+    return ElaboratedClass(name, link=link_dict, elapsed=time.perf_counter() - start)
+  else:  # Bundle and Port, not currently exported
+    return ElaboratedClass(name, elapsed=time.perf_counter() - start)
+
+
+def elaborate_library_classes(classes: List[Type[LibraryElement]], jobs: int) -> List[ElaboratedClass]:
+  """Elaborates all classes, in parallel across jobs processes if jobs > 1, returning results in class order
+  and printing progress as classes complete."""
+  def print_progress(done: int, elaborated: ElaboratedClass) -> None:
+    if elaborated.excluded is None:
+      print(f"[{done}/{len(classes)}] Elaborated {elaborated.name} ({elaborated.elapsed:.2f}s)")
+
+  if jobs <= 1:
+    results = []
+    for cls in classes:
+      results.append(elaborate_library_class(cls))
+      print_progress(len(results), results[-1])
+    return results
+
+  with ProcessPoolExecutor(max_workers=jobs) as executor:
+    futures = {executor.submit(elaborate_library_class, cls): i for i, cls in enumerate(classes)}
+    ordered_results: List[Optional[ElaboratedClass]] = [None] * len(classes)
+    for done, future in enumerate(as_completed(futures)):
+      ordered_results[futures[future]] = future.result()
+      print_progress(done + 1, future.result())
+  return [result for result in ordered_results if result is not None]
+
+
+def class_path(cls: type) -> str:
+  return f"{cls.__module__}.{cls.__qualname__}"
+
+
+class ClassHasher:
+  """Computes cache keys for library classes from the source of the class and each class in its MRO,
+  memoizing the per-class source hashes. Note, changes outside class bodies (eg, helper functions or
+  port definitions) are not detected, regenerate with --no-cache after those."""
+  def __init__(self) -> None:
+    self._source_hashes: Dict[type, str] = {}
+    self._module_sources: Dict[str, Dict[str, str]] = {}  # module name -> class qualname -> source
+
+  def _module_class_sources(self, module_name: str) -> Dict[str, str]:
+    """Returns the source of all classes in a module, parsing it once (instead of per inspect.getsource call)."""
+    class_sources = self._module_sources.get(module_name)
+    if class_sources is None:
+      class_sources = {}
+      try:
+        module_source = inspect.getsource(sys.modules[module_name])
+      except (OSError, TypeError, KeyError):  # source not available, eg builtins
+        module_source = ''
+      module_lines = module_source.splitlines(keepends=True)
+
+      def visit(node: ast.AST, prefix: str) -> None:
+        for child in ast.iter_child_nodes(node):
+          if isinstance(child, ast.ClassDef):
+            start = min([child.lineno] + [decorator.lineno for decorator in child.decorator_list])
+            class_sources[prefix + child.name] = ''.join(module_lines[start - 1:child.end_lineno])
+            visit(child, f"{prefix}{child.name}.")
+          elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            visit(child, f"{prefix}{child.name}.<locals>.")
+      visit(ast.parse(module_source), '')
+      self._module_sources[module_name] = class_sources
+    return class_sources
+
+  def _source_hash(self, cls: type) -> str:
+    source_hash = self._source_hashes.get(cls)
+    if source_hash is None:
+      source = self._module_class_sources(cls.__module__).get(cls.__qualname__, '')
+      source_hash = hashlib.sha256(f"{class_path(cls)}\n{source}".encode('utf-8')).hexdigest()
+      self._source_hashes[cls] = source_hash
+    return source_hash
+
+  def key(self, cls: type) -> str:
+    return hashlib.sha256(''.join(self._source_hash(mro_cls) for mro_cls in cls.__mro__
+                                  if mro_cls is not object).encode('utf-8')).hexdigest()
+
+
+def load_cache(generator_hash: str) -> Dict[str, Tuple[str, ElaboratedClass]]:
+  """Loads the elaboration cache (class path -> (class key, result)), discarding it if this script changed."""
+  try:
+    with open(CACHE_FILE, 'rb') as f:
+      cached_generator_hash, cache = pickle.load(f)
+  except (OSError, pickle.UnpicklingError, EOFError, ValueError, AttributeError):
+    return {}
+  if cached_generator_hash != generator_hash:
+    return {}
+  return cast(Dict[str, Tuple[str, ElaboratedClass]], cache)
+
 
 if __name__ == '__main__':
-  library = LibraryElementIndexer()
+  parser = argparse.ArgumentParser()
+  parser.add_argument('-j', '--jobs', type=int, default=1,
+                      help="number of elaboration processes, 0 for the CPU count (default: 1, serial)")
+  parser.add_argument('--no-cache', action='store_true',
+                      help="re-elaborate all classes, ignoring the per-class elaboration cache")
+  args = parser.parse_args()
+  jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
 
-  pb = edgir.Library()
+  library = LibraryElementIndexer()
+  # sort for a deterministic merge order, indexing returns a set
+  classes = sorted(library.index_module(edg), key=lambda cls: (cls.__module__, cls.__qualname__))
+
+  start = time.perf_counter()
+  with open(__file__, 'rb') as f:  # changes to this script invalidate the whole cache
+    generator_hash = hashlib.sha256(f.read()).hexdigest()
+  cache = {} if args.no_cache else load_cache(generator_hash)
+  hasher = ClassHasher()
+  class_keys = [hasher.key(cls) for cls in classes]
+  stale_classes = [cls for cls, key in zip(classes, class_keys)
+                   if cache.get(class_path(cls), (None, None))[0] != key]
+  print(f"Elaborating {len(stale_classes)} of {len(classes)} classes, others unchanged from {CACHE_FILE}")
+
+  elaborated_stale = dict(zip(stale_classes, elaborate_library_classes(stale_classes, jobs)))
+  elaborated_classes = [elaborated_stale[cls] if cls in elaborated_stale else cache[class_path(cls)][1]
+                        for cls in classes]
+  elapsed = time.perf_counter() - start
+
+  with open(CACHE_FILE, 'wb') as cache_file:
+    pickle.dump((generator_hash, {class_path(cls): (key, elaborated)
+                                  for cls, key, elaborated in zip(classes, class_keys, elaborated_classes)}),
+                cache_file)
 
   all_blocks = []
   all_links = []
 
   subclasses: dict[str, list[str]] = {}  # superclass -> [subclasses]
-  excluded_classes: list[Block] = []  # list of excluded classes
-
-  def is_excluded_class(block: Block) -> bool:
-    if isinstance(block, BlockInterfaceMixin) and block._is_mixin():
-      return True
-    if isinstance(block, InternalBlock) and not isinstance(block, PassiveConnector):
-      return True
-    if block.__class__ is BaseIoController:  # manual exclusions
-      return True
-    return False
+  excluded_class_simplenames: list[str] = []  # list of excluded classes
 
   count = 0
-  for cls in library.index_module(edg):
-    instance = cls()
-    name = cls.__name__
-    if isinstance(instance, Block):
-      if is_excluded_class(instance):
-        excluded_classes.append(instance)
-        continue  # skip
-
-      print(f"Elaborating block {name}")
-      block_proto = builder.elaborate_toplevel(instance)
-
-      # get arg-params from _init_params_value
-      argParams = []
-      for param_name, (param, param_value) in instance._init_params_value.items():
-        default_value: Optional[ParamValueTypes] = None
-        if isinstance(param, FloatExpr):
-          param_type = 'float'
-          if param_value is not None:
-            default_value = test_cast(cast(ConstraintExpr, param_value).binding, FloatLiteralBinding).value
-        elif isinstance(param, IntExpr):
-          param_type = 'int'
-          if param_value is not None:
-            default_value = test_cast(cast(ConstraintExpr, param_value).binding, IntLiteralBinding).value
-        elif isinstance(param, BoolExpr):
-          param_type = 'bool'
-          if param_value is not None:
-            default_value = test_cast(cast(ConstraintExpr, param_value).binding, BoolLiteralBinding).value
-        elif isinstance(param, StringExpr):
-          param_type = 'str'
-          if param_value is not None:
-            default_value = test_cast(cast(ConstraintExpr, param_value).binding, StringLiteralBinding).value
-        elif isinstance(param, RangeExpr):
-          param_type = 'range'
-          if param_value is not None:
-            value_range = test_cast(cast(ConstraintExpr, param_value).binding, RangeLiteralBinding).value
-            default_value = (value_range.lower, value_range.upper)
-        elif isinstance(param, (ArrayIntExpr, ArrayBoolExpr, ArrayFloatExpr, ArrayStringExpr)):
-          param_type = 'array'
-          if param_value is not None:
-            binding = cast(ConstraintExpr, param_value).binding
-            if isinstance(binding, ArrayBinding):
-              assert binding.values == []  # TODO support array literals with values
-            elif isinstance(binding, ArrayLiteralBinding):
-              assert binding.values == []
-            else:
-              raise TypeError()
-            default_value = []
-        else:
-          raise ValueError(f"{name}.{param_name} unknown param type {type(param)}")
-
-        doc = None
-        if hasattr(instance, param_name) and getattr(instance, param_name) in instance._param_docs:
-          doc = instance._param_docs[getattr(instance, param_name)]
-
-        argParams.append(ParamJsonDict(
-          name=param_name,
-          type=param_type,
-          default_value=default_value,
-          docstring=doc
-        ))
-
-      block_docstring = None
-      if cls.__doc__ is not None:
-        block_docstring = inspect.cleandoc(cls.__doc__)
-
-      block_dict = BlockJsonDict(
-        name="",  # empty for libraries
-        type=simpleName(block_proto.self_class),
-        superClasses=[simpleName(superclass) for superclass in block_proto.superclasses]
-                     + [simpleName(superclass) for superclass in block_proto.super_superclasses],
-        ports=[pb_to_port(instance, block_proto, pair) for pair in block_proto.ports],
-        argParams=argParams,
-        is_abstract=block_proto.is_abstract,
-        docstring=block_docstring
-      )
-      all_blocks.append(block_dict)
-
-      for superclass in block_proto.superclasses:
-        subclasses.setdefault(simpleName(superclass), []).append(simpleName(block_proto.self_class))
-      if not block_proto.superclasses:  # no superclasses, add to root
-        subclasses.setdefault('', []).append(simpleName(block_proto.self_class))
-    elif isinstance(instance, Link):
-      link_proto = builder.elaborate_toplevel(instance)
-      pb.root.members[name].link.CopyFrom(link_proto)
-
-      link_dict = BlockJsonDict(
-        name="",  # empty for libraries
-        type=simpleName(link_proto.self_class),
-        ports=[pb_to_port(instance, link_proto, pair) for pair in link_proto.ports],
-        docstring=inspect.getdoc(cls)
-      )
-      all_links.append(link_dict)
-
-    elif isinstance(instance, Bundle):  # TODO: note Bundle extends Port, so this must come first
-      # pb.root.members[name].bundle.CopyFrom(obj._def_to_proto())
-      pass
-    elif isinstance(instance, Port):
-      # pb.root.members[name].port.CopyFrom(obj._def_to_proto())
-      pass
-
+  for elaborated in elaborated_classes:
+    if elaborated.excluded is not None:
+      excluded_class_simplenames.append(elaborated.excluded)
+      continue  # skip
+    if elaborated.block is not None:
+      all_blocks.append(elaborated.block)
+      for superclass in elaborated.superclasses:
+        subclasses.setdefault(superclass, []).append(elaborated.block.type)
+    if elaborated.link is not None:
+      all_links.append(elaborated.link)
     count += 1
 
-  excluded_class_simplenames = [simpleName(edgir.libpath(block._get_def_name())) for block in excluded_classes]
   for block in all_blocks:
     block.superClasses = [superclass for superclass in block.superClasses
                           if superclass not in excluded_class_simplenames]
@@ -449,6 +585,9 @@ if __name__ == '__main__':
     typeHierarchyTree=TypeHierarchyNode(name='', children=root_hierarchy_elts)
   )
 
+  slowest = sorted(elaborated_stale.values(), key=lambda elaborated: elaborated.elapsed, reverse=True)[:10]
+  print(f"Elaborated {len(stale_classes)} classes in {elapsed:.1f}s with {jobs} jobs, slowest: " +
+        ', '.join(f"{elaborated.name} ({elaborated.elapsed:.2f}s)" for elaborated in slowest))
   print(f"Writing {count} classes to {OUTPUT_FILE}")
 
   with open(OUTPUT_FILE, 'w') as file:
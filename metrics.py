@@ -0,0 +1,154 @@
+import abc
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# latency buckets (in seconds), from sub-millisecond stages to full Scala compiles
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape_label(value: str) -> str:
+  return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(label_names: Sequence[str], label_values: Sequence[str], extra: str = '') -> str:
+  labels = [f'{name}="{_escape_label(value)}"' for name, value in zip(label_names, label_values)]
+  if extra:
+    labels.append(extra)
+  return '{' + ','.join(labels) + '}' if labels else ''
+
+
+class Metric(abc.ABC):
+  """Base class for metrics exposed in the Prometheus text format, registered in REGISTRY on creation.
+  Thread-safe."""
+  type_name = ''
+
+  def __init__(self, name: str, help: str, label_names: Sequence[str] = ()):
+    self.name = name
+    self.help = help
+    self.label_names = tuple(label_names)
+    self._lock = threading.Lock()
+    REGISTRY.append(self)
+
+  @abc.abstractmethod
+  def _samples(self) -> List[str]:
+    """Returns the sample lines, called with the lock held."""
+
+  def expose(self) -> str:
+    with self._lock:
+      samples = self._samples()
+    return '\n'.join([f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type_name}"] + samples)
+
+
+class Counter(Metric):
+  type_name = 'counter'
+
+  def __init__(self, name: str, help: str, label_names: Sequence[str] = ()):
+    super().__init__(name, help, label_names)
+    self._values: Dict[Tuple[str, ...], float] = {}
+
+  def inc(self, *label_values: str, amount: float = 1) -> None:
+    with self._lock:
+      self._values[label_values] = self._values.get(label_values, 0) + amount
+
+  def _samples(self) -> List[str]:
+    return [f"{self.name}{_format_labels(self.label_names, labels)} {value}"
+            for labels, value in sorted(self._values.items())]
+
+
+class Gauge(Counter):
+  type_name = 'gauge'
+
+  def dec(self, *label_values: str, amount: float = 1) -> None:
+    self.inc(*label_values, amount=-amount)
+
+
+class Histogram(Metric):
+  type_name = 'histogram'
+
+  def __init__(self, name: str, help: str, label_names: Sequence[str] = (),
+               buckets: Sequence[float] = DEFAULT_BUCKETS):
+    super().__init__(name, help, label_names)
+    self.buckets = tuple(buckets)
+    self._values: Dict[Tuple[str, ...], Tuple[List[int], float]] = {}  # labels -> (bucket counts, sum)
+
+  def observe(self, value: float, *label_values: str) -> None:
+    with self._lock:
+      counts, total = self._values.get(label_values) or ([0] * (len(self.buckets) + 1), 0.0)
+      counts[bisect.bisect_left(self.buckets, value)] += 1
+      self._values[label_values] = (counts, total + value)
+
+  def _samples(self) -> List[str]:
+    samples = []
+    for labels, (counts, total) in sorted(self._values.items()):
+      cumulative = 0
+      for bound, count in zip(list(self.buckets) + ['+Inf'], counts):  # type: ignore
+        cumulative += count
+        bucket_labels = _format_labels(self.label_names, labels, 'le="' + str(bound) + '"')
+        samples.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+      samples.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {total}")
+      samples.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}")
+    return samples
+
+
+REGISTRY: List[Metric] = []
+
+
+def expose_metrics() -> str:
+  """Returns all registered metrics in the Prometheus text exposition format."""
+  return '\n'.join(metric.expose() for metric in REGISTRY) + '\n'
+
+
+compile_stage_seconds = Histogram('netweaver_compile_stage_seconds', "Duration of each compile stage.", ['stage'])
+
+_local = threading.local()
+
+
+def set_timings_collector(timings: Optional[List[Tuple[str, float]]]) -> Optional[List[Tuple[str, float]]]:
+  """Sets the list that (stage, seconds) timings recorded in this thread are appended to, returning the previous
+  one. Prefer collect_timings where the collection has a lexical scope."""
+  prev: Optional[List[Tuple[str, float]]] = getattr(_local, 'timings', None)
+  _local.timings = timings
+  return prev
+
+
+def get_timings_collector() -> Optional[List[Tuple[str, float]]]:
+  """Returns the list that timings recorded in this thread are appended to, eg to propagate it to worker threads."""
+  return getattr(_local, 'timings', None)
+
+
+@contextmanager
+def collect_timings() -> Iterator[List[Tuple[str, float]]]:
+  """Collects (stage, seconds) timings recorded in this thread while in the context, eg for a Server-Timing header."""
+  timings: List[Tuple[str, float]] = []
+  prev = set_timings_collector(timings)
+  try:
+    yield timings
+  finally:
+    set_timings_collector(prev)
+
+
+def record_timing(stage: str, seconds: float) -> None:
+  """Records a stage duration into the stage histogram and the current collect_timings, if any."""
+  compile_stage_seconds.observe(seconds, stage)
+  timings: Optional[List[Tuple[str, float]]] = getattr(_local, 'timings', None)
+  if timings is not None:
+    timings.append((stage, seconds))
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+  """Times the enclosed code as a compile stage."""
+  start = time.perf_counter()
+  try:
+    yield
+  finally:
+    record_timing(stage, time.perf_counter() - start)
+
+
+def server_timing(timings: Sequence[Tuple[str, float]]) -> str:
+  """Formats timings as a Server-Timing header value, with durations in ms."""
+  return ', '.join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings)
@@ -1,17 +1,27 @@
-from typing import cast, Optional
+from typing import cast, Optional, Dict, Any, Callable, Iterable, Iterator, Tuple, AbstractSet
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from pydantic import BaseModel
 
 import os.path
+import threading
+from types import ModuleType
 from PolymorphicBlocks.edg import core, edgir
 from PolymorphicBlocks.edg.electronics_model.footprint import RefdesMode
 from netweaver_interface import JsonNetlist
-from hdl_generator import tohdl_netlist
+from hdl_generator import tohdl_netlist, netlist_design, tohdl_design, NetlistIndex, NetlistDesign, \
+  JsonNetlistValidationErrors
+from hdl_builder import build_design, generated_module, stable_class_paths
+from footprint_index import FootprintIndex, FOOTPRINT_LIBRARY_RELPATHS
+from library_index import LibraryIndex
+from elaboration_cache import ElaborationCache
+from metrics import timed, get_timings_collector, set_timings_collector
 
 
 class KicadFootprint(BaseModel):
   library: str  # full library name, including the library and the footprint
   name: str  # JS name, containing only the second part of the library name and with character replacements (eg . -> _)
-  data: str  # raw Kicad .kicad_mod data
+  data: Optional[str] = None  # raw Kicad .kicad_mod data, may be omitted if the client has it cached by hash
+  hash: str = ""  # content hash of data, see GET /footprint/<hash>
 
 
 class CompilerError(BaseModel):
@@ -30,44 +40,183 @@ class CompilerResult(BaseModel):
   errors: list[CompilerError] = []
 
 
-FOOTPRINT_LIBRARY_RELPATHS = [
-  'footprints/kicad-footprints',
-  'footprints/kiswitch/library/footprints',
-  'footprints/OPL_Kicad_Library',
-  'PolymorphicBlocks/examples',
-]
+# compile stages, in the order they are produced, and the CompilerResult field each populates
+COMPILE_STAGES = {
+  'hdl': 'edgHdl',
+  'errors': 'errors',
+  'kicadNetlist': 'kicadNetlist',
+  'bom': 'bom',
+  'footprints': 'kicadFootprints',
+  'svgpcb': 'svgpcb',
+}
 
 
-def compile_netlist(netweaver_netlist: JsonNetlist) -> CompilerResult:
-  """Compiles the JsonNetlist to a KiCad netlist, returning the KiCad netlist along with a list of model
-  validation errors (if any)."""
-  code = f"""\
-from PolymorphicBlocks.edg import *
+footprint_index = FootprintIndex.load_or_build(os.path.dirname(os.path.abspath(__file__)))
+library_index = LibraryIndex.load(os.path.dirname(os.path.abspath(__file__)))
 
-"""
+# memoized block elaborations across compiles in this process, or 0 to disable
+ELABORATION_CACHE_SIZE = int(os.environ.get('ELABORATION_CACHE_SIZE', 4096))
+elaboration_cache = ElaborationCache(ELABORATION_CACHE_SIZE)
+if ELABORATION_CACHE_SIZE > 0:
+  elaboration_cache.install()
 
-  hdl = tohdl_netlist(netweaver_netlist)
-  code += hdl
 
-  code += """
+# held while using the Scala compiler (one compiler process, driven over a pipe) or instantiating blocks (which uses the
+# global edg builder), which are process-wide, so concurrent in-process compiles only overlap in the other stages
+edg_lock = threading.Lock()
+
+
+# threads running the post-compile stages (kicadNetlist, bom, footprints, svgpcb), which only read the compiled design
+# and shared netlist so are independent of each other, or 0 to run them in the compiling thread
+POST_COMPILE_THREADS = int(os.environ.get('POST_COMPILE_THREADS', 4))
+post_compile_executor = ThreadPoolExecutor(POST_COMPILE_THREADS, thread_name_prefix='post_compile') \
+  if POST_COMPILE_THREADS > 0 else None
 
-compiled = ScalaCompiler.compile(MyModule, ignore_errors=True)
-compiled.append_values(RefdesRefinementPass().run(compiled))
-"""
 
-  exec_env = {}
-  exec(code, exec_env)
+def _submit_stage(stage: str, fn: Callable[[], Any]) -> 'Future[Any]':
+  """Runs fn as a timed stage on the post-compile executor, recording timings into this thread's collector."""
+  timings = get_timings_collector()
 
-  compiled = cast(core.ScalaCompilerInterface.CompiledDesign, exec_env['compiled'])
+  def run_stage() -> Any:
+    prev = set_timings_collector(timings)
+    try:
+      with timed(stage):
+        return fn()
+    finally:
+      set_timings_collector(prev)
+
+  if post_compile_executor is None:
+    future: Future[Any] = Future()
+    try:
+      future.set_result(run_stage())
+    except BaseException as e:
+      future.set_exception(e)
+    return future
+  return post_compile_executor.submit(run_stage)
+
+
+def stages_result(stages: Iterable[Tuple[str, Any]]) -> CompilerResult:
+  """Assembles a CompilerResult from (stage, value) pairs, as produced by compile_netlist_stages."""
+  return CompilerResult(**{COMPILE_STAGES[stage]: value for stage, value in stages})
+
+
+def compile_netlist(netweaver_netlist: JsonNetlist, direct_build: bool = False,
+                    artifacts: Optional[AbstractSet[str]] = None) -> CompilerResult:
+  """Compiles the JsonNetlist to a KiCad netlist, returning the KiCad netlist along with a list of model
+  validation errors (if any).
+  If direct_build, the design classes are built directly from the netlist instead of exec'ing the generated HDL,
+  the HDL is still generated for display.
+  If artifacts is specified, only those stages (see COMPILE_STAGES) are populated in the result."""
+  return stages_result(compile_netlist_stages(netweaver_netlist, direct_build, artifacts))
+
+
+def compile_netlist_stages(netweaver_netlist: JsonNetlist, direct_build: bool = False,
+                           artifacts: Optional[AbstractSet[str]] = None,
+                           validated: bool = False) -> Iterator[Tuple[str, Any]]:
+  """Compiles the JsonNetlist, yielding (stage, value) pairs (see COMPILE_STAGES) as each stage completes.
+  If artifacts is specified, only those stages are produced (hdl is always produced), and work only needed for other
+  stages is skipped.
+  The netlist is first validated against the library, raising JsonNetlistValidationErrors with all the errors found
+  before any compile work, unless validated (already checked by the caller, eg sweep variants, see apply_overrides)."""
+  if artifacts is None:
+    artifacts = COMPILE_STAGES.keys()
+
+  with timed('library_check'):
+    index = NetlistIndex(netweaver_netlist)
+    validation_errors = library_index.validate(netweaver_netlist, index) if not validated else []
+  if validation_errors:
+    raise JsonNetlistValidationErrors(validation_errors)
+
+  with timed('tohdl'):
+    design = netlist_design(netweaver_netlist, index)
+    hdl = tohdl_design(design)
+  yield 'hdl', hdl
+  if not artifacts - {'hdl'}:  # everything else requires compiling the design
+    return
+
+  with generated_module() as module:  # the generated classes are freed once the compile completes
+    yield from _compile_design_stages(design, hdl, module, direct_build, artifacts)
+
+
+def _compile_design_stages(design: NetlistDesign, hdl: str, module: ModuleType, direct_build: bool,
+                           artifacts: AbstractSet[str]) -> Iterator[Tuple[str, Any]]:
+  """Compiles the structured design, with its classes generated in the module (see generated_module), yielding the
+  stages after hdl."""
+  from PolymorphicBlocks.edg import ScalaCompiler, RefdesRefinementPass
+  if direct_build:
+    with timed('build'):
+      top_class = build_design(design, module)
+  else:
+    code = f"""\
+from PolymorphicBlocks.edg import *
+
+"""
+    code += hdl
+
+    with timed('exec'):
+      exec(code, module.__dict__)
+      top_class = module.MyModule
+
+  with timed('scala_compile'), edg_lock:
+    compiled = ScalaCompiler.compile(top_class, ignore_errors=True)
+  with timed('refdes'):
+    compiled.append_values(RefdesRefinementPass().run(compiled))
+
+  if 'errors' in artifacts:
+    errors = []
+    for error in compiled.errors:
+      # suppress some manufacturability warnings
+      if error.name == 'required basic part':
+        continue
+
+      errors.append(CompilerError(
+        path=edgir.local_path_to_str_list(error.path),
+        kind=error.kind,
+        name=error.name,
+        details=stable_class_paths(error.details, module)
+      ))
+    yield 'errors', errors
 
   from PolymorphicBlocks.edg.electronics_model.NetlistGenerator import NetlistTransform
   from PolymorphicBlocks.edg.electronics_model.footprint import generate_netlist
   from PolymorphicBlocks.edg.electronics_model.BomBackend import GenerateBom
-  from PolymorphicBlocks.edg import SvgPcbTemplateBlock, SvgPcbBackend
-
-  netlist = NetlistTransform(compiled).run()
-  kicad_netlist = generate_netlist(netlist, RefdesMode.PathnameAsValue)
-  bom = GenerateBom().run(compiled)[0][1]
+  from svgpcb_compiler import SvgPcbBackend
+
+  def generate_svgpcb() -> str:
+    with edg_lock:  # SvgPcbBackend instantiates blocks
+      return SvgPcbBackend()._generate(compiled, netlist)
+
+  # post-compile stage DAG: the BOM only needs the compiled design so starts alongside the netlist transform, the
+  # other stages share the one netlist. All stages finish before the generated module is released.
+  stages: Dict[str, Future[Any]] = {}
+  try:
+    if 'bom' in artifacts:
+      stages['bom'] = _submit_stage('bom', lambda: GenerateBom().run(compiled)[0][1])
+
+    if artifacts & {'kicadNetlist', 'footprints', 'svgpcb'}:  # all but the BOM need the netlist
+      with timed('netlist_transform'):
+        netlist = NetlistTransform(compiled).run()
+      if 'kicadNetlist' in artifacts:
+        stages['kicadNetlist'] = _submit_stage(
+          'generate_netlist',
+          lambda: stable_class_paths(cast(str, generate_netlist(netlist, RefdesMode.PathnameAsValue)), module))
+      if 'footprints' in artifacts:
+        stages['footprints'] = _submit_stage('footprints', lambda: netlist_footprints(netlist))
+      if 'svgpcb' in artifacts:
+        stages['svgpcb'] = _submit_stage('svgpcb', generate_svgpcb)
+
+    for stage in COMPILE_STAGES:  # in the same order as sequentially
+      if stage in stages:
+        yield stage, stages[stage].result()
+  finally:  # eg if the consumer stopped early or a stage failed
+    for future in stages.values():
+      future.cancel()
+    wait(stages.values())  # cancel does not stop running stages, which must not outlive the generated module
+
+
+def netlist_footprints(netlist: Any) -> list[KicadFootprint]:
+  """Returns the KiCad footprint data for the blocks in the (NetlistTransform) netlist."""
+  from PolymorphicBlocks.edg import SvgPcbTemplateBlock
 
   # fetch KiCad data
   all_block_footprints = []  # preserve ordering
@@ -77,54 +226,14 @@ compiled.append_values(RefdesRefinementPass().run(compiled))
 
   all_footprints = []
   for footprint in all_block_footprints:
-    footprint_split = footprint.split(':')
-    if len(footprint_split) != 2:
+    if len(footprint.split(':')) != 2:
       continue
-    library, name = footprint_split
-    footprint_data = None
-    for library_container in FOOTPRINT_LIBRARY_RELPATHS:
-      container_path = os.path.join(os.path.dirname(__file__), library_container)
-      footprint_candidates = [
-        os.path.join(container_path, library, name + '.kicad_mod'),
-        os.path.join(container_path, library + '.pretty', name + '.kicad_mod')
-      ]
-      for footprint_candidate in footprint_candidates:
-        if os.path.exists(footprint_candidate):
-          with open(footprint_candidate) as f:
-            footprint_data = f.read()
-          break
-
-      if footprint_data is not None:
-        break
-
+    footprint_data = footprint_index.read(footprint)
     if footprint_data is not None:
       all_footprints.append(KicadFootprint(library=footprint,
                                            name=SvgPcbTemplateBlock._svgpcb_footprint_to_svgpcb(footprint),
-                                           data=footprint_data))
+                                           data=footprint_data.data,
+                                           hash=footprint_data.hash))
     else:
       print(f"failed to resolve footprint {footprint}")
-
-  # generate SVGPCB data
-  svgpcb_result = SvgPcbBackend()._generate(compiled, netlist)
-
-  errors = []
-  for error in compiled.errors:
-    # suppress some manufacturability warnings
-    if error.name == 'required basic part':
-      continue
-
-    errors.append(CompilerError(
-      path=edgir.local_path_to_str_list(error.path),
-      kind=error.kind,
-      name=error.name,
-      details=error.details
-    ))
-
-  return CompilerResult(
-    edgHdl=hdl,
-    kicadNetlist=cast(str, kicad_netlist),
-    kicadFootprints=all_footprints,
-    svgpcb=svgpcb_result,
-    bom=bom,
-    errors=errors
-  )
+  return all_footprints
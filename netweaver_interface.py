@@ -1,5 +1,5 @@
-from typing import Any, Optional
-from pydantic import BaseModel
+from typing import Any, Optional, Union
+from pydantic import BaseModel, Field, TypeAdapter, field_validator
 
 
 class JsonNetPort(BaseModel):
@@ -61,3 +61,46 @@ class JsonNetlist(BaseModel):
   graph: JsonGraph
   graphUIData: Any  # ignored
   labels: dict[str, JsonLabel] = {}  # labels, if any - new feature
+
+
+# Fast-path parsing: subclasses of the models above that skip the fields the compiler ignores (the ignored port
+# fields, the node port names, nets, and graphUIData), which are left at defaults. Skipped fields are mapped to a key
+# that never occurs, so the input's keys are treated as extra and skipped by the JSON parser without building Python
+# objects. graphUIData stays required, and is skipped by validating it as a fieldless model. Parsed netlists are still
+# JsonNetlist instances.
+_SKIPPED = '\0skipped'
+
+class _SkippedJsonObject(BaseModel):  # any JSON object, whose keys are all extra and skipped
+  pass
+
+class _LeanJsonNodePort(JsonNodePort):
+  leftRightUpDown: str = Field('', validation_alias=_SKIPPED)
+  srcSinkBi: Optional[str] = Field(None, validation_alias=_SKIPPED)
+
+class _LeanJsonNodeData(JsonNodeData):
+  ports: list[_LeanJsonNodePort]
+
+class _LeanJsonNode(JsonNode):
+  data: _LeanJsonNodeData
+  ports: list[list[str]] = Field([], validation_alias=_SKIPPED)
+
+class _LeanJsonGraph(JsonGraph):
+  nodes: dict[str, _LeanJsonNode]
+
+class LeanJsonNetlist(JsonNetlist):
+  nets: list[list[JsonNetPort]] = Field([], validation_alias=_SKIPPED)
+  graph: _LeanJsonGraph
+  graphUIData: Union[_SkippedJsonObject, Any] = Field(union_mode='left_to_right')
+
+  @field_validator('graphUIData')
+  @classmethod
+  def _skip_graph_ui_data(cls, value: Any) -> None:
+    return None
+
+_lean_netlist_adapter = TypeAdapter(LeanJsonNetlist)
+
+
+def parse_netlist_json(data: Union[str, bytes]) -> JsonNetlist:
+  """Parses and validates JsonNetlist JSON, skipping the fields the compiler ignores (see LeanJsonNetlist).
+  Raises ValidationError like JsonNetlist.model_validate_json."""
+  return _lean_netlist_adapter.validate_json(data)
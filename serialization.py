@@ -0,0 +1,59 @@
+import os
+from typing import Iterable, Iterator
+
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+try:
+  import orjson  # type: ignore
+except ImportError:  # optional, pydantic's serializer is used without it
+  orjson = None  # type: ignore
+
+
+# 'pydantic' to serialize models directly to JSON bytes in one pass, or 'orjson' to dump models to dicts and encode
+# them with orjson (if installed), see bench_serialization.py
+JSON_BACKEND = os.environ.get('JSON_BACKEND', 'pydantic')
+
+# target size of chunks from iter_json, small values are coalesced up to this
+JSON_CHUNK_BYTES = 64 * 1024
+
+
+def dump_json(model: BaseModel) -> bytes:
+  """Serializes the model to compact JSON bytes, suitable as a response body as-is."""
+  if JSON_BACKEND == 'orjson' and orjson is not None:
+    return orjson.dumps(model.model_dump())
+  return to_json(model)
+
+
+def _iter_json_values(model: BaseModel) -> Iterator[bytes]:
+  yield b'{'
+  for i, (name, value) in enumerate(model):
+    yield (b',' if i else b'') + to_json(name) + b':'
+    if isinstance(value, list) and value:  # eg footprints, element by element
+      yield b'['
+      for j, item in enumerate(value):
+        yield (b',' if j else b'') + to_json(item)
+      yield b']'
+    else:
+      yield to_json(value)
+  yield b'}'
+
+
+def _coalesce(chunks: Iterable[bytes], size: int) -> Iterator[bytes]:
+  buffer = bytearray()
+  for chunk in chunks:
+    if buffer and len(buffer) + len(chunk) > size:
+      yield bytes(buffer)
+      buffer.clear()
+    if len(chunk) >= size:  # large values are passed through without copying
+      yield chunk
+    else:
+      buffer += chunk
+  if buffer:
+    yield bytes(buffer)
+
+
+def iter_json(model: BaseModel) -> Iterator[bytes]:
+  """Serializes the model to compact JSON bytes chunk by chunk, field by field (and element by element for list
+  fields), so the whole body is never materialized. The output is identical to dump_json with the pydantic backend."""
+  return _coalesce(_iter_json_values(model), JSON_CHUNK_BYTES)
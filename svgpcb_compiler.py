@@ -1,85 +1,170 @@
 import importlib
 import inspect
-from typing import List, Tuple, Dict, NamedTuple
-
-import edgir
-from edg_core import CompiledDesign, TransformUtil
-from electronics_model.NetlistGenerator import NetlistTransform, NetBlock, Netlist
-from edg import SvgPcbTemplateBlock
-
-
-class SvgPcbGeneratedBlock(NamedTuple):
-  path: TransformUtil.Path
-  fn_name: str
-  svgpcb_code: str
-
-
-class SvgPcbTransform(TransformUtil.Transform):
-  """Collects all SVGPCB blocks and initializes them."""
-  def __init__(self, design: CompiledDesign, netlist: Netlist):
-    self.design = design
-    self.netlist = netlist
-    self._svgpcb_blocks: List[SvgPcbGeneratedBlock] = []
-
+import threading
+from typing import Any, Dict, List, Tuple
+
+from PolymorphicBlocks.edg import edgir, SvgPcbTemplateBlock
+from PolymorphicBlocks.edg.core import CompiledDesign, TransformUtil
+from PolymorphicBlocks.edg.electronics_model.NetlistGenerator import NetBlock, Netlist
+from PolymorphicBlocks.edg.electronics_model.SvgPcbBackend import SvgPcbBackend as EdgSvgPcbBackend, \
+  SvgPcbTransform as EdgSvgPcbTransform, SvgPcbGeneratedBlock, BlackBoxBlock, arrange_blocks, flatten_packed_block
+
+
+# library class path -> (class, is SvgPcbTemplateBlock), filled lazily and shared across compiles in this process
+_block_classes: Dict[str, Tuple[Any, bool]] = {}
+_block_classes_lock = threading.Lock()
+
+
+def resolve_block_class(class_path: str) -> Tuple[Any, bool]:
+  """Returns the block class at the library path and whether it is a SvgPcbTemplateBlock, memoized.
+  Classes from modules without a file (generated per compile, the top level design and connector wrappers) are
+  resolved but not memoized, since they may be redefined under the same name."""
+  resolved = _block_classes.get(class_path)
+  if resolved is not None:
+    return resolved
+  elt_split = class_path.split('.')
+  elt_module = importlib.import_module('.'.join(elt_split[:-1]))
+  assert inspect.ismodule(elt_module)
+  cls = getattr(elt_module, elt_split[-1])
+  resolved = (cls, issubclass(cls, SvgPcbTemplateBlock))
+  if getattr(elt_module, '__file__', None) is not None:
+    with _block_classes_lock:
+      _block_classes[class_path] = resolved
+  return resolved
+
+
+class SvgPcbTransform(EdgSvgPcbTransform):
+  """Collects all SVGPCB blocks and initializes them, resolving block classes with resolve_block_class."""
   def visit_block(self, context: TransformUtil.TransformContext, block: edgir.BlockTypes) -> None:
     # ignore root, bit of a heuristic hack since importing the toplevel script can be brittle
     if context.path == TransformUtil.Path.empty():
       return
 
-    # TODO: dedup w/ class_from_library in edg_hdl_server
-    elt_split = block.self_class.target.name.split('.')
-    elt_module = importlib.import_module('.'.join(elt_split[:-1]))
-    assert inspect.ismodule(elt_module)
-    cls = getattr(elt_module, elt_split[-1])
-    if issubclass(cls, SvgPcbTemplateBlock):
+    cls, is_svgpcb_template = resolve_block_class(block.self_class.target.name)
+    if is_svgpcb_template:
       generator_obj = cls()
       generator_obj._svgpcb_init(context.path, self.design, self.netlist)
       self._svgpcb_blocks.append(SvgPcbGeneratedBlock(
-        context.path, generator_obj._svgpcb_fn_name(), generator_obj._svgpcb_template()
+        context.path, generator_obj._svgpcb_fn_name(), generator_obj._svgpcb_template(), generator_obj._svgpcb_bbox()
       ))
-    else:
-      pass
 
-  def run(self) -> List[SvgPcbGeneratedBlock]:
-    self.transform_design(self.design.design)
-    return self._svgpcb_blocks
 
+_PREFIX_END = ''  # marks the end of a prefix in the trie, not a valid block name
 
-class SvgPcbCompilerResult(NamedTuple):
-  functions: list[str]
-  instantiations: list[str]
 
+def filter_blocks_by_pathname(blocks: List[NetBlock], exclude_prefixes: List[Tuple[str, ...]]) -> List[NetBlock]:
+  """Returns the blocks whose path does not start with any of the prefixes, matching each block against a trie of
+  the prefixes in the length of its path instead of against every prefix."""
+  prefix_trie: Dict[str, Any] = {}
+  for prefix in exclude_prefixes:
+    node = prefix_trie
+    for name in prefix:
+      node = node.setdefault(name, {})
+    node[_PREFIX_END] = True
 
-def run(design: CompiledDesign, netlist: Netlist) -> SvgPcbCompilerResult:
-  def block_matches_prefixes(block: NetBlock, prefixes: List[Tuple[str, ...]]):
-    for prefix in prefixes:
-      if block.full_path.blocks[0:min(len(block.full_path.blocks), len(prefix))] == prefix:
+  def block_matches_prefixes(block: NetBlock) -> bool:
+    node = prefix_trie
+    for name in block.full_path.blocks:
+      if _PREFIX_END in node:
         return True
-    return False
-
-  def filter_blocks_by_pathname(blocks: List[NetBlock], exclude_prefixes: List[Tuple[str, ...]]) -> List[NetBlock]:
-    return [block for block in blocks
-            if not block_matches_prefixes(block, exclude_prefixes)]
-
-  svgpcb_blocks = SvgPcbTransform(design, netlist).run()
-  svgpcb_block_prefixes = [block.path.to_tuple() for block in svgpcb_blocks]
-  netlist = NetlistTransform(design).run()
-  other_blocks = filter_blocks_by_pathname(netlist.blocks, svgpcb_block_prefixes)
-
-  svgpcb_block_instantiations = [
-    f"const {SvgPcbTemplateBlock._svgpcb_pathname_to_svgpcb(block.path)} = {block.fn_name}(pt(0, 0))"
-    for block in svgpcb_blocks
-  ]
-  other_block_instantiations = [
-    f"""\
-const {SvgPcbTemplateBlock._svgpcb_pathname_to_svgpcb(block.full_path)} = board.add({SvgPcbTemplateBlock._svgpcb_footprint_to_svgpcb(block.footprint)}, {{
-translate: pt(0, 0), rotate: 0,
-id: '{SvgPcbTemplateBlock._svgpcb_pathname_to_svgpcb(block.full_path)}'
+      next_node = node.get(name)
+      if next_node is None:
+        return False
+      node = next_node
+    return _PREFIX_END in node
+
+  return [block for block in blocks if not block_matches_prefixes(block)]
+
+
+class SvgPcbBackend(EdgSvgPcbBackend):
+  """edg's SvgPcbBackend, with block classes resolved once per process (see SvgPcbTransform) and the netlist blocks
+  under SVGPCB template blocks filtered with a prefix trie, so generation scales linearly with the design.
+  Uses the (NetlistTransform) netlist it is given instead of recomputing it."""
+  def _generate(self, design: CompiledDesign, netlist: Netlist) -> str:
+    # handle blocks with svgpcb templates
+    svgpcb_blocks = SvgPcbTransform(design, netlist).run()
+    svgpcb_block_bboxes = [BlackBoxBlock(block.path, block.bbox) for block in svgpcb_blocks]
+
+    # handle footprints
+    svgpcb_block_prefixes = [block.path.to_tuple() for block in svgpcb_blocks]
+    other_blocks = filter_blocks_by_pathname(netlist.blocks, svgpcb_block_prefixes)
+    arranged_blocks = arrange_blocks(other_blocks, svgpcb_block_bboxes)
+    pos_dict = flatten_packed_block(arranged_blocks)
+
+    # note, dimensions in inches, divide by 25.4 to convert from mm
+    svgpcb_block_instantiations = []
+    for svgpcb_block in svgpcb_blocks:
+      x_pos, y_pos = pos_dict.get(svgpcb_block.path, (0, 0))  # in mm, need to convert to in below
+      block_code = f"const {SvgPcbTemplateBlock._svgpcb_pathname_to_svgpcb(svgpcb_block.path)} = " \
+                   f"{svgpcb_block.fn_name}(pt({x_pos/25.4:.3f}, {y_pos/25.4:.3f}))"
+      svgpcb_block_instantiations.append(block_code)
+
+    other_block_instantiations = []
+    for net_block in other_blocks:
+      x_pos, y_pos = pos_dict.get(net_block.full_path, (0, 0))  # in mm, need to convert to in below
+      block_code = f"""\
+// {net_block.full_path}
+const {net_block.refdes} = board.add({SvgPcbTemplateBlock._svgpcb_footprint_to_svgpcb(net_block.footprint)}, {{
+  translate: pt({x_pos/25.4:.3f}, {y_pos/25.4:.3f}), rotate: 0,
+  id: '{net_block.refdes}'
 }})"""
-    for block in other_blocks
-  ]
-
-  return SvgPcbCompilerResult(
-    [block.svgpcb_code for block in svgpcb_blocks],
-    svgpcb_block_instantiations + other_block_instantiations
-  )
+      other_block_instantiations.append(block_code)
+
+    net_blocks_by_path = {net_block.full_path: net_block for net_block in netlist.blocks}
+    netlist_code_entries = []
+    for net in netlist.nets:
+      pads_code = [f"""["{net_blocks_by_path[pin.block_path].refdes}", "{pin.pin_name}"]""" for pin in net.pins]
+      netlist_code_entries.append(f"""{{name: "{net.name}", pads: [{', '.join(pads_code)}]}}""")
+
+    NEWLINE = "\n"
+    full_code = f"""\
+const board = new PCB();
+
+{NEWLINE.join(svgpcb_block_instantiations + other_block_instantiations)}
+
+board.setNetlist([
+  {("," + NEWLINE + "  ").join(netlist_code_entries)}
+])
+
+const limit0 = pt(-{2/25.4}, -{2/25.4});
+const limit1 = pt({arranged_blocks.width/25.4}, {arranged_blocks.height/25.4});
+const xMin = Math.min(limit0[0], limit1[0]);
+const xMax = Math.max(limit0[0], limit1[0]);
+const yMin = Math.min(limit0[1], limit1[1]);
+const yMax = Math.max(limit0[1], limit1[1]);
+
+const filletRadius = 0.1;
+const outline = path(
+  [(xMin+xMax/2), yMax],
+  ["fillet", filletRadius, [xMax, yMax]],
+  ["fillet", filletRadius, [xMax, yMin]],
+  ["fillet", filletRadius, [xMin, yMin]],
+  ["fillet", filletRadius, [xMin, yMax]],
+  [(xMin+xMax/2), yMax],
+);
+board.addShape("outline", outline);
+
+renderPCB({{
+  pcb: board,
+  layerColors: {{
+    "F.Paste": "#000000ff",
+    "F.Mask": "#000000ff",
+    "B.Mask": "#000000ff",
+    "componentLabels": "#00e5e5e5",
+    "outline": "#002d00ff",
+    "padLabels": "#ffff99e5",
+    "B.Cu": "#ef4e4eff",
+    "F.Cu": "#ff8c00cc",
+  }},
+  limits: {{
+    x: [xMin, xMax],
+    y: [yMin, yMax]
+  }},
+  background: "#00000000",
+  mmPerUnit: 25.4
+}})
+
+{NEWLINE.join([block.svgpcb_code for block in svgpcb_blocks])}
+"""
+
+    return full_code
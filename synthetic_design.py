@@ -0,0 +1,180 @@
+"""Generator of synthetic, arbitrarily large JsonNetlist designs built from real block types in resources/library.json,
+for benchmarking how the compile stages scale with design size (see bench_scaling.py).
+Designs are made of independent tiles, each a microcontroller and its peripherals, so every tile is electrically
+sensible on its own and labels are never shared between tiles:
+  - keyboard: Xiao_Rp2040 scanning a SwitchMatrix, with lock indicator LEDs
+  - leds: Xiao_Esp32c3 driving an array of IndicatorLeds, one GPIO each
+  - i2c: Esp32_Wroom_32 on a USB-powered LDO, with a multi-sensor I2C bus (implicit pullup)
+"""
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+from netweaver_interface import JsonNetlist, JsonNode, JsonNodeData, JsonNodePort, JsonNodeArgParam, JsonLabel, \
+  JsonGraph, JsonNetPort
+
+LIBRARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources/library.json')
+
+PATTERNS = ('keyboard', 'leds', 'i2c')
+LEDS_PER_CONTROLLER = 8
+I2C_SENSORS = ('Hdc1080', 'Bh1750', 'Bme680')  # distinct I2C addresses, so they can share a bus
+
+
+class NetlistBuilder:
+  """Incrementally builds a JsonNetlist from library blocks, the same way the frontend does: nodes with ports from
+  the library, array element requests as extra ports with elementOf, and connections as labels on ports."""
+  def __init__(self, library: Dict[str, Any]):
+    self._blocks = {block['type']: block for block in library['blocks']}
+    self._nodes: Dict[str, JsonNode] = {}
+    self._labels: Dict[str, JsonLabel] = {}
+    self._name_counts: Dict[str, int] = {}
+
+  def block(self, block_type: str, **args: Any) -> str:
+    """Adds a block of the library type, with args overriding its argParams defaults. Returns the node id."""
+    library_block = self._blocks[block_type]
+    count = self._name_counts.get(block_type, 0)
+    self._name_counts[block_type] = count + 1
+    name = f"{block_type}_{count}"
+    ports = [JsonNodePort(name=port['name'], leftRightUpDown=port['hint_position'] or 'left', type=port['type'],
+                          array=port['is_array'], srcSinkBi=port['hint_array_direction'] if port['is_array'] else None,
+                          idx=idx)
+             for idx, port in enumerate(library_block['ports'])]
+    arg_params = [JsonNodeArgParam(name=arg['name'], type=arg['type'], default_value=arg['default_value'],
+                                   value=args.pop(arg['name'], arg['default_value']))
+                  for arg in library_block['argParams']]
+    assert not args, f"unknown args {list(args)} for {block_type}"
+    node_id = f"_{len(self._nodes):07x}"
+    self._nodes[node_id] = JsonNode(
+      data=JsonNodeData(name=name, type=block_type, superClasses=library_block['superClasses'], ports=ports,
+                        argParams=arg_params),
+      ports=[[] for _ in ports], id=node_id)
+    return node_id
+
+  def _port_idx(self, node_id: str, port_name: str) -> int:
+    for port in self._nodes[node_id].data.ports:
+      if port.name == port_name:
+        return port.idx
+    raise KeyError(f"no port {port_name} in {self._nodes[node_id].data.type}")
+
+  def request(self, node_id: str, array_port_name: str) -> str:
+    """Adds an element request on the array port, returning its port name."""
+    node = self._nodes[node_id]
+    parent = node.data.ports[self._port_idx(node_id, array_port_name)]
+    assert parent.array
+    idx = len(node.data.ports)
+    element = JsonNodePort(name=f"{parent.name}_{idx}", leftRightUpDown=parent.leftRightUpDown, type=parent.type,
+                           array=False, srcSinkBi='bi', idx=idx, elementOf=parent.idx)
+    node.data.ports.append(element)
+    node.ports.append([])
+    return element.name
+
+  def connect(self, label_name: str, node_id: str, port_name: str) -> None:
+    self._labels[f"L{len(self._labels):07x}"] = JsonLabel(labelName=label_name, nodeId=node_id,
+                                                          portIdx=self._port_idx(node_id, port_name))
+
+  def netlist(self) -> JsonNetlist:
+    nets: Dict[str, List[JsonNetPort]] = {}
+    for label in self._labels.values():
+      port = self._nodes[label.nodeId].data.ports[label.portIdx]
+      nets.setdefault(label.labelName, []).append(
+        JsonNetPort(nodeId=label.nodeId, portIdx=label.portIdx, name=label.nodeId, portName=port.name))
+    graph_ui_data = {node_id: {'x': (i % 32) * 250, 'y': (i // 32) * 200}  # grid layout, as placed in the UI
+                     for i, node_id in enumerate(self._nodes)}
+    return JsonNetlist(nets=list(nets.values()), graph=JsonGraph(nodes=self._nodes), graphUIData=graph_ui_data,
+                       labels=self._labels)
+
+
+def indicator_leds(builder: NetlistBuilder, tile: str, mcu: str, count: int) -> int:
+  """Adds IndicatorLeds driven by GPIOs of the microcontroller, sharing its ground. Returns the number added."""
+  if count > 0:
+    builder.connect(f"{tile}_gnd", mcu, 'gnd')
+  for i in range(count):
+    led = builder.block('IndicatorLed')
+    builder.connect(f"{tile}_led{i}", led, 'signal')
+    builder.connect(f"{tile}_led{i}", mcu, builder.request(mcu, 'gpio'))
+    builder.connect(f"{tile}_gnd", led, 'gnd')
+  return count
+
+
+def keyboard_tile(builder: NetlistBuilder, tile: str, blocks: int) -> int:
+  """Xiao_Rp2040 scanning a SwitchMatrix, plus up to 2 indicator LEDs. Returns the number of blocks added."""
+  mcu = builder.block('Xiao_Rp2040')
+  if blocks < 2:
+    return 1
+  matrix = builder.block('SwitchMatrix', nrows=4, ncols=6)
+  for array_port in ['rows', 'cols']:
+    builder.connect(f"{tile}_{array_port}", matrix, array_port)
+    builder.connect(f"{tile}_{array_port}", mcu, builder.request(mcu, 'gpio'))
+  return 2 + indicator_leds(builder, tile, mcu, min(blocks - 2, 2))
+
+
+def leds_tile(builder: NetlistBuilder, tile: str, blocks: int) -> int:
+  """Xiao_Esp32c3 driving up to LEDS_PER_CONTROLLER IndicatorLeds. Returns the number of blocks added."""
+  mcu = builder.block('Xiao_Esp32c3')
+  return 1 + indicator_leds(builder, tile, mcu, min(blocks - 1, LEDS_PER_CONTROLLER))
+
+
+def i2c_tile(builder: NetlistBuilder, tile: str, blocks: int) -> int:
+  """Esp32_Wroom_32 powered from USB through a LDO, with up to 3 I2C sensors on one bus. Falls back to a leds tile
+  if there is no room for any sensor. Returns the number of blocks added."""
+  if blocks < 4:
+    return leds_tile(builder, tile, blocks)
+  usb = builder.block('UsbCReceptacle')
+  ldo = builder.block('Ldl1117', output_voltage=[3.135, 3.465])
+  mcu = builder.block('Esp32_Wroom_32')
+  builder.connect(f"{tile}_vusb", usb, 'pwr')
+  builder.connect(f"{tile}_vusb", ldo, 'pwr_in')
+  builder.connect(f"{tile}_v3v3", ldo, 'pwr_out')
+  builder.connect(f"{tile}_v3v3", mcu, 'pwr')
+  for node_id in [usb, ldo, mcu]:
+    builder.connect(f"{tile}_gnd", node_id, 'gnd')
+  builder.connect(f"{tile}_i2c", mcu, builder.request(mcu, 'i2c'))
+  sensors = I2C_SENSORS[:blocks - 3]
+  for sensor_type in sensors:
+    sensor = builder.block(sensor_type)
+    builder.connect(f"{tile}_v3v3", sensor, 'pwr')
+    builder.connect(f"{tile}_gnd", sensor, 'gnd')
+    builder.connect(f"{tile}_i2c", sensor, 'i2c')
+  return 3 + len(sensors)
+
+
+TILES = {
+  'keyboard': keyboard_tile,
+  'leds': leds_tile,
+  'i2c': i2c_tile,
+}
+
+
+def load_library(path: str = LIBRARY_PATH) -> Dict[str, Any]:
+  with open(path) as f:
+    return json.load(f)
+
+
+def synthetic_netlist(blocks: int, patterns: Sequence[str] = PATTERNS,
+                      library: Optional[Dict[str, Any]] = None) -> JsonNetlist:
+  """Generates a design of exactly the specified number of blocks (excluding implicit blocks, like I2C pullups
+  inferred by the compiler), made of tiles cycling through the patterns. Deterministic for the same arguments."""
+  assert blocks > 0 and patterns
+  builder = NetlistBuilder(library if library is not None else load_library())
+  remaining = blocks
+  tile = 0
+  while remaining > 0:
+    remaining -= TILES[patterns[tile % len(patterns)]](builder, f"t{tile}", remaining)
+    tile += 1
+  return builder.netlist()
+
+
+if __name__ == '__main__':
+  import argparse
+  parser = argparse.ArgumentParser()
+  parser.add_argument('blocks', type=int, help="number of blocks in the design")
+  parser.add_argument('--patterns', nargs='+', choices=PATTERNS, default=list(PATTERNS), help="tile patterns to use")
+  parser.add_argument('--output', help="write the JsonNetlist here, instead of stdout")
+  args = parser.parse_args()
+
+  netlist_json = synthetic_netlist(args.blocks, args.patterns).model_dump_json(indent=2)
+  if args.output:
+    with open(args.output, 'w') as f:
+      f.write(netlist_json)
+  else:
+    print(netlist_json)
@@ -0,0 +1,49 @@
+import unittest
+import os.path
+from unittest import mock
+
+from compile_cache import CompileCache
+from app import app
+app.testing = True
+
+
+class ArtifactsTestCase(unittest.TestCase):
+  def setUp(self):
+    cache_patch = mock.patch('app.compile_cache', CompileCache(None))  # fresh, memory-only, so each test compiles
+    cache_patch.start()
+    self.addCleanup(cache_patch.stop)
+    # the server messes with cwd so we need to use the absolute path
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests/BasicBlinky.json")) as f:
+      self.netlist_data = f.read()
+
+  def test_hdl_only(self):
+    with app.test_client() as client:
+      response = client.post('/compile?artifacts=hdl', data=self.netlist_data)
+      self.assertEqual(response.status_code, 200)
+      self.assertTrue(response.json['edgHdl'])
+      self.assertIsNone(response.json['kicadNetlist'])
+      self.assertIsNone(response.json['svgpcb'])
+
+  def test_subset_of_cached(self):
+    with app.test_client() as client:
+      full_response = client.post('/compile', data=self.netlist_data)  # primes the cache with the full result
+      self.assertTrue(full_response.json['kicadNetlist'])
+      response = client.post('/compile?artifacts=hdl', data=self.netlist_data)
+      self.assertEqual(response.json['edgHdl'], full_response.json['edgHdl'])
+      for field in ['kicadNetlist', 'bom', 'kicadFootprints', 'svgpcb']:
+        self.assertIsNone(response.json[field], field)
+      self.assertEqual(response.json['errors'], [])
+
+  def test_invalid(self):
+    with app.test_client() as client:
+      response = client.post('/compile?artifacts=errors,nope', data=self.netlist_data)
+      self.assertEqual(response.status_code, 400)
+      self.assertEqual(response.json['errors'][0]['kind'], "invalid input")
+
+  def test_subset(self):
+    with app.test_client() as client:
+      full_response = client.post('/compile', data=self.netlist_data)
+      response = client.post('/compile?artifacts=errors,bom', data=self.netlist_data)
+      self.assertEqual(response.status_code, 200)
+      self.assertEqual(response.json['errors'], full_response.json['errors'])
+      self.assertEqual(response.json['bom'], full_response.json['bom'])
@@ -1,7 +1,9 @@
 import unittest
 import os.path
+from unittest import mock
 
 from netlist_compiler import JsonNetlist
+from compile_cache import CompileCache
 from app import app
 app.testing = True
 
@@ -150,6 +152,11 @@ Id,Designator,Footprint,Quantity,Designation,Supplier and Ref,JLCPCB Part #,Manu
 
 
 class BasicBlinkyTestCase(unittest.TestCase):
+  def setUp(self):
+    cache_patch = mock.patch('app.compile_cache', CompileCache(None))  # fresh, memory-only, so each test compiles
+    cache_patch.start()
+    self.addCleanup(cache_patch.stop)
+
   def test_compile(self):
     # the server messes with cwd so we need to use the absolute path
     with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests/BasicBlinky.json")) as f:
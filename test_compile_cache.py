@@ -0,0 +1,47 @@
+import unittest
+import os.path
+import tempfile
+
+from netweaver_interface import JsonNetlist
+from compile_cache import CompileCache, netlist_hash
+
+
+class CompileCacheTestCase(unittest.TestCase):
+  def setUp(self):
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests/BasicBlinky.json")) as f:
+      self.netlist = JsonNetlist.model_validate_json(f.read())
+
+  def test_hash_ignores_ui(self):
+    moved = self.netlist.model_copy(deep=True)
+    moved.graphUIData = {'moved': True}
+    moved.nets = []
+    moved.labels = {f"relabeled_{label_id}": label for label_id, label in moved.labels.items()}
+    self.assertEqual(netlist_hash(moved), netlist_hash(self.netlist))
+
+    modified = self.netlist.model_copy(deep=True)
+    next(iter(modified.graph.nodes.values())).data.name = 'renamed'
+    self.assertNotEqual(netlist_hash(modified), netlist_hash(self.netlist))
+
+  def test_tiers(self):
+    with tempfile.TemporaryDirectory() as cache_dir:
+      cache = CompileCache(cache_dir)
+      key = cache.key(self.netlist)
+      self.assertIsNone(cache.get(key))
+      cache.put(key, b'{"edgHdl": ""}')
+      self.assertEqual(cache.get(key), b'{"edgHdl": ""}')
+      self.assertEqual((cache.misses, cache.memory_hits), (1, 1))
+
+      reloaded = CompileCache(cache_dir)  # memory tier is empty, served from disk
+      self.assertEqual(reloaded.get(key), b'{"edgHdl": ""}')
+      self.assertEqual(reloaded.disk_hits, 1)
+
+  def test_eviction(self):
+    cache = CompileCache(None, max_memory_bytes=10)
+    cache.put('a', b'12345678')
+    cache.put('b', b'12345678')  # evicts a, over the size limit
+    self.assertIsNone(cache.get('a'))
+    self.assertEqual(cache.get('b'), b'12345678')
+
+    expired = CompileCache(None, max_age_s=-1)
+    expired.put('a', b'12345678')
+    self.assertIsNone(expired.get('a'))
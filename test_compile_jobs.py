@@ -0,0 +1,88 @@
+import threading
+import os.path
+import unittest
+from unittest import mock
+
+from compile_jobs import CompileJobQueue, CompileJob, JobQueueFull
+from netlist_compiler import CompilerResult, KicadFootprint
+from serialization import dump_json
+from app import app
+app.testing = True
+
+
+class CompileJobQueueTestCase(unittest.TestCase):
+  def setUp(self):
+    self.release = threading.Event()
+    self.started = threading.Semaphore(0)
+
+    def run(arg: int) -> int:
+      self.started.release()
+      self.release.wait()
+      if arg < 0:
+        raise ValueError("negative")
+      return arg * 2
+    self.queue: CompileJobQueue[int, int] = CompileJobQueue(run, concurrency=1, max_queued=2)
+
+  def tearDown(self):
+    self.release.set()
+    self.queue.close()
+
+  def wait_finished(self, job: CompileJob) -> None:
+    for _ in range(500):
+      if job.finished is not None:
+        return
+      threading.Event().wait(0.01)
+    self.fail("job did not finish")
+
+  def test_backpressure_and_cancel(self):
+    running = self.queue.submit(1)
+    self.started.acquire()  # first job is now running and out of the queue
+    queued1 = self.queue.submit(2)
+    queued2 = self.queue.submit(3, session='editor')
+    with self.assertRaises(JobQueueFull):
+      self.queue.submit(4)
+
+    self.assertTrue(self.queue.cancel(queued1.id))
+    self.assertEqual(queued1.status, CompileJob.CANCELLED)
+    self.assertFalse(self.queue.cancel(running.id))  # running jobs can't be cancelled
+
+    superseding = self.queue.submit(5, session='editor')
+    self.assertEqual(queued2.status, CompileJob.CANCELLED)
+
+    self.release.set()
+    self.wait_finished(running)
+    self.wait_finished(superseding)
+    self.assertEqual(running.status, CompileJob.DONE)
+    self.assertEqual(running.result, 2)
+    self.assertEqual(superseding.result, 10)
+    self.assertEqual(self.queue.stats()['cancelled'], 2)
+    self.assertEqual(self.queue.stats()['rejected'], 1)
+
+  def test_failure(self):
+    self.release.set()
+    job = self.queue.submit(-1)
+    self.wait_finished(job)
+    self.assertEqual(job.status, CompileJob.FAILED)
+    self.assertIsInstance(job.error, ValueError)
+    self.assertIs(self.queue.get(job.id), job)
+
+
+class CompileJobRoutesTestCase(unittest.TestCase):
+  def test_known_footprints(self):
+    footprint = KicadFootprint(library='Resistor_SMD:R_0603_1608Metric', name='R_0603_1608Metric',
+                               data='(footprint "R_0603_1608Metric")', hash='0123')
+    result_json = dump_json(CompilerResult(edgHdl='', kicadFootprints=[footprint]))
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests/BasicBlinky.json")) as f:
+      netlist_data = f.read()
+    with app.test_client() as client, mock.patch('app.compile_cached', return_value=result_json):
+      job_url = client.post('/compile/jobs', data=netlist_data).headers['Location']
+      for _ in range(500):
+        response = client.get(job_url)
+        if response.json['status'] == CompileJob.DONE:
+          break
+        threading.Event().wait(0.01)
+      self.assertEqual(response.json['result']['kicadFootprints'][0]['data'], footprint.data)
+      hash_response = client.get(job_url + '?footprints=hash')
+      self.assertIsNone(hash_response.json['result']['kicadFootprints'][0]['data'])
+      known_response = client.get(job_url + '?knownFootprints=0123')
+      self.assertIsNone(known_response.json['result']['kicadFootprints'][0]['data'])
@@ -0,0 +1,32 @@
+import threading
+import unittest
+
+from compile_pool import CompilePool
+from netweaver_interface import JsonNetlist, JsonGraph
+
+
+class CompilePoolTestCase(unittest.TestCase):
+  def test_close_wakes_waiters(self):
+    pool = CompilePool(1)
+    self.addCleanup(pool.close)
+    worker = pool._acquire()  # so compiles wait for a worker
+    netlist = JsonNetlist(nets=[], graph=JsonGraph(nodes={}), graphUIData=None)
+    errors = []
+
+    def compile() -> None:
+      try:
+        pool.compile(netlist)
+      except RuntimeError as e:
+        errors.append(e)
+
+    threads = [threading.Thread(target=compile) for _ in range(2)]
+    for thread in threads:
+      thread.start()
+    pool.close()
+    for thread in threads:
+      thread.join(timeout=10)
+      self.assertFalse(thread.is_alive())
+    self.assertEqual(len(errors), 2)
+    pool._release(worker, False)  # returned after close, so closed rather than reused
+    with self.assertRaises(RuntimeError):
+      pool.compile(netlist)
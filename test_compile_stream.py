@@ -0,0 +1,77 @@
+import json
+import threading
+import unittest
+import os.path
+from unittest import mock
+
+from compile_cache import CompileCache
+from netlist_compiler import edg_lock
+from app import app
+app.testing = True
+
+
+class CompileStreamTestCase(unittest.TestCase):
+  def setUp(self):
+    cache_patch = mock.patch('app.compile_cache', CompileCache(None))  # fresh, memory-only, so each test compiles
+    cache_patch.start()
+    self.addCleanup(cache_patch.stop)
+
+  def stream_events(self, client, netlist_data: str) -> list:
+    response = client.post('/compile/stream', data=netlist_data)
+    self.assertEqual(response.status_code, 200)
+    self.assertEqual(response.mimetype, 'text/event-stream')
+    events = []
+    for block in response.get_data(as_text=True).strip().split('\n\n'):
+      event_line, data_line = block.split('\n')
+      events.append((event_line.removeprefix('event: '), json.loads(data_line.removeprefix('data: '))))
+    return events
+
+  def test_stream(self):
+    # the server messes with cwd so we need to use the absolute path
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests/BasicBlinky.json")) as f:
+      netlist_data = f.read()
+
+    with app.test_client() as client:
+      events = self.stream_events(client, netlist_data)  # compiled, since the cache is fresh
+      self.assertEqual([event for event, data in events],
+                       ['hdl', 'errors', 'kicadNetlist', 'bom', 'footprints', 'svgpcb', 'done'])
+
+      with mock.patch('app.run_compile_stages', side_effect=AssertionError("not cached")):
+        self.assertEqual(self.stream_events(client, netlist_data), events)  # replayed from the cache
+        full_response = client.post('/compile', data=netlist_data)
+      self.assertEqual(full_response.status_code, 200)
+      stream_result = dict(events)
+      self.assertEqual(stream_result['hdl'], full_response.json['edgHdl'])
+      self.assertEqual(stream_result['errors'], full_response.json['errors'])
+      self.assertEqual(stream_result['kicadNetlist'], full_response.json['kicadNetlist'])
+      self.assertEqual(stream_result['bom'], full_response.json['bom'])
+      self.assertEqual(stream_result['footprints'], full_response.json['kicadFootprints'])
+      self.assertEqual(stream_result['svgpcb'], full_response.json['svgpcb'])
+
+  def test_stalled_consumer(self):
+    def compile_stages(json_netlist, artifacts=None, validated=False):
+      for stage, value in [('hdl', ''), ('errors', []), ('kicadNetlist', '')]:
+        with edg_lock:  # as the Scala compile and SVGPCB stages
+          yield stage, value
+
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests/BasicBlinky.json")) as f:
+      netlist_data = f.read()
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests/ConnectorLed.json")) as f:
+      other_netlist_data = f.read()
+
+    with mock.patch('app.run_compile_stages', compile_stages):
+      stream = app.test_client().post('/compile/stream', data=netlist_data, buffered=False)
+      stream_iter = iter(stream.response)
+      self.assertTrue(next(stream_iter).startswith(b'event: hdl\n'))  # and the client stops reading
+
+      responses = []
+      compile_thread = threading.Thread(
+        target=lambda: responses.append(app.test_client().post('/compile', data=other_netlist_data)))
+      compile_thread.start()
+      compile_thread.join(timeout=10)
+      self.assertFalse(compile_thread.is_alive())  # not blocked by the stalled stream
+      self.assertEqual(responses[0].status_code, 200)
+
+      self.assertEqual([chunk.split(b'\n')[0] for chunk in stream_iter],
+                       [b'event: errors', b'event: kicadNetlist', b'event: done'])
+      stream.close()
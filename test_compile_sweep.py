@@ -0,0 +1,93 @@
+import unittest
+import json
+import os.path
+from unittest import mock
+
+from netweaver_interface import JsonNetlist
+from netlist_compiler import library_index
+from hdl_generator import JsonNetlistValidationErrors
+from compile_sweep import apply_overrides, bom_diff, BomDiffLine
+from compile_cache import CompileCache
+from app import app
+app.testing = True
+
+
+BOM_HEADER = "Id,Designator,Footprint,Quantity,Designation,Supplier and Ref,JLCPCB Part #,Manufacturer,Part\n"
+
+
+class CompileSweepTestCase(unittest.TestCase):
+  def setUp(self):
+    cache_patch = mock.patch('app.compile_cache', CompileCache(None))  # fresh, memory-only, so each test compiles
+    cache_patch.start()
+    self.addCleanup(cache_patch.stop)
+    # the server messes with cwd so we need to use the absolute path
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests/BasicKeyboard.json")) as f:
+      self.netlist_data = f.read()
+    self.netlist = JsonNetlist.model_validate_json(self.netlist_data)
+
+  def test_apply_overrides(self):
+    variant = apply_overrides(self.netlist, {'SwitchMatrix': {'nrows': 4}}, library_index)
+    matrix_id = '_c0AKe3yc'
+    self.assertEqual(variant.graph.nodes[matrix_id].data.argParams[0].value, 4)
+    self.assertEqual(self.netlist.graph.nodes[matrix_id].data.argParams[0].value, 3)  # not modified
+    self.assertIs(variant.graph.nodes['_GGFfDuYU'], self.netlist.graph.nodes['_GGFfDuYU'])  # not copied
+
+    with self.assertRaises(JsonNetlistValidationErrors) as context:
+      apply_overrides(self.netlist, {'SwitchMatrix': {'nrow': 4}, 'Nope': {'nrows': 4}}, library_index)
+    self.assertEqual([error.path for error in context.exception.errors], [['SwitchMatrix', 'nrow'], ['Nope']])
+
+    with self.assertRaises(JsonNetlistValidationErrors) as context:  # override values are validated
+      apply_overrides(self.netlist, {'SwitchMatrix': {'nrows': 'four'}}, library_index)
+    self.assertEqual([error.path for error in context.exception.errors], [['SwitchMatrix', 'nrows']])
+
+  def test_bom_diff(self):
+    boms = [
+      BOM_HEADER + '1,"D1,D2",Diode_SMD:D_SOD-323,2,1N4148,,C2128,,\n2,U1,Xiao,1,Xiao,,,,\n',
+      BOM_HEADER + '1,"D1,D2,D3",Diode_SMD:D_SOD-323,3,1N4148,,C2128,,\n2,U1,Xiao,1,Xiao,,,,\n',
+      BOM_HEADER + '1,U1,Xiao,1,Xiao,,,,\n',
+      None,
+    ]
+    diode = {'Footprint': 'Diode_SMD:D_SOD-323', 'Designation': '1N4148', 'Supplier and Ref': '',
+             'JLCPCB Part #': 'C2128', 'Manufacturer': '', 'Part': ''}
+    self.assertEqual(bom_diff(boms), [BomDiffLine(item=diode, quantities=[2, 3, 0, None])])
+    self.assertEqual(bom_diff(boms[:1] * 2), [])
+
+  def test_invalid(self):
+    with app.test_client() as client:
+      response = client.post('/compile/sweep', data=json.dumps({
+        'netlist': json.loads(self.netlist_data),
+        'variants': [{'argParams': {'SwitchMatrix': {'nrow': 4}}}]
+      }))
+      self.assertEqual(response.status_code, 400)
+      self.assertEqual(response.json['errors'][0]['path'], ['SwitchMatrix', 'nrow'])
+
+      response = client.post('/compile/sweep', data=json.dumps({'netlist': json.loads(self.netlist_data),
+                                                                'variants': []}))
+      self.assertEqual(response.status_code, 400)
+
+  def test_sweep(self):
+    with app.test_client() as client:
+      response = client.post('/compile/sweep', data=json.dumps({
+        'netlist': json.loads(self.netlist_data),
+        'variants': [{'name': '3x2'}, {'name': '4x2', 'argParams': {'SwitchMatrix': {'nrows': 4}}}]
+      }))
+      self.assertEqual(response.status_code, 200)
+      results = response.json['results']
+      self.assertEqual(len(results), 2)
+      self.assertEqual(results[0]['errors'], [])
+      self.assertEqual(results[1]['errors'], [])
+      self.assertIn('nrows=4', results[1]['edgHdl'])
+      self.assertTrue(any(line['quantities'] == [6, 8] for line in response.json['bomDiff']))  # switches
+
+      footprint_data = [footprint['data'] for result in results for footprint in result['kicadFootprints']]
+      self.assertEqual(len(set(footprint_data) - {None}), len(list(filter(None, footprint_data))))  # sent once
+
+  def test_validated_once(self):
+    with app.test_client() as client, mock.patch.object(library_index, 'validate', wraps=library_index.validate):
+      response = client.post('/compile/sweep?artifacts=hdl', data=json.dumps({
+        'netlist': json.loads(self.netlist_data),
+        'variants': [{'name': '3x2'}, {'name': '4x2', 'argParams': {'SwitchMatrix': {'nrows': 4}}}]
+      }))
+      self.assertEqual(response.status_code, 200)
+      self.assertIn('nrows=4', response.json['results'][1]['edgHdl'])
+      self.assertEqual(library_index.validate.call_count, 1)  # not again per variant
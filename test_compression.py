@@ -0,0 +1,48 @@
+import unittest
+import gzip
+from unittest import mock
+
+from netlist_compiler import CompilerResult, CompilerError, KicadFootprint
+from compression import STREAM_ENCODERS, compress_stream
+from serialization import dump_json, iter_json
+from compile_cache import CompileCache
+from app import app
+app.testing = True
+
+
+class CompressionTestCase(unittest.TestCase):
+  def setUp(self):
+    cache_patch = mock.patch('app.compile_cache', CompileCache(None))  # fresh, memory-only, so each test compiles
+    cache_patch.start()
+    self.addCleanup(cache_patch.stop)
+
+  def result(self) -> CompilerResult:
+    footprint = KicadFootprint(library='Resistor_SMD:R_0603_1608Metric', name='R_0603_1608Metric',
+                               data='(footprint "R_0603_1608Metric")\n' * 4000, hash='0123')
+    return CompilerResult(edgHdl='class MyModule(Block):\n  "quoted"\n', kicadFootprints=[footprint] * 3,
+                          errors=[CompilerError(path=['R1'], kind='failed assertion')])
+
+  def test_iter_json(self):
+    for result in [self.result(), CompilerResult(edgHdl="")]:
+      chunks = list(iter_json(result))
+      self.assertEqual(b''.join(chunks), dump_json(result))
+    self.assertGreater(len(list(iter_json(self.result()))), 1)
+
+  def test_compress_stream(self):
+    chunks = list(iter_json(self.result()))
+    self.assertIn('gzip', STREAM_ENCODERS)
+    self.assertEqual(gzip.decompress(b''.join(compress_stream(chunks, 'gzip'))), b''.join(chunks))
+
+  def test_response(self):
+    with app.test_client() as client, mock.patch('app.COMPRESS_MIN_BYTES', 0):
+      response = client.post('/compile', data='{}')
+      self.assertEqual(response.status_code, 400)
+      self.assertIsNone(response.headers.get('Content-Encoding'))
+      self.assertIn('Accept-Encoding', response.headers['Vary'])
+
+      gzip_response = client.post('/compile', data='{}', headers={'Accept-Encoding': 'gzip'})
+      self.assertEqual(gzip_response.headers['Content-Encoding'], 'gzip')
+      self.assertEqual(gzip.decompress(gzip_response.get_data()), response.get_data())
+
+      identity_response = client.post('/compile', data='{}', headers={'Accept-Encoding': 'gzip;q=0'})
+      self.assertIsNone(identity_response.headers.get('Content-Encoding'))
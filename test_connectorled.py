@@ -12,8 +12,6 @@ class PinHeader254Vertical_PinHeader254Vertical(Block):
     self.port_0 = self.Export(self._conn.pins.request('1').adapt_to(DigitalBidir()), optional=True)
     self.port_1 = self.Export(self._conn.pins.request('2').adapt_to(Ground()), optional=True)
 
-globals()['__builtins__']['PinHeader254Vertical_PinHeader254Vertical'] = PinHeader254Vertical_PinHeader254Vertical
-
 
 class MyModule(SimpleBoardTop):
   def __init__(self):
@@ -0,0 +1,56 @@
+import unittest
+import importlib
+import sys
+import types
+
+from PolymorphicBlocks.edg import edgir, edgrpc, IndicatorLed, Block
+
+import netlist_compiler
+from elaboration_cache import ElaborationCache, HDL_SERVER_MODULE
+from hdl_builder import GENERATED_MODULE
+
+
+def library_element_request(cls) -> edgrpc.HdlRequest:
+  request = edgrpc.HdlRequest()
+  request.get_library_element.element.CopyFrom(edgir.LibraryPath(target=edgir.LocalStep(name=cls._static_def_name())))
+  return request
+
+
+class ElaborationCacheTestCase(unittest.TestCase):
+  def test_installed(self):
+    hdl_server = importlib.import_module(HDL_SERVER_MODULE)
+    self.assertEqual(hdl_server.process_request, netlist_compiler.elaboration_cache.process_request)
+
+  def test_memoize(self):
+    cache = ElaborationCache()
+    cache._process_request = importlib.import_module(HDL_SERVER_MODULE).process_request  # without installing
+
+    response = cache.process_request(library_element_request(IndicatorLed))
+    assert response is not None
+    self.assertTrue(response.get_library_element.element.HasField('hierarchy_block'))
+    self.assertIs(cache.process_request(library_element_request(IndicatorLed)), response)
+    self.assertEqual(cache.stats(), {'entries': 1, 'libraryMiss': 1, 'libraryHit': 1})
+
+  def test_generated_uncached(self):
+    cache = ElaborationCache()
+    calls = []
+    cache._process_request = lambda request: calls.append(request) or edgrpc.HdlResponse()
+    request = edgrpc.HdlRequest()
+    request.get_library_element.element.target.name = f'{GENERATED_MODULE}.MyModule'  # generated top level
+    sys.modules[GENERATED_MODULE] = types.ModuleType(GENERATED_MODULE)
+    self.addCleanup(sys.modules.pop, GENERATED_MODULE)
+    cache.process_request(request)
+    cache.process_request(request)
+    self.assertEqual(len(calls), 2)
+    self.assertEqual(cache.stats(), {'entries': 0, 'libraryUncached': 2})
+
+  def test_lru(self):
+    cache = ElaborationCache(max_entries=1)
+    cache._process_request = lambda request: edgrpc.HdlResponse()
+    first = library_element_request(IndicatorLed)
+    second = library_element_request(Block)
+    cache.process_request(first)
+    cache.process_request(second)
+    cache.process_request(first)
+    self.assertEqual(len(cache), 1)
+    self.assertEqual(cache.counts, {('library', 'miss'): 3})
@@ -0,0 +1,54 @@
+import unittest
+import os.path
+from unittest import mock
+
+from compile_cache import CompileCache
+from app import app
+app.testing = True
+
+
+class FootprintHashesTestCase(unittest.TestCase):
+  def setUp(self):
+    cache_patch = mock.patch('app.compile_cache', CompileCache(None))  # fresh, memory-only, so each test compiles
+    cache_patch.start()
+    self.addCleanup(cache_patch.stop)
+
+  def test_compile(self):
+    # the server messes with cwd so we need to use the absolute path
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests/BasicBlinky.json")) as f:
+      netlist_data = f.read()
+
+    with app.test_client() as client:
+      full_response = client.post('/compile', data=netlist_data)
+      self.assertEqual(full_response.status_code, 200)
+      full_footprints = full_response.json['kicadFootprints']
+      self.assertTrue(full_footprints)
+      for footprint in full_footprints:
+        self.assertTrue(footprint['data'])
+
+      hash_response = client.post('/compile?footprints=hash', data=netlist_data)
+      self.assertEqual(hash_response.status_code, 200)
+      self.assertEqual([(footprint['library'], footprint['name'], footprint['hash'])
+                        for footprint in hash_response.json['kicadFootprints']],
+                       [(footprint['library'], footprint['name'], footprint['hash'])
+                        for footprint in full_footprints])
+      for footprint in hash_response.json['kicadFootprints']:
+        self.assertIsNone(footprint['data'])
+
+      known_hash = full_footprints[0]['hash']
+      known_response = client.post(f'/compile?knownFootprints={known_hash}', data=netlist_data)
+      self.assertIsNone(known_response.json['kicadFootprints'][0]['data'])
+      for footprint in known_response.json['kicadFootprints'][1:]:
+        self.assertTrue(footprint['data'])
+
+      for footprint in full_footprints:
+        footprint_response = client.get(f"/footprint/{footprint['hash']}")
+        self.assertEqual(footprint_response.status_code, 200)
+        self.assertEqual(footprint_response.get_data(as_text=True), footprint['data'])
+        self.assertIn('immutable', footprint_response.headers['Cache-Control'])
+
+        cached_response = client.get(f"/footprint/{footprint['hash']}",
+                                     headers={'If-None-Match': f"\"{footprint['hash']}\""})
+        self.assertEqual(cached_response.status_code, 304)
+
+      self.assertEqual(client.get('/footprint/0000').status_code, 404)
@@ -0,0 +1,62 @@
+import unittest
+import os.path
+import tempfile
+from unittest import mock
+
+from footprint_index import FootprintIndex, FOOTPRINT_LIBRARY_RELPATHS, footprint_hash
+
+
+class FootprintIndexTestCase(unittest.TestCase):
+  def test_precedence(self):
+    with tempfile.TemporaryDirectory() as base_dir:
+      def make_footprint(container: str, library_dir: str, name: str) -> str:
+        path = os.path.join(base_dir, container, library_dir, name + '.kicad_mod')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+          f.write('')
+        return path
+
+      first_plain = make_footprint(FOOTPRINT_LIBRARY_RELPATHS[0], 'Lib', 'Both')
+      make_footprint(FOOTPRINT_LIBRARY_RELPATHS[0], 'Lib.pretty', 'Both')
+      first_pretty = make_footprint(FOOTPRINT_LIBRARY_RELPATHS[0], 'Lib.pretty', 'PrettyOnly')
+      make_footprint(FOOTPRINT_LIBRARY_RELPATHS[1], 'Lib', 'PrettyOnly')
+      second = make_footprint(FOOTPRINT_LIBRARY_RELPATHS[1], 'Other.pretty', 'Part')
+
+      index = FootprintIndex.build(base_dir)
+      self.assertEqual(index.resolve('Lib:Both'), first_plain)
+      self.assertEqual(index.resolve('Lib:PrettyOnly'), first_pretty)
+      self.assertEqual(index.resolve('Other:Part'), second)
+      self.assertEqual(index.resolve('Other.pretty:Part'), second)
+      self.assertIsNone(index.resolve('Lib:Missing'))
+      self.assertIsNone(index.resolve('Invalid'))
+
+      late = make_footprint(FOOTPRINT_LIBRARY_RELPATHS[1], 'Lib', 'Missing')
+      self.assertIsNone(index.resolve('Lib:Missing'))  # negative cached
+      self.assertEqual(FootprintIndex.build(base_dir).resolve('Lib:Missing'), late)
+
+      manifest_path = os.path.join(base_dir, 'manifest.json')
+      index.save(manifest_path)
+      loaded = FootprintIndex.load(base_dir, manifest_path)
+      self.assertEqual(loaded.resolve('Lib:Both'), first_plain)
+      self.assertEqual(loaded.resolve('Other:Part'), second)
+
+  def test_data_by_hash(self):
+    with tempfile.TemporaryDirectory() as base_dir:
+      path = os.path.join(base_dir, FOOTPRINT_LIBRARY_RELPATHS[0], 'Lib.pretty', 'Part.kicad_mod')
+      os.makedirs(os.path.dirname(path))
+      with open(path, 'w') as f:
+        f.write('(footprint "Part")')
+      hash = footprint_hash('(footprint "Part")')
+
+      index = FootprintIndex.build(base_dir)  # as in a fresh process, where the footprint has not been read
+      with mock.patch('builtins.open', side_effect=AssertionError("read footprints")):  # hashed when built
+        self.assertIsNone(index.data_by_hash(footprint_hash('(footprint "Other")')))
+      self.assertEqual(index.data_by_hash(hash), '(footprint "Part")')
+
+      manifest_path = os.path.join(base_dir, 'manifest.json')
+      index.save(manifest_path)
+      self.assertEqual(FootprintIndex.load(base_dir, manifest_path).data_by_hash(hash), '(footprint "Part")')
+
+      with open(path, 'w') as f:
+        f.write('(footprint "Changed")')
+      self.assertIsNone(FootprintIndex.load(base_dir, manifest_path).data_by_hash(hash))
@@ -0,0 +1,31 @@
+import unittest
+import gzip
+import json
+from unittest import mock
+
+from compile_cache import CompileCache
+from app import app
+app.testing = True
+
+
+class LibraryTestCase(unittest.TestCase):
+  def setUp(self):
+    cache_patch = mock.patch('app.compile_cache', CompileCache(None))  # fresh, memory-only, so each test compiles
+    cache_patch.start()
+    self.addCleanup(cache_patch.stop)
+
+  def test_library(self):
+    with app.test_client() as client:
+      response = client.get('/library')
+      self.assertEqual(response.status_code, 200)
+      self.assertIsNone(response.headers.get('Content-Encoding'))
+      self.assertIn('blocks', json.loads(response.get_data()))
+
+      gzip_response = client.get('/library', headers={'Accept-Encoding': 'gzip'})
+      self.assertEqual(gzip_response.headers['Content-Encoding'], 'gzip')
+      self.assertEqual(gzip.decompress(gzip_response.get_data()), response.get_data())
+      self.assertNotEqual(gzip_response.headers['ETag'], response.headers['ETag'])
+
+      cached_response = client.get('/library', headers={'If-None-Match': response.headers['ETag']})
+      self.assertEqual(cached_response.status_code, 304)
+      self.assertEqual(cached_response.get_data(), b'')
@@ -0,0 +1,81 @@
+import unittest
+import glob
+import os.path
+from unittest import mock
+
+from netweaver_interface import JsonNetlist
+from library_index import LibraryIndex
+from compile_cache import CompileCache
+from app import app
+app.testing = True
+
+
+class LibraryIndexTestCase(unittest.TestCase):
+  def setUp(self):
+    cache_patch = mock.patch('app.compile_cache', CompileCache(None))  # fresh, memory-only, so each test compiles
+    cache_patch.start()
+    self.addCleanup(cache_patch.stop)
+    self.base_dir = os.path.dirname(os.path.abspath(__file__))
+    self.library = LibraryIndex.load(self.base_dir)
+    with open(os.path.join(self.base_dir, "tests/IotSensorImplicitI2c.json")) as f:
+      self.netlist_data = f.read()
+
+  def netlist(self) -> JsonNetlist:
+    return JsonNetlist.model_validate_json(self.netlist_data)
+
+  def errors(self, netlist: JsonNetlist):
+    return [(error.path, error.desc) for error in self.library.validate(netlist)]
+
+  def test_fixtures(self):
+    for fixture_path in glob.glob(os.path.join(self.base_dir, "tests/*.json")):
+      with open(fixture_path) as f:
+        netlist = JsonNetlist.model_validate_json(f.read())
+      self.assertEqual(self.errors(netlist), [], fixture_path)
+
+  def test_block_type(self):
+    netlist = self.netlist()
+    netlist.graph.nodes['_LgO1uAPj'].data.type = 'Bh1751'
+    self.assertEqual(self.errors(netlist), [(['Bh1750'], "unknown block type Bh1751")])
+
+  def test_port(self):
+    netlist = self.netlist()
+    netlist.graph.nodes['_LgO1uAPj'].data.ports[2].name = 'i3c'  # labeled
+    netlist.graph.nodes['_Son1wfSx'].data.ports[2].array = True  # labeled
+    netlist.graph.nodes['_VHtVfK9v'].data.ports[3].name = 'unused'  # not labeled, ignored
+    self.assertEqual(self.errors(netlist), [(['Bh1750', 'i3c'], "unknown port of Bh1750"),
+                                            (['Hdc1080', 'i2c'], "port is not an array in the library")])
+
+  def test_arg_params(self):
+    netlist = self.netlist()
+    ldo_args = netlist.graph.nodes['_qO3jWOyD'].data.argParams
+    ldo_args[0].value = [3.3]
+    usb_args = netlist.graph.nodes['_VHtVfK9v'].data.argParams
+    usb_args[0].name = 'voltage'
+    usb_args[0].value = [4.5, 5.5]
+    usb_args[1].type = 'float'
+    usb_args[1].value = 0.5
+    self.assertEqual(self.errors(netlist), [
+      (['UsbCReceptacle', 'voltage'], "unknown parameter of UsbCReceptacle"),
+      (['UsbCReceptacle', 'current_limits'], "parameter type float does not match library type range"),
+      (['Ldl1117', 'output_voltage'], "invalid value [3.3]"),
+    ])
+
+  def test_incompatible_ports(self):
+    netlist = self.netlist()
+    for label in netlist.labels.values():
+      if label.nodeId == '_LgO1uAPj' and label.labelName == 'i2c':  # Bh1750.i2c
+        label.labelName = 'pwr_out'
+    self.assertEqual(self.errors(netlist), [
+      (['Bh1750', 'i2c'], "I2cTarget can't connect to VoltageLink on pwr_out")
+    ])
+
+  def test_compile_short_circuit(self):
+    netlist = self.netlist()
+    netlist.graph.nodes['_LgO1uAPj'].data.type = 'Bh1751'
+    netlist.graph.nodes['_HByp5m9J'].data.ports[3].name = 'i3c'
+    with app.test_client() as client:
+      response = client.post('/compile', data=netlist.model_dump_json())
+      self.assertEqual(response.status_code, 400)
+      self.assertEqual([(error['path'], error['kind']) for error in response.json['errors']],
+                       [(['Bh1750'], "invalid input"), (['Bme680', 'i3c'], "invalid input")])
+      self.assertNotIn('scala_compile', response.headers.get('Server-Timing', ''))
@@ -0,0 +1,40 @@
+import unittest
+
+from metrics import Counter, Histogram, collect_timings, timed, server_timing, REGISTRY
+
+
+class MetricsTestCase(unittest.TestCase):
+  def setUp(self):
+    self.metric = None
+
+  def tearDown(self):
+    if self.metric is not None:  # don't leave test metrics in the global registry
+      REGISTRY.remove(self.metric)
+
+  def test_histogram(self):
+    self.metric = Histogram('test_seconds', "Test histogram.", ['stage'], buckets=(0.1, 1.0))
+    self.metric.observe(0.05, 'a')
+    self.metric.observe(0.1, 'a')
+    self.metric.observe(5, 'a')
+    self.assertEqual(self.metric.expose().splitlines(), [
+      '# HELP test_seconds Test histogram.',
+      '# TYPE test_seconds histogram',
+      'test_seconds_bucket{stage="a",le="0.1"} 2',
+      'test_seconds_bucket{stage="a",le="1.0"} 2',
+      'test_seconds_bucket{stage="a",le="+Inf"} 3',
+      'test_seconds_sum{stage="a"} 5.15',
+      'test_seconds_count{stage="a"} 3',
+    ])
+
+  def test_counter_escaping(self):
+    self.metric = Counter('test_total', "Test counter.", ['outcome'])
+    self.metric.inc('invalid "input"')
+    self.metric.inc('invalid "input"')
+    self.assertIn('test_total{outcome="invalid \\"input\\""} 2', self.metric.expose())
+
+  def test_timings(self):
+    with collect_timings() as timings:
+      with timed('inner'):
+        pass
+    self.assertEqual([stage for stage, seconds in timings], ['inner'])
+    self.assertRegex(server_timing([('inner', 0.0123)]), r'^inner;dur=12\.3$')
@@ -0,0 +1,34 @@
+import unittest
+import os.path
+
+from netweaver_interface import JsonNetlist
+from hdl_generator import NetlistIndex, netlist_design, BlockDesign, PortRefDesign
+
+
+class NetlistIndexTestCase(unittest.TestCase):
+  def setUp(self):
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests/IotSensorImplicitI2c.json")) as f:
+      self.netlist = JsonNetlist.model_validate_json(f.read())
+
+  def test_index(self):
+    index = NetlistIndex(self.netlist)
+    self.assertEqual(list(index.connections), ['pwr', 'gnd', 'i2c', 'pwr_out'])
+    self.assertEqual(index.connections['i2c'].port_types(), {'I2cController', 'I2cTarget'})
+    self.assertFalse(index.connections['i2c'].is_array())
+
+    controller_id = '_h94d1i92'  # Esp32_Wroom_32
+    pwr_port = index.port_by_name(controller_id, 'pwr')
+    assert pwr_port is not None
+    self.assertIs(index.port(controller_id, pwr_port.idx), pwr_port)
+    pwr_connection = index.connection_at(controller_id, pwr_port.idx)
+    assert pwr_connection is not None
+    self.assertIn((index.nodes[controller_id], pwr_port), pwr_connection.ports)
+    self.assertIsNone(index.port_by_name(controller_id, 'nonexistent'))
+
+  def test_implicit_pullup(self):
+    design = netlist_design(self.netlist)
+    self.assertEqual(design.blocks[-1], BlockDesign('_implicit_i2c_pullup_i2c', 'I2cPullup', []))
+    connects = {tuple(port_ref.port for port_ref in connect if port_ref.block == 'Esp32_Wroom_32'): connect
+                for connect in design.connects}
+    self.assertEqual(connects[('i2c', )][-1], PortRefDesign('_implicit_i2c_pullup_i2c', 'i2c'))
+    self.assertEqual(connects[('pwr', )][-1], PortRefDesign('_implicit_i2c_pullup_i2c', 'pwr'))
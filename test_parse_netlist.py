@@ -0,0 +1,41 @@
+import unittest
+import glob
+import os.path
+
+from pydantic import ValidationError
+
+from netweaver_interface import JsonNetlist, parse_netlist_json
+from compile_cache import netlist_hash
+from hdl_generator import tohdl_netlist
+from synthetic_design import synthetic_netlist
+
+
+class ParseNetlistTestCase(unittest.TestCase):
+  def test_fixtures(self):
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    for fixture_path in glob.glob(os.path.join(base_dir, "tests/*.json")):
+      with open(fixture_path) as f:
+        netlist_data = f.read()
+      netlist = JsonNetlist.model_validate_json(netlist_data)
+      lean_netlist = parse_netlist_json(netlist_data)
+      self.assertIsInstance(lean_netlist, JsonNetlist)
+      self.assertEqual(netlist_hash(lean_netlist), netlist_hash(netlist), fixture_path)
+      self.assertEqual(tohdl_netlist(lean_netlist), tohdl_netlist(netlist), fixture_path)
+
+  def test_skipped(self):
+    netlist = parse_netlist_json(synthetic_netlist(10).model_dump_json())
+    self.assertEqual(netlist.nets, [])
+    self.assertIsNone(netlist.graphUIData)
+    node = next(iter(netlist.graph.nodes.values()))
+    self.assertEqual(node.data.ports[0].leftRightUpDown, '')
+    # still serializable as a JsonNetlist, eg to send to a compile worker
+    self.assertEqual(netlist_hash(JsonNetlist.model_validate_json(netlist.model_dump_json())), netlist_hash(netlist))
+
+  def test_invalid(self):
+    with self.assertRaises(ValidationError):
+      parse_netlist_json('{"graph": {"nodes": {"a": {}}}}')
+    with self.assertRaises(ValidationError):
+      parse_netlist_json('{')
+    with self.assertRaises(ValidationError):  # graphUIData is required, as in JsonNetlist
+      parse_netlist_json('{"nets": [], "graph": {"nodes": {}}}')
+    self.assertIsNone(parse_netlist_json('{"nets": [], "graph": {"nodes": {}}, "graphUIData": [1]}').graphUIData)
@@ -0,0 +1,24 @@
+import unittest
+import os.path
+from unittest import mock
+
+from netlist_compiler import compile_netlist, JsonNetlist, _submit_stage
+from metrics import collect_timings
+
+
+class PostCompileTestCase(unittest.TestCase):
+  def test_sequential_identical(self):
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests/BasicBlinky.json")) as f:
+      netlist = JsonNetlist.model_validate_json(f.read())
+    concurrent_result = compile_netlist(netlist)
+    with mock.patch('netlist_compiler.post_compile_executor', None):  # as POST_COMPILE_THREADS=0
+      sequential_result = compile_netlist(netlist)
+    self.assertTrue(concurrent_result.svgpcb)
+    self.assertEqual(concurrent_result.model_dump(), sequential_result.model_dump())
+
+  def test_submit_inline(self):
+    with collect_timings() as timings, mock.patch('netlist_compiler.post_compile_executor', None):
+      self.assertEqual(_submit_stage('ok', lambda: 1).result(), 1)
+      with self.assertRaises(ZeroDivisionError):
+        _submit_stage('fails', lambda: 1 // 0).result()
+    self.assertEqual([stage for stage, seconds in timings], ['ok', 'fails'])
@@ -0,0 +1,85 @@
+import unittest
+import builtins
+import gc
+import os
+import sys
+import weakref
+
+from PolymorphicBlocks.edg.core.Builder import builder
+from netlist_compiler import compile_netlist, JsonNetlist
+from hdl_generator import netlist_design, tohdl_design
+from hdl_builder import GENERATED_MODULE, build_design, generated_module, stable_class_paths
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests")
+SOAK_FIXTURES = ['ConnectorLed.json', 'BasicBlinky.json', 'IotSensorImplicitI2c.json']  # with and without connectors
+
+# full compiles of the soak test, small by default to check the trend, eg SOAK_ITERATIONS=3000 for a longer soak
+SOAK_ITERATIONS = int(os.environ.get('SOAK_ITERATIONS', 60))
+SOAK_MAX_OBJECT_GROWTH = 20  # gc-tracked objects per compile, far fewer than a leaked design's classes and blocks
+SOAK_MAX_RSS_GROWTH = 32 * 1024 * 1024  # bytes, allowing for allocator fragmentation
+
+
+def load_fixture(filename: str) -> JsonNetlist:
+  with open(os.path.join(FIXTURES_DIR, filename)) as f:
+    return JsonNetlist.model_validate_json(f.read())
+
+
+def rss_bytes() -> int:
+  with open('/proc/self/statm') as f:
+    return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+class SoakTestCase(unittest.TestCase):
+  def test_generated_classes_freed(self):
+    design = netlist_design(load_fixture('ConnectorLed.json'))
+    connector_name = design.connectors[0].class_name
+    for direct_build in [False, True]:
+      with generated_module() as module:
+        module_name = module.__name__
+        if direct_build:
+          top_class = build_design(design, module)
+        else:
+          exec("from PolymorphicBlocks.edg import *\n\n" + tohdl_design(design), module.__dict__)
+          top_class = module.MyModule
+        self.assertIs(sys.modules[module_name], module)
+        self.assertEqual(top_class.__module__, module_name)
+        builder.elaborate_toplevel(top_class())
+        class_refs = [weakref.ref(top_class), weakref.ref(getattr(module, connector_name))]
+        del top_class
+      gc.collect()
+      self.assertEqual([class_ref() for class_ref in class_refs], [None, None])
+      self.assertNotIn(module_name, sys.modules)
+      self.assertFalse(hasattr(builtins, connector_name))
+
+  def test_generated_modules_distinct(self):
+    with generated_module() as module1, generated_module() as module2:  # as for concurrent compiles
+      self.assertNotEqual(module1.__name__, module2.__name__)
+      self.assertIs(sys.modules[module1.__name__], module1)
+      self.assertIs(sys.modules[module2.__name__], module2)
+      self.assertEqual(stable_class_paths(f'(value "{module2.__name__}.MyModule")', module2),
+                       f'(value "{GENERATED_MODULE}.MyModule")')
+
+  def test_compile_unregistered(self):
+    compile_netlist(load_fixture('ConnectorLed.json'))
+    self.assertFalse([name for name in sys.modules if name.startswith(GENERATED_MODULE)])
+    self.assertFalse(hasattr(builtins, 'PinHeader254Vertical_PinHeader254Vertical'))
+
+  @unittest.skipUnless(SOAK_ITERATIONS, "set SOAK_ITERATIONS to run")
+  def test_soak(self):
+    """Repeated compiles must not grow memory, measured after a warmup that fills the caches."""
+    netlists = [load_fixture(filename) for filename in SOAK_FIXTURES]
+    warmup = max(SOAK_ITERATIONS // 10, 2 * len(netlists))
+    for i in range(warmup):
+      compile_netlist(netlists[i % len(netlists)])
+    gc.collect()
+    start_objects, start_rss = len(gc.get_objects()), rss_bytes()
+
+    for i in range(SOAK_ITERATIONS):
+      compile_netlist(netlists[i % len(netlists)], direct_build=i % 2 == 1)
+    gc.collect()
+    end_objects, end_rss = len(gc.get_objects()), rss_bytes()
+    self.assertLessEqual(end_objects - start_objects, SOAK_ITERATIONS * SOAK_MAX_OBJECT_GROWTH,
+                         f"gc objects grew from {start_objects} to {end_objects}")
+    self.assertLessEqual(end_rss - start_rss, SOAK_MAX_RSS_GROWTH,
+                         f"RSS grew from {start_rss / 1e6:.0f} MB to {end_rss / 1e6:.0f} MB")
@@ -0,0 +1,33 @@
+import unittest
+import importlib
+from types import SimpleNamespace
+from unittest import mock
+
+from PolymorphicBlocks.edg import edgir, IndicatorLed
+from PolymorphicBlocks.edg.core import CompiledDesign, TransformUtil
+
+import svgpcb_compiler
+from svgpcb_compiler import SvgPcbTransform, filter_blocks_by_pathname
+
+
+class SvgPcbCompilerTestCase(unittest.TestCase):
+  def test_resolve_once(self):
+    design = edgir.Design()
+    for name in ['led1', 'led2', 'led3']:
+      block_pair = design.contents.blocks.add()
+      block_pair.name = name
+      block_pair.value.hierarchy.self_class.target.name = IndicatorLed._static_def_name()
+    compiled = CompiledDesign.from_request(design, [])
+
+    with mock.patch.dict(svgpcb_compiler._block_classes, clear=True), \
+        mock.patch.object(importlib, 'import_module', wraps=importlib.import_module) as import_module:
+      self.assertEqual(SvgPcbTransform(compiled, mock.Mock()).run(), [])  # not a template block
+      self.assertEqual(SvgPcbTransform(compiled, mock.Mock()).run(), [])  # resolved across compiles too
+      self.assertEqual(import_module.call_count, 1)
+      self.assertEqual(svgpcb_compiler._block_classes, {IndicatorLed._static_def_name(): (IndicatorLed, False)})
+
+  def test_filter_blocks_by_pathname(self):
+    blocks = [SimpleNamespace(full_path=TransformUtil.Path.empty().append_block(*path))
+              for path in [('a',), ('a', 'b'), ('a', 'c', 'd'), ('ab',), ('e', 'f'), ('e',)]]
+    filtered = filter_blocks_by_pathname(blocks, [('a', 'c'), ('e', 'f'), ('a', 'b', 'x')])  # type: ignore
+    self.assertEqual([block.full_path.blocks for block in filtered], [('a',), ('a', 'b'), ('ab',), ('e',)])
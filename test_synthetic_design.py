@@ -0,0 +1,25 @@
+import unittest
+
+from netweaver_interface import JsonNetlist
+from hdl_generator import netlist_design
+from synthetic_design import synthetic_netlist, PATTERNS
+
+
+class SyntheticDesignTestCase(unittest.TestCase):
+  def test_sizes(self):
+    for blocks in [1, 2, 3, 4, 7, 50]:
+      for patterns in [PATTERNS] + [(pattern, ) for pattern in PATTERNS]:
+        netlist = synthetic_netlist(blocks, patterns)
+        self.assertEqual(len(netlist.graph.nodes), blocks)
+        design = netlist_design(netlist)
+        self.assertTrue(all(len(connect) > 1 for connect in design.connects))
+
+  def test_roundtrip(self):
+    netlist = synthetic_netlist(30)
+    self.assertEqual(JsonNetlist.model_validate_json(netlist.model_dump_json()), netlist)
+    self.assertEqual(synthetic_netlist(30), netlist)  # deterministic
+
+  def test_i2c(self):
+    design = netlist_design(synthetic_netlist(6, ('i2c', )))
+    self.assertEqual([block.block_class for block in design.blocks],
+                     ['UsbCReceptacle', 'Ldl1117', 'Esp32_Wroom_32', 'Hdc1080', 'Bh1750', 'Bme680', 'I2cPullup'])